@@ -0,0 +1,180 @@
+import gc
+import tracemalloc
+
+'''
+Debug tool used to keep the game loop allocation-free. It is enabled by setting the environment variable
+TANK_TRACK_ALLOCS=1 before running main.py.
+
+It uses tracemalloc to compare the memory blocks alive at the end of every frame with the ones alive at the end
+of the previous frame, and counts the garbage collections that happen while the game is running.
+Every report_every frames it prints a summary and the lines of code that allocated the most blocks.
+
+The blocks counted are the retained ones: allocated during a frame and still alive at its end (e.g. a growing cache,
+or the objects kept by a cycle until a collection). The short-lived objects of a frame (e.g. temporary rects or
+tuples, freed before its end) cannot be counted from the snapshots: they only show in the peak of the frame, the
+memory used during the frame above the memory at its start.
+
+'''
+
+class AllocationTracker:
+
+    '''
+    Tracks the objects retained per frame by the game loop, and the transient memory peak of the frames.
+
+    Attributes:
+
+        - report_every (int):   the number of frames between two reports
+        - top (int):            the number of allocation sites shown in every report
+        - frames (int):         the number of frames tracked since the last report
+        - retained_blocks (int): the number of memory blocks allocated in a frame and still alive at its end, since the last report
+        - retained_bytes (int): the number of bytes allocated in a frame and still alive at its end, since the last report
+        - peak_bytes (int):     the biggest transient memory peak of a single frame since the last report
+        - frame_start_bytes (int): the traced memory at the beginning of the current frame
+        - collections (list):   the number of garbage collections per generation since the last report
+        - snapshot (Snapshot):  the tracemalloc snapshot taken at the end of the previous frame
+        - site_stats (dict):    the number of retained blocks allocated by every line of code since the last report
+
+    Methods:
+
+        - start:            starts tracking the allocations
+        - stop:             stops tracking the allocations
+        - end_frame:        compares the memory of the current frame with the previous one. It is called once per frame
+        - report:           prints a summary of the allocations since the last report
+        - take_snapshot:    takes a tracemalloc snapshot without the allocations of the tracker itself
+
+    '''
+
+    def __init__(self, report_every = 120, top = 5):
+        self.report_every = report_every
+        self.top = top
+        self.frames = 0
+        self.retained_blocks = 0
+        self.retained_bytes = 0
+        self.peak_bytes = 0
+        self.collections = [0, 0, 0]
+        self.snapshot = None
+        self.frame_start_bytes = 0
+        self.site_stats = {}
+
+    def start(self):
+
+        '''
+        Starts tracking the allocations and the garbage collections.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        tracemalloc.start()
+        gc.callbacks.append(self.on_gc)
+        self.snapshot = self.take_snapshot()
+        tracemalloc.reset_peak()
+        self.frame_start_bytes = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+
+        '''
+        Stops tracking the allocations and prints a last report.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if self.snapshot is None:
+            return
+
+        self.report()
+        gc.callbacks.remove(self.on_gc)
+        tracemalloc.stop()
+        self.snapshot = None
+
+    def on_gc(self, phase, info):
+
+        #Counting the collections of every generation (only once per collection)
+        if phase == 'start':
+            self.collections[info['generation']] += 1
+
+    def take_snapshot(self):
+
+        '''
+        Takes a tracemalloc snapshot, ignoring the allocations made by tracemalloc and by this tracker.
+
+        Parameters: None
+
+        Returns:
+            - Snapshot: the filtered snapshot
+        '''
+
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def end_frame(self):
+
+        '''
+        Compares the blocks alive at the end of this frame with the ones alive at the end of the previous frame.
+        It is called once per frame by the game loop, after the window has been updated.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if self.snapshot is None:
+            return
+
+        #Transient memory used during the frame (freed before the end of the frame)
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak - self.frame_start_bytes)
+
+        snapshot = self.take_snapshot()
+
+        for stat in snapshot.compare_to(self.snapshot, 'lineno'):
+            if stat.count_diff > 0:
+                self.retained_blocks += stat.count_diff
+                self.retained_bytes += stat.size_diff
+                self.site_stats[stat.traceback] = self.site_stats.get(stat.traceback, 0) + stat.count_diff
+
+        self.snapshot = snapshot
+        self.frames += 1
+
+        if self.frames >= self.report_every:
+            self.report()
+
+        tracemalloc.reset_peak()
+        self.frame_start_bytes = tracemalloc.get_traced_memory()[0]
+
+    def report(self):
+
+        '''
+        Prints the number of blocks retained per frame, the biggest transient peak of a frame, the garbage collections
+        and the top allocation sites of the retained blocks since the last report, and then resets the counters.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if self.frames == 0:
+            return
+
+        print(f'[allocations] {self.frames} frames: '
+              f'{self.retained_blocks / self.frames:.1f} retained blocks/frame, '
+              f'{self.retained_bytes / self.frames:.0f} retained bytes/frame, '
+              f'transient peak {self.peak_bytes / 1024:.1f} KiB, '
+              f'gc collections (gen0, gen1, gen2) = {tuple(self.collections)}')
+
+        sites = sorted(self.site_stats.items(), key = lambda item: item[1], reverse = True)
+
+        for traceback, count in sites[:self.top]:
+            print(f'    {count / self.frames:8.1f} retained blocks/frame  {traceback}')
+
+        self.frames = 0
+        self.retained_blocks = 0
+        self.retained_bytes = 0
+        self.peak_bytes = 0
+        self.collections = [0, 0, 0]
+        self.site_stats = {}
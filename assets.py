@@ -0,0 +1,112 @@
+import os
+import pygame as pg
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Loading of the images of the game. The images are loaded (and scaled) only once and then shared
+by all the objects that use them, so creating a tank does not decode its images again.
+The images resized for the render scale (see scale_image) are cached the same way.
+
+At startup, all the images can be decoded at once by a pool of worker threads (see preload_images), while the game
+initializes the display and builds the first level: pygame decodes an image without holding the GIL, so the decoding
+runs in parallel on several cores (or overlaps the work of the main thread on one).
+
+'''
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+
+_images = {}
+
+#The decoding of the images started by preload_images (futures), by file name
+_decoded = {}
+
+def decode_image(name):
+    return pg.image.load(os.path.join(IMAGES_DIR, name))
+
+def preload_images(workers = None):
+
+    '''
+    Starts decoding all the images of the images folder (the ones not started yet) in a pool of worker threads.
+    load_image then uses the decoded images (waiting for the one it needs if it is not decoded yet).
+
+    Parameters:
+
+        workers (int) :     The number of worker threads (by default, one per image up to the number of CPUs).
+
+    Returns:
+
+        list : The futures of the decoding of the images (e.g. to wait for all of them before the first frame).
+
+    '''
+
+    names = [name for name in sorted(os.listdir(IMAGES_DIR)) if name.lower().endswith('.png') and name not in _decoded]
+
+    if not names:
+        return list(_decoded.values())
+
+    pool = ThreadPoolExecutor(max_workers = workers or min(len(names), os.cpu_count() or 1), thread_name_prefix = 'image-decoder')
+
+    for name in names:
+        _decoded[name] = pool.submit(decode_image, name)
+
+    #The workers exit once the images are decoded
+    pool.shutdown(wait = False)
+
+    return list(_decoded.values())
+
+def load_image(name, size):
+
+    '''
+    Returns the image of the images folder with the given name, scaled to the given size.
+    The image is only loaded the first time it is requested with that size (from the preloaded images, see preload_images).
+
+    Parameters:
+
+        name (str) :    The file name of the image (e.g. 'tank_image.png').
+        size (tuple) :  The (width, height) of the scaled image.
+
+    Returns:
+
+        Surface : The scaled image.
+
+    '''
+
+    key = (name, size)
+    image = _images.get(key)
+
+    if image is None:
+        decoded = _decoded.get(name)
+        image = pg.transform.scale(decoded.result() if decoded is not None else decode_image(name), size)
+        _images[key] = image
+
+    return image
+
+def scale_image(image, scale):
+
+    '''
+    Returns an image resized by a factor (e.g. the render scale of the game, see game), smoothly.
+    The resized image is only created the first time it is requested with that factor.
+
+    Parameters:
+
+        image (Surface) :   The image (e.g. one returned by load_image).
+        scale (float) :     The factor.
+
+    Returns:
+
+        Surface : The resized image.
+
+    '''
+
+    if scale == 1:
+        return image
+
+    key = (id(image), scale)
+    cached = _images.get(key)
+
+    #The original image is kept with the resized one, so its id is not reused while it is cached
+    if cached is None:
+        size = (max(round(image.get_width()*scale), 1), max(round(image.get_height()*scale), 1))
+        cached = _images[key] = (image, pg.transform.smoothscale(image, size))
+
+    return cached[1]
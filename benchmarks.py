@@ -0,0 +1,479 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import statistics
+from datetime import datetime, timezone
+
+#The benchmarks always run headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame as pg
+from enemy import EnemyTank, update_enemies
+from obstacles import Obstacles
+from tank import Tank
+from entities import TankStore
+from bullet import Bullet
+from new_level import create_new_level, render_static_layer
+from level_generator import create_stress_level
+from navigation import Navigation
+from camera import Camera
+from scheduler import Scheduler
+from config import Config
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Micro-benchmark suite for the hot paths of the game: the enemy solvers (get_possible_trajectory and collision,
+get_intercept_trajectory),
+the enemy motion (distance_to_obstacles), the update of all the enemies in a tick (update_enemies), the bullets (update and check_bullet_collision) and Game.draw_window.
+
+Every benchmark runs on a set of scenes: the 8 shipped levels and synthetic maps with 10 to 1000 obstacles
+and 1 to 500 enemies, and generated levels (see level_generator) with 50 to 500 enemies, in the window or in
+scrolling worlds 2 to 8 times as wide (with as many enemies per screen). The results (time per call) are written as JSON together with the environment metadata,
+so two runs can be compared. The solvers, the enemies and the drawing run with the configuration of the game given
+with the configuration flags (see config, e.g. --solver-velocities 11 or --render-scale 0.5), which is recorded too.
+
+Usage:
+
+    python benchmarks.py [--output results.json] [--quick] [--only solver,collision] [--scenes level,synthetic,generated,wide]
+                         [configuration flags]
+
+'''
+
+SYNTHETIC_OBSTACLES = (10, 100, 1000)
+SYNTHETIC_ENEMIES = (1, 50, 500)
+GENERATED_ENEMIES = (50, 200, 500)
+
+#Widths of the scrolling worlds (in windows) and enemies per window
+WIDE_WORLDS = (2, 4, 8)
+WIDE_ENEMIES = 50
+
+class Scene:
+
+    '''
+    A scene on which the benchmarks run: a player tank, a list of enemies and the obstacles. The benchmarks change
+    their scene (the shells carve the terrain, the enemies move and hit the player), so every benchmark runs on a copy
+    of it, built again by the same (seeded) function.
+
+    Attributes:
+
+        - name (str):               the name of the scene (e.g. 'level_3' or 'synthetic_o100_e50')
+        - build (callable):         the function that builds the tank, the enemies and the obstacles of the scene
+        - tank (Tank):              the player tank
+        - enemies (list):           the enemy tanks
+        - obstacles (Obstacles):    the obstacles
+
+    Methods:
+
+        - copy:     returns a new copy of the scene
+        - describe: returns the name and the size of the scene
+
+    '''
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.tank, self.enemies, self.obstacles = build()
+
+    def copy(self):
+        return Scene(self.name, self.build)
+
+    def describe(self):
+        return {'scene': self.name, 'n_obstacles': len(self.obstacles.obstacles), 'n_enemies': len(self.enemies)}
+
+def level_scene(level):
+
+    '''
+    Returns the scene of one of the shipped levels.
+
+    Parameters:
+
+        level (int) : The level (1 to 8).
+
+    Returns:
+
+        Scene : The scene of the level.
+
+    '''
+
+    return Scene(f'level_{level}', lambda: create_new_level(level))
+
+def synthetic_scene(n_obstacles, n_enemies, seed = 0):
+
+    '''
+    Returns a seeded random scene with a given number of obstacles and enemies. The obstacles are small walls
+    and platforms spread over the right part of the window, and the enemies stand on the floor.
+
+    Parameters:
+
+        n_obstacles (int) : The number of obstacles.
+        n_enemies (int) :   The number of enemies.
+        seed (int) :        The seed of the random generator.
+
+    Returns:
+
+        Scene : The synthetic scene.
+
+    '''
+
+    def build():
+        rng = random.Random(seed)
+
+        store = TankStore(1 + n_enemies)
+        tank = Tank(100, FLOOR_POS[1] - 54, store)
+
+        obstacles = Obstacles()
+        for _ in range(n_obstacles):
+            width, height = rng.choice(((rng.randint(40, 120), 20), (20, rng.randint(40, 120))))
+            obstacles.add_obstacle(rng.randint(500, WIDTH - width), rng.randint(100, FLOOR_POS[1] - height), width, height)
+
+        enemies = [EnemyTank(rng.randint(550, WIDTH - 70), FLOOR_POS[1] - 54, rng.randint(2000, 5000), store) for _ in range(n_enemies)]
+
+        return tank, enemies, obstacles
+
+    return Scene(f'synthetic_o{n_obstacles}_e{n_enemies}', build)
+
+def build_scenes(kinds):
+
+    '''
+    Builds the scenes of the given kinds ('level' for the shipped levels, 'synthetic' for the synthetic maps
+    'generated' for the levels of the procedural generator and 'wide' for generated scrolling worlds).
+
+    Parameters:
+
+        kinds (list) : The kinds of scenes to build.
+
+    Returns:
+
+        list : The scenes.
+
+    '''
+
+    scenes = []
+
+    if 'level' in kinds:
+        scenes += [level_scene(level) for level in range(1, 9)]
+
+    if 'synthetic' in kinds:
+        scenes += [synthetic_scene(n_obstacles, n_enemies) for n_obstacles in SYNTHETIC_OBSTACLES for n_enemies in SYNTHETIC_ENEMIES]
+
+    if 'generated' in kinds:
+        scenes += [Scene(f'generated_e{n_enemies}', lambda n_enemies = n_enemies: create_stress_level(n_enemies, 30)) for n_enemies in GENERATED_ENEMIES]
+
+    if 'wide' in kinds:
+        scenes += [Scene(f'wide_w{n_windows}_e{n_windows*WIDE_ENEMIES}',
+                         lambda n_windows = n_windows: create_stress_level(n_windows*WIDE_ENEMIES, 30*n_windows, world_width = n_windows*WIDTH))
+                   for n_windows in WIDE_WORLDS]
+
+    return scenes
+
+def measure(function, min_time, repeat, setup = None):
+
+    '''
+    Measures the time per call of a function. Like timeit.autorange, the number of calls per round grows
+    until a round lasts at least min_time seconds, and then the rounds are repeated.
+
+    Parameters:
+
+        function (callable) :   The function to measure (called without arguments).
+        min_time (float) :      The minimum duration of a round (in seconds).
+        repeat (int) :          The number of rounds.
+        setup (callable) :      Called (untimed) before every round, e.g. to restore the state the function changes (None for nothing).
+
+    Returns:
+
+        dict : The number of calls per round and the min, median and mean time per call (in microseconds).
+
+    '''
+
+    number = 1
+
+    while True:
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    rounds = [elapsed / number]
+
+    for _ in range(repeat - 1):
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - start) / number)
+
+    return {'number': number, 'min_us': min(rounds) * 1e6, 'median_us': statistics.median(rounds) * 1e6, 'mean_us': statistics.fmean(rounds) * 1e6}
+
+def sample(items, k):
+    return items[:: max(1, len(items) // k)][:k]
+
+def bench_solver(scene, game):
+
+    #Solver of (up to) 5 enemies aiming at the player
+    enemies = sample(scene.enemies, 5)
+    tank = scene.tank
+
+    def run():
+        for enemy in enemies:
+            enemy.get_possible_trajectory(enemy.x - tank.x, enemy.y - tank.y, scene.obstacles, game.config)
+
+    return run, len(enemies), None
+
+def bench_intercept(scene, game):
+
+    #Intercept solver of (up to) 5 enemies aiming at the player moving to the right
+    enemies = sample(scene.enemies, 5)
+    tank = scene.tank
+
+    def run():
+        tank.vx = tank.tank_speed
+        for enemy in enemies:
+            enemy.get_intercept_trajectory(tank, scene.obstacles, game.config)
+
+    return run, len(enemies), None
+
+def bench_collision(scene, game):
+
+    #Obstacle check of 5 trajectories of the first enemy
+    enemy = scene.enemies[0]
+    trajectories = [(theta + 90, v) for theta, v in ((15, 21), (30, 25), (45, 29), (60, 33), (75, 37))]
+
+    def run():
+        for theta, v in trajectories:
+            enemy.collision(theta, v, scene.obstacles)
+
+    return run, len(trajectories), None
+
+def bench_distance(scene, game):
+
+    #Distance to obstacles (and to the other enemies) of every enemy, on the navigation of the scene
+    Navigation(scene.obstacles, scene.enemies)
+
+    def run():
+        for enemy in scene.enemies:
+            enemy.distance_to_obstacles()
+
+    return run, len(scene.enemies), None
+
+def bench_enemies(scene, game):
+
+    #Update of all the enemies in a tick (aiming, motion, reloads, firing and bullets), with the camera on the player
+    #(so only the enemies near the view think every tick in the scrolling worlds)
+    tank, enemies, obstacles = scene.tank, scene.enemies, scene.obstacles
+    navigation = Navigation(obstacles, enemies)
+    scheduler = Scheduler()
+    camera = Camera(obstacles.width, game.config.far_tick_interval)
+
+    for enemy in enemies:
+        scheduler.schedule(enemy.loading_time, enemy.reload)
+
+    def run():
+        scheduler.advance(1000/60)
+        camera.follow(tank)
+        update_enemies(enemies, tank, obstacles, navigation, scheduler, camera, game.config)
+
+    return run, len(scene.enemies), None
+
+def bench_bullet(scene, game):
+
+    #Update and collision check of a bullet of the player (against the enemies it overlaps, as in Game.handle_tank).
+    #The bullets carve the terrain, so it is restored (with the bullets) before every round, and every round does the same work
+    obstacles = scene.obstacles
+    navigation = Navigation(obstacles, list(scene.enemies))
+    bullets = [Bullet(scene.tank.firing_x0, scene.tank.firing_y0, 20 + 15*power/100, angle) for angle, power in ((20, 30), (45, 60), (70, 90))]
+    initial_state = [(bullet.x, bullet.y, bullet.vy) for bullet in bullets]
+    steps = 0
+
+    obstacles.build_terrain()
+    terrain, area_table = obstacles.terrain.copy(), obstacles.area_table.copy()
+
+    def restart():
+        for bullet, (x, y, vy) in zip(bullets, initial_state):
+            bullet.x, bullet.y, bullet.vy = x, y, vy
+
+    def setup():
+        nonlocal steps
+        np.copyto(obstacles.terrain, terrain)
+        np.copyto(obstacles.area_table, area_table)
+        obstacles.craters.clear()
+        restart()
+        steps = 0
+
+    def run():
+        nonlocal steps
+
+        #Restarting the bullets before they leave the window
+        if steps == 40:
+            restart()
+            steps = 0
+
+        for bullet in bullets:
+            bullet.update()
+            enemies = navigation.tanks_between(bullet.rect.left, bullet.rect.right) or [None]
+            any([bullet.check_bullet_collision(obstacles, enemy) for enemy in enemies])
+
+        steps += 1
+
+    return run, len(bullets), setup
+
+def bench_draw(scene, game):
+
+    #Drawing of the whole window (without updating the display), with the camera on the player
+    game.tank, game.enemies, game.obstacles = scene.tank, scene.enemies, scene.obstacles
+    game.navigation = Navigation(scene.obstacles, list(scene.enemies))
+    game.static_layer = render_static_layer(game.BACKGROUND, scene.obstacles)
+    game.camera.reset(scene.obstacles.width)
+    game.camera.follow(scene.tank)
+    window = pg.display.get_surface()
+
+    def run():
+        game.draw_window(window)
+
+    return run, 1, None
+
+BENCHMARKS = {
+    'solver': bench_solver,
+    'intercept': bench_intercept,
+    'collision': bench_collision,
+    'distance': bench_distance,
+    'enemies': bench_enemies,
+    'bullet': bench_bullet,
+    'draw': bench_draw,
+}
+
+def git_commit():
+
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True,
+                                cwd = os.path.dirname(os.path.abspath(__file__)), timeout = 5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment_metadata():
+
+    '''
+    Returns the metadata of the environment in which the benchmarks run, so that results can be compared.
+
+    Parameters: None
+
+    Returns:
+
+        dict : The metadata (versions, platform, CPU, commit, etc).
+
+    '''
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'pygame': pg.version.ver,
+        'sdl': '.'.join(map(str, pg.get_sdl_version())),
+        'numpy': np.__version__,
+        'video_driver': pg.display.get_driver(),
+        'argv': sys.argv[1:],
+    }
+
+def run_benchmarks(names, scenes, min_time, repeat, config = None):
+
+    '''
+    Runs the given benchmarks on every scene.
+
+    Parameters:
+
+        names (list) :      The names of the benchmarks to run (keys of BENCHMARKS).
+        scenes (list) :     The scenes.
+        min_time (float) :  The minimum duration of a round (in seconds).
+        repeat (int) :      The number of rounds.
+        config (Config) :   The configuration of the game (the defaults if None).
+
+    Returns:
+
+        list : A result (dict) per benchmark and scene.
+
+    '''
+
+    from game import Game
+    game = Game(config)
+    results = []
+
+    for scene in scenes:
+        for name in names:
+
+            #Fixed seed and a new copy of the scene, so that the results do not depend on the benchmarks run before
+            random.seed(0)
+            run, calls, setup = BENCHMARKS[name](scene.copy(), game)
+            timing = measure(run, min_time, repeat, setup)
+
+            result = {'benchmark': name, **scene.describe(), 'calls_per_run': calls, **timing,
+                      'per_item_us': timing['median_us'] / max(calls, 1)}
+            results.append(result)
+
+            print(f"{name:<10} {scene.name:<22} {result['median_us']:>12.1f} us/run  {result['per_item_us']:>12.1f} us/item")
+
+    return results
+
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = 'Micro-benchmarks of the solver, collision and rendering hot paths.')
+    parser.add_argument('--output', default = 'benchmark_results.json', help = 'JSON file the results are written to')
+    parser.add_argument('--only', default = ','.join(BENCHMARKS), help = 'comma-separated benchmarks to run')
+    parser.add_argument('--scenes', default = 'level,synthetic,generated', help = "comma-separated kinds of scenes ('level', 'synthetic', 'generated', 'wide')")
+    parser.add_argument('--quick', action = 'store_true', help = 'shorter rounds (less precise, for a fast check)')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'number of rounds per benchmark')
+    Config.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        config = Config.load(args = args)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    names = [name for name in args.only.split(',') if name]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    pg.display.init()
+    pg.font.init()
+    pg.display.set_mode((WIDTH, HEIGHT))
+
+    scenes = build_scenes(args.scenes.split(','))
+    min_time = 0.02 if args.quick else 0.2
+    repeat = 3 if args.quick else args.repeat
+
+    results = run_benchmarks(names, scenes, min_time, repeat, config)
+
+    with open(args.output, 'w') as file:
+        json.dump({'metadata': environment_metadata(), 'settings': {'min_time': min_time, 'repeat': repeat}, 'config': config.as_dict(),
+                   'results': results}, file, indent = 2)
+
+    print(f'Results written to {args.output}')
+    pg.quit()
+
+if __name__ == '__main__':
+    main()
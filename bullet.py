@@ -1,9 +1,39 @@
 import math
+import numpy as np
 from parameters import get_parameters
+from entities import Column
 import pygame as pg
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
+#Time step of the motion of the bullets (per tick)
+DELTA_T = 0.5
+
+#Number of ticks of flight followed by the impact prediction
+MAX_FLIGHT_TICKS = 400
+
+def path(x0, y0, vx, vy, steps):
+
+    '''
+    Computes the positions of a bullet after a number of steps of Bullet.update, in closed form:
+    x(t) = x0 + vx*t and y(t) = y0 + vy*t + g*t^2/2 - g*dt*t, with t = steps*dt. The arguments can be NumPy arrays
+    (e.g. the initial velocities of many bullets as a column and the steps as a row).
+
+    Parameters:
+
+        - x0, y0 (float):           the initial position of the bullet
+        - vx, vy (float or ndarray): the initial velocity of the bullet
+        - steps (int or ndarray):    the number of steps
+
+    Returns:
+
+        - xs, ys: the positions of the bullet
+    '''
+
+    t = steps*DELTA_T
+
+    return x0 + vx*t, y0 + vy*t + 0.5*gravity*t**2 - gravity*DELTA_T*t
+
 class Bullet:
 
 
@@ -23,10 +53,18 @@ class Bullet:
         - gravity (float):     the acceleration due to gravity
         - delta_t (float):     the time step for the simulation
         - rect (pygame.Rect):  the rectangle object that represents the bullet in the game window
+        - ticks (int):         the number of updates of the bullet since it was fired
+        - path_x, path_y (ndarray): the predicted positions of the bullet at every tick, until its impact (see predict_impact)
+        - impact (tuple):      the predicted point where the bullet is destroyed by an obstacle or leaves the window
+        - impact_tick (int):   the tick of the flight at which it happens
+        - danger_zones (dict): the parts of the lanes of the level the bullet goes through (see Navigation.danger_zones),
+                               None if they are not known
 
     Methods:
 
         - update:                 updates the position of the bullet based on its current velocity and acceleration. It updates the rect object too
+        - update_rect:            moves the rect object to the position of the bullet
+        - predict_impact:         predicts the path of the bullet until it is destroyed by an obstacle or leaves the window
         - draw_bullet:            draws the bullet on a given window surface
         - check_bullet_collision: checks if the bullet has collided with any obstacles or tanks, and updates the game accordingly.
 
@@ -41,9 +79,11 @@ class Bullet:
         self.vx = v0 * math.cos(self.theta)
         self.vy = - v0 * math.sin(self.theta)
         self.gravity = gravity
-        self.delta_t = 0.5
+        self.delta_t = DELTA_T
         self.rect = pg.Rect(self.x, self.y, 7, 7)
-        
+        self.ticks = 0
+        self.path_x = self.path_y = self.impact = self.impact_tick = None
+        self.danger_zones = None
 
     def update(self):
 
@@ -59,10 +99,45 @@ class Bullet:
         self.x += self.vx * self.delta_t
         self.y += self.vy * self.delta_t - 0.5 * self.gravity * self.delta_t ** 2
         self.vy += self.gravity * self.delta_t
+        self.ticks += 1
 
-        self.rect = pg.Rect(self.x, self.y, 7, 7)
+        self.update_rect()
+
+    def update_rect(self):
 
-    def draw_bullet(self, WINDOW, color = 'RED'):
+        #Updating the rect in place (no new Rect every frame)
+        self.rect.update(self.x, self.y, 7, 7)
+
+    def predict_impact(self, obstacles):
+
+        '''
+        Predicts, once (when the bullet is fired), its positions at every tick until it is destroyed by an obstacle
+        or leaves the world, from the closed form of its trajectory (see path): the tanks it may hit on the way
+        are not taken into account, so they can use the prediction to get out of its way.
+
+        Parameters:
+
+            - obstacles (Obstacles): the obstacles of the level
+
+        Returns: None
+        '''
+
+        steps = np.arange(1, MAX_FLIGHT_TICKS + 1)
+        xs, ys = path(self.x, self.y, self.vx, self.vy, steps)
+
+        #Destroyed as in check_bullet_collision (the obstacles are only checked inside the world)
+        left_world = (ys > FLOOR_POS[1]) | (ys < 0) | (xs > obstacles.width)
+        destroyed = left_world.copy()
+        inside = ~left_world
+        destroyed[inside] = obstacles.collide_rects(xs[inside], ys[inside], 7, 7)
+
+        last = int(np.argmax(destroyed)) if destroyed.any() else MAX_FLIGHT_TICKS - 1
+
+        self.path_x, self.path_y = xs[:last + 1], ys[:last + 1]
+        self.impact = (float(xs[last]), float(ys[last]))
+        self.impact_tick = last + 1
+
+    def draw_bullet(self, WINDOW, color = 'RED', camera_x = 0, scale = 1):
 
         '''
         Draws the bullet on a given window surface. 
@@ -71,41 +146,70 @@ class Bullet:
 
             - WINDOW (pygame.Surface): the window surface to draw on
             - color (str):             the color to use for the bullet (default: 'RED')
+            - camera_x (int):          the x-coordinate of the left side of the view (see camera, default: 0)
+            - scale (float):           the render scale of the surface (see game, default: 1)
 
         Returns: None
         '''
 
-        pg.draw.rect(WINDOW, COLORS[color], self.rect)
+        size = max(round(7*scale), 1)
+        pg.draw.rect(WINDOW, COLORS[color], ((self.rect.x - camera_x)*scale, self.rect.y*scale, size, size))
 
     def check_bullet_collision(self, obstacles, tank):
 
         
         '''
-        Checks if the bullet has collided with any obstacles or tank, and updates the game accordingly.
+        Checks if the bullet has collided with any obstacles or tank, and updates the game accordingly
+        (the tank takes the damage, the obstacle gets a crater).
 
         Parameters:
         
             - obstacles (list): a list of Obstacle objects that the bullet could potentially collide with
-            - tank (Tank):      the tank object that the bullet could potentially collide with
+            - tank (Tank):      the tank object that the bullet could potentially collide with (None if there is none)
 
         Returns: None
         '''
 
         #Checking collision with tank and updating tank health accordingly
-        if self.rect.colliderect(tank.rect):
+        if tank is not None and self.rect.colliderect(tank.rect):
             tank.handle_bullet_hit(self.bullet_damage)
             return True
 
-        #Checking collision with obstacles and updating obstacle
-        for obstacle in obstacles.obstacles:
-            if self.rect.colliderect(obstacle):
-                return True
+        #Checking collision with obstacles and carving a crater where the bullet hits
+        if obstacles.colliderect(self.rect):
+            obstacles.carve(self.x + 3.5, self.y + 3.5)
+            return True
 
         #Checking if bullet has gone out of bounds
         if (self.y > FLOOR_POS[1] or self.y < 0):
             return True
         
-        elif self.x > WIDTH:
+        elif self.x > obstacles.width:
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+class StoredBullet(Bullet):
+
+    '''
+    A bullet whose position, velocity and ticks are stored in the row of the tank that fired it (see entities.TankStore),
+    so the bullets in flight of all the enemies can be moved at once (see enemy.update_enemies).
+    A tank has at most one bullet in flight, so the row is free until the bullet is destroyed.
+
+    Attributes (besides the ones of Bullet):
+
+        - store (TankStore):    the store of the tank that fired the bullet
+        - index (int):          the row of the tank in the store
+
+    '''
+
+    x = Column('bullet_x')
+    y = Column('bullet_y')
+    vx = Column('bullet_vx')
+    vy = Column('bullet_vy')
+    ticks = Column('bullet_ticks')
+
+    def __init__(self, tank, x0, y0, v0, angle):
+        self.store = tank.store
+        self.index = tank.index
+        super().__init__(x0, y0, v0, angle)
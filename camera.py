@@ -0,0 +1,104 @@
+from navigation import TANK_SIZE
+from config import DEFAULT_CONFIG
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Camera of the game. A level (its world) can be wider than the window (see the 'width' of the level files):
+the window shows the part of the world around the player, and the camera follows the player tank.
+
+Only what is in the view of the camera (plus a margin) is drawn. The world is also split into chunks (vertical strips
+of CHUNK_WIDTH pixels): the enemies of the chunks in the view (plus the margin) think (aim, move and fire) every tick,
+and the ones of the far chunks only one tick every FAR_TICK_INTERVAL (the chunks take turns, so their work is spread
+over the ticks). The bullets in flight always move every tick. The cost of a frame then depends on what is near the
+camera, not on the size of the world.
+
+'''
+
+#Width (in pixels) of the chunks of the world
+CHUNK_WIDTH = 550
+
+#The enemies of the far chunks think one tick out of FAR_TICK_INTERVAL (by default, see config)
+FAR_TICK_INTERVAL = DEFAULT_CONFIG.far_tick_interval
+
+#Margin (in pixels) around the view, in which the entities are drawn and the enemies think every tick
+MARGIN = 200
+
+#Horizontal position of the player tank in the view (as a fraction of the width of the window)
+FOLLOW_X = 0.3
+
+class Camera:
+
+    '''
+    The part of the world shown in the window.
+
+    Attributes:
+
+        - x (int):              the x-coordinate (in the world) of the left side of the view
+        - world_width (int):    the width of the world
+        - ticks (int):          the number of ticks since the level started (to know which far chunks think)
+        - far_tick_interval (int): the enemies of the far chunks think one tick out of far_tick_interval
+
+    Methods:
+
+        - reset:        places the camera at the start of a new world
+        - follow:       moves the camera with the player tank (once per tick)
+        - view:         returns the part of the world in the view, with the margin
+        - thinking:     returns which enemies think in the current tick
+
+    '''
+
+    def __init__(self, world_width = WIDTH, far_tick_interval = FAR_TICK_INTERVAL):
+        self.x = 0
+        self.world_width = world_width
+        self.ticks = 0
+        self.far_tick_interval = far_tick_interval
+
+    def reset(self, world_width):
+        self.x = 0
+        self.world_width = world_width
+        self.ticks = 0
+
+    def follow(self, tank):
+
+        '''
+        Moves the camera so the player tank is at FOLLOW_X of the view, without showing anything out of the world.
+        It is called once per tick (it counts the ticks).
+
+        Parameters:
+
+            - tank (Tank): the player tank
+
+        Returns: None
+        '''
+
+        self.x = int(min(max(tank.x + tank.size/2 - FOLLOW_X*WIDTH, 0), self.world_width - WIDTH))
+        self.ticks += 1
+
+    def view(self, margin = MARGIN):
+        return self.x - margin, self.x + WIDTH + margin
+
+    def thinking(self, rows, xs):
+
+        '''
+        Finds which enemies think in the current tick: the ones near the view (every tick) and the ones of the far chunks
+        whose turn it is. When the whole world fits in the window, all the enemies think.
+
+        Parameters:
+
+            - rows (ndarray):   the rows of the enemies (in their store)
+            - xs (ndarray):     the x-coordinates of the enemies (of these rows)
+
+        Returns:
+
+            - ndarray: the rows of the enemies that think in the current tick
+        '''
+
+        if self.world_width <= WIDTH:
+            return rows
+
+        left, right = self.view()
+        near = (xs + TANK_SIZE > left) & (xs < right)
+
+        return rows[near | ((xs // CHUNK_WIDTH + self.ticks) % self.far_tick_interval == 0)]
@@ -0,0 +1,255 @@
+import os
+import sys
+import zlib
+import shlex
+import queue
+import struct
+import threading
+import subprocess
+import numpy as np
+
+'''
+Capture of the frames of the game to disk (e.g. for a bug report or a video of a session), without stalling the game loop.
+
+Every frame presented by the game loop (see GameLoop) is copied from the window surface through its buffer view
+(Surface.get_view, a single copy of the 32-bit pixels) into a bounded queue. A background thread converts the frames
+to RGB and writes them, so the loop only pays for the copy. The writer leaves the game loop the interpreter and the CPU:
+the PNG files are compressed with zlib (which releases the GIL, unlike pygame.image.save) and, where the system allows
+it, the thread runs at the lowest scheduling priority. The output is given by its path:
+
+    - a directory (any other path): a PNG sequence (frame_000001.png, frame_000002.png, ...)
+    - a .rgb or .raw file:          the raw RGB frames (width*height*3 bytes each), one after the other
+    - '|command':                   the raw RGB frames piped to a local encoder, e.g.
+                                    '|ffmpeg -y -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {fps} -i - session.mp4'
+                                    ({width}, {height} and {fps} are replaced by the ones of the capture)
+
+When the writer falls behind and the queue is full, the policy decides:
+
+    - 'drop':   the frame is dropped (and counted), so the game never waits for the writer (for a live session)
+    - 'block':  the game loop waits for a free slot, so no frame is lost (e.g. to capture a replay, see replay)
+
+'''
+
+POLICIES = ('drop', 'block')
+
+PNG_NAME = 'frame_{:06d}.png'
+
+RAW_EXTENSIONS = ('.rgb', '.raw')
+
+#zlib level of the PNG files (the higher levels are much slower for little gain on the frames of the game)
+PNG_COMPRESSION = 3
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+#Lowest scheduling priority of the writer thread (nice value)
+WRITER_NICENESS = 19
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)))
+
+def write_png(path, rgb):
+
+    '''
+    Writes an RGB image to a PNG file (8 bits per channel, no filtering). The image is compressed with zlib, which
+    releases the GIL, so the other threads (e.g. the game loop) keep running meanwhile.
+
+    Parameters:
+
+        - path (str):       the file
+        - rgb (ndarray):    the image (rows, columns, 3), of uint8
+
+    Returns: None
+    '''
+
+    height, width = rgb.shape[:2]
+
+    #Every row starts with its filter type (0, none)
+    rows = np.zeros((height, width*3 + 1), dtype = np.uint8)
+    rows[:, 1:] = rgb.reshape(height, width*3)
+
+    with open(path, 'wb') as file:
+        file.write(PNG_SIGNATURE)
+        file.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(png_chunk(b'IDAT', zlib.compress(rows, PNG_COMPRESSION)))
+        file.write(png_chunk(b'IEND', b''))
+
+class FrameCapture:
+
+    '''
+    Captures the frames of the window surface and writes them in a background thread.
+
+    Attributes:
+
+        - path (str):           the output (a directory, a file, or '|command')
+        - width (int):          the width of the frames
+        - height (int):         the height of the frames
+        - fps (int):            the frame rate given to the encoder
+        - policy (str):         what happens to a frame when the queue is full (see POLICIES)
+        - queue (Queue):        the frames waiting to be written (None marks the end of the capture)
+        - channels (list):      the bytes of the red, green and blue channels in a 32-bit pixel of the window
+        - captured (int):       the number of frames written
+        - dropped (int):        the number of frames dropped by the game loop (the queue was full, or the output had failed)
+        - failed (int):         the number of frames the writer could not write
+        - error (Exception):    the error of the output (None if there was none)
+        - file (file):          the raw output file, or the stdin of the encoder (None for a PNG sequence)
+        - process (Popen):      the encoder (None if the frames are not piped)
+        - writer (Thread):      the writer thread
+
+    Methods:
+
+        - capture:  copies a frame of the window surface to the queue
+        - write:    writes the frames of the queue (the writer thread)
+        - close:    writes the remaining frames and closes the output
+        - report:   returns the number of frames captured and dropped
+
+    '''
+
+    def __init__(self, path, width, height, fps = 60, policy = 'drop', queue_size = 30):
+        if policy not in POLICIES:
+            raise ValueError(f'unknown capture policy {policy!r} (one of {", ".join(POLICIES)})')
+
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.policy = policy
+        self.queue = queue.Queue(maxsize = queue_size)
+        self.channels = None
+        self.captured = self.dropped = self.failed = 0
+        self.error = None
+        self.file = self.process = None
+
+        if path.startswith('|'):
+            command = path[1:].format(width = width, height = height, fps = fps)
+            self.process = subprocess.Popen(shlex.split(command), stdin = subprocess.PIPE)
+            self.file = self.process.stdin
+
+        elif os.path.splitext(path)[1].lower() in RAW_EXTENSIONS:
+            self.file = open(path, 'wb')
+
+        else:
+            os.makedirs(path, exist_ok = True)
+
+        self.writer = threading.Thread(target = self.write, name = 'frame-writer', daemon = True)
+        self.writer.start()
+
+    def capture(self, surface):
+
+        '''
+        Copies the pixels of a frame (through the buffer view of the surface) to the queue of the writer. If the queue
+        is full, the frame is dropped or the call waits, depending on the policy.
+
+        Parameters:
+
+            - surface (Surface): the window surface (32 bits per pixel, of the size of the capture)
+
+        Returns: None
+        '''
+
+        if self.error is not None:
+            self.dropped += 1
+            return
+
+        if self.channels is None:
+            little = sys.byteorder == 'little'
+            self.channels = [shift//8 if little else 3 - shift//8 for shift in surface.get_shifts()[:3]]
+
+        #A copy of the mapped pixels (columns first, as the surface is indexed)
+        pixels = np.array(surface.get_view('2'))
+
+        if self.policy == 'block':
+            self.queue.put(pixels)
+            return
+
+        try:
+            self.queue.put_nowait(pixels)
+        except queue.Full:
+            self.dropped += 1
+
+    def write(self):
+
+        '''
+        Writes the frames of the queue until the end of the capture (run by the writer thread). After an error of the
+        output, the frames are discarded (so the game loop is never blocked by a broken output).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        #The lowest priority, so the writer only uses the CPU the game leaves (on Linux, where every thread has its own;
+        #elsewhere it would change the priority of the whole process)
+        if sys.platform.startswith('linux'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WRITER_NICENESS)
+            except OSError:
+                pass
+
+        while True:
+            pixels = self.queue.get()
+            if pixels is None:
+                break
+
+            if self.error is not None:
+                self.failed += 1
+                continue
+
+            #Rows first, and the red, green and blue bytes of every pixel (a channel at a time, much faster than fancy indexing)
+            channels = pixels.T.view(np.uint8).reshape(self.height, self.width, 4)
+            rgb = np.empty((self.height, self.width, 3), dtype = np.uint8)
+            for i, channel in enumerate(self.channels):
+                rgb[:, :, i] = channels[:, :, channel]
+
+            try:
+                if self.file is None:
+                    write_png(os.path.join(self.path, PNG_NAME.format(self.captured + 1)), rgb)
+                else:
+                    self.file.write(rgb.data)
+
+                self.captured += 1
+
+            except OSError as error:
+                self.error = error
+                self.failed += 1
+
+    def close(self):
+
+        '''
+        Waits for the writer to write the frames of the queue, then closes the output (and waits for the encoder).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        self.queue.put(None)
+        self.writer.join()
+
+        try:
+            if self.file is not None:
+                self.file.close()
+        except OSError as error:
+            self.error = self.error or error
+
+        if self.process is not None and self.process.wait() != 0:
+            self.error = self.error or OSError(f'the encoder exited with status {self.process.returncode}')
+
+    def report(self):
+
+        '''
+        Returns the number of frames captured and dropped (and the error of the output, if any).
+
+        Parameters: None
+
+        Returns:
+
+            - str: the report
+        '''
+
+        output = 'the encoder' if self.process is not None else self.path
+        report = f'Captured {self.captured} frames to {output} ({self.dropped + self.failed} dropped, policy {self.policy})'
+
+        if self.error is not None:
+            report += f': {self.error}'
+
+        return report
@@ -0,0 +1,242 @@
+import os
+import json
+import argparse
+import numpy as np
+
+'''
+Runtime configuration of the game: the tunables that used to be spread over the modules (the frame cap, the speeds
+of the tanks, the size of the search of the enemy solver, ...) and the debug options. A Config is passed explicitly to
+the game (see Game), which passes it on to the objects of the levels and to the enemy solver, so several configurations
+can be used side by side in one process (e.g. the variants of a benchmark).
+
+A configuration is read, each source overriding the previous ones, from:
+
+    - the defaults (see FIELDS)
+    - a JSON file with some of the fields (given with --config, or with the environment variable TANK_CONFIG)
+    - the environment variables TANK_<FIELD> (e.g. TANK_FPS=30, TANK_RENDER_SCALE=0.5, TANK_ENDLESS=1)
+    - the command-line flags --<field> (e.g. --fps 30, --render-scale 0.5, --endless)
+
+The geometry of the window and the physics of the bullets (see parameters and bullet) are not part of it:
+the levels are designed for them, and both players of a versus game have to share them.
+
+'''
+
+#The fields of the configuration: name, type, default value and description
+FIELDS = (
+    ('fps', int, 60, 'frame cap of the game (0 for an uncapped frame rate)'),
+    ('endless', bool, False, 'go on with generated levels after the last level'),
+    ('render_scale', float, 1.0, 'scale the world is drawn at before it is scaled to the window (e.g. 0.5)'),
+    ('track_allocs', bool, False, 'report the objects retained per frame by the main loop and the peak of the frames'),
+    ('profile', bool, False, 'enable the frame profiler (F3 shows its overlay)'),
+    ('profile_csv', str, None, 'CSV file the per-frame timings of the profiler are streamed to'),
+    ('startup_report', bool, False, 'print the time to the first frame, by stage (imports, display, assets, level)'),
+    ('capture', str, None, "capture the frames to a directory (PNG), a .rgb/.raw file or '|command' (an encoder), see capture"),
+    ('capture_policy', str, 'drop', "when the writer of the capture falls behind: 'drop' the frames or 'block' the game"),
+    ('capture_queue', int, 30, 'frames the capture can hold while they wait to be written'),
+    ('tank_speed', int, 3, 'speed of the player tank (pixels per tick)'),
+    ('enemy_speed', int, 2, 'speed of the enemy tanks (pixels per tick)'),
+    ('solver_velocities', int, 21, 'number of initial velocities (from 1 to 41) tried by the enemy solver'),
+    ('solver_flight_step', int, 4, 'ticks between the flight times tried by the intercept solver'),
+    ('far_tick_interval', int, 4, 'the enemies far from the view think one tick out of this many (see camera)'),
+    ('threat_updates', int, 2, 'enemies whose threat map row is computed again per frame (see threat_map)'),
+)
+
+#Range of the initial velocities tried by the enemy solver (adapted to the size of the window)
+MIN_VELOCITY = 1
+MAX_VELOCITY = 41
+
+#Longest flight (in ticks) tried by the intercept solver
+MAX_SOLVER_FLIGHT = 170
+
+#The render scales must turn SCALE_GRID pixels of the world into whole pixels (e.g. 0.5, 0.75, but not 0.33, see game)
+SCALE_GRID = 20
+
+ENV_PREFIX = 'TANK_'
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off', '')
+
+def parse_value(name, kind, value):
+
+    '''
+    Converts the value of a field read from a file, the environment or the command line to the type of the field.
+
+    Parameters:
+
+        name (str) :    The name of the field (for the error messages).
+        kind (type) :   The type of the field.
+        value :         The value (a string, or a value already parsed from JSON).
+
+    Returns:
+
+        The value, of the type of the field (None stays None).
+
+    '''
+
+    if value is None:
+        return None
+
+    if kind is bool and isinstance(value, str):
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f'{name}: {value!r} is not a boolean')
+
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f'{name}: {value!r} is not an integer')
+
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: {value!r} is not a valid {kind.__name__}') from None
+
+class Config:
+
+    '''
+    The configuration of a run of the game. Its fields are the ones of FIELDS (e.g. config.fps, config.tank_speed),
+    and the tables of the enemy solver are derived from them.
+
+    Attributes (besides the fields):
+
+        - velocities (ndarray):     the initial velocities tried by the enemy solver (see enemy)
+        - flight_ticks (ndarray):   the flight times (in ticks) tried by the intercept solver (see enemy)
+
+    Methods:
+
+        - update:           changes some fields
+        - replace:          returns a copy with some fields changed
+        - as_dict:          returns the fields as a dictionary (e.g. to record them with the results of a benchmark)
+        - load:             reads a configuration from a file, the environment and the command-line flags (class method)
+        - add_arguments:    adds the command-line flags of the fields to a parser (static method)
+
+    '''
+
+    __slots__ = tuple(name for name, kind, default, description in FIELDS) + ('velocities', 'flight_ticks')
+
+    def __init__(self, **values):
+        for name, kind, default, description in FIELDS:
+            setattr(self, name, default)
+        self.update(values)
+
+    def __repr__(self):
+        return 'Config(' + ', '.join(f'{name} = {value!r}' for name, value in self.as_dict().items()) + ')'
+
+    def update(self, values):
+
+        '''
+        Changes some fields, converting their values to the types of the fields, and checks them.
+
+        Parameters:
+
+            values (dict) : The new values, by field.
+
+        Returns: None
+        '''
+
+        kinds = {name: kind for name, kind, default, description in FIELDS}
+
+        for name, value in values.items():
+            if name not in kinds:
+                raise ValueError(f'unknown configuration field {name!r}')
+            setattr(self, name, parse_value(name, kinds[name], value))
+
+        for name in ('tank_speed', 'enemy_speed', 'solver_flight_step', 'far_tick_interval', 'threat_updates'):
+            if getattr(self, name) < 1:
+                raise ValueError(f'{name}: it must be at least 1')
+
+        if self.capture_policy not in ('drop', 'block'):
+            raise ValueError(f"capture_policy: {self.capture_policy!r} must be 'drop' or 'block'")
+
+        if self.capture_queue < 1:
+            raise ValueError('capture_queue: it must be at least 1')
+
+        if self.fps < 0:
+            raise ValueError('fps: it must be 0 (uncapped) or positive')
+
+        scale = self.render_scale
+        if not 0 < scale <= 1 or abs(scale*SCALE_GRID - round(scale*SCALE_GRID)) > 1e-9:
+            raise ValueError(f'render_scale: {scale} must be in (0, 1] and a multiple of {1/SCALE_GRID}')
+
+        if self.solver_velocities < 2:
+            raise ValueError('solver_velocities: it must be at least 2')
+
+        self.velocities = np.linspace(MIN_VELOCITY, MAX_VELOCITY, self.solver_velocities)
+        self.flight_ticks = np.arange(2, MAX_SOLVER_FLIGHT, self.solver_flight_step)
+
+    def replace(self, **values):
+        config = Config(**self.as_dict())
+        config.update(values)
+        return config
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name, kind, default, description in FIELDS}
+
+    @classmethod
+    def load(cls, path = None, environ = None, args = None):
+
+        '''
+        Reads a configuration: the defaults, overridden by the fields of a JSON file, by the environment variables
+        TANK_<FIELD> and by the command-line flags (see add_arguments), in this order.
+
+        Parameters:
+
+            path (str) :            The JSON file (None to use the one of TANK_CONFIG, or the one of the flags, if any).
+            environ (dict) :        The environment variables (os.environ by default).
+            args (Namespace) :      The parsed command-line flags (None if there are none).
+
+        Returns:
+
+            Config : The configuration.
+
+        '''
+
+        environ = os.environ if environ is None else environ
+        flags = {} if args is None else dict(vars(args))
+
+        path = path or flags.pop('config', None) or environ.get(ENV_PREFIX + 'CONFIG')
+        flags.pop('config', None)
+
+        config = cls()
+
+        if path:
+            with open(path) as file:
+                values = json.load(file)
+            if not isinstance(values, dict):
+                raise ValueError(f'{path}: the configuration file must contain a JSON object')
+            config.update(values)
+
+        config.update({name: environ[ENV_PREFIX + name.upper()] for name, kind, default, description in FIELDS
+                       if ENV_PREFIX + name.upper() in environ})
+
+        config.update({name: flags[name] for name, kind, default, description in FIELDS if flags.get(name) is not None})
+
+        return config
+
+    @staticmethod
+    def add_arguments(parser):
+
+        '''
+        Adds to a command-line parser the flag --config (the JSON file) and a flag per field (--fps, --render-scale, ...;
+        the boolean fields have --<field> and --no-<field>). The flags not given are left out of the parsed arguments,
+        so they do not override the file or the environment (see load).
+
+        Parameters:
+
+            parser (ArgumentParser) :   The parser.
+
+        Returns: None
+        '''
+
+        group = parser.add_argument_group('configuration', 'Override the defaults, the TANK_CONFIG file and the TANK_<FIELD> environment variables.')
+        group.add_argument('--config', metavar = 'PATH', help = 'JSON file with some of the fields of the configuration')
+
+        for name, kind, default, description in FIELDS:
+            flag = '--' + name.replace('_', '-')
+
+            if kind is bool:
+                group.add_argument(flag, action = argparse.BooleanOptionalAction, default = None, help = description)
+            else:
+                group.add_argument(flag, type = kind, default = None, metavar = name.upper(), help = f'{description} (default {default})')
+
+DEFAULT_CONFIG = Config()
@@ -1,5 +1,7 @@
-import pygame as pg
-from bullet import Bullet
+from bullet import StoredBullet, DELTA_T, path
+from assets import load_image
+from entities import BaseTank, Column, TEAM_ENEMY
+from config import DEFAULT_CONFIG
 import math
 import numpy as np
 import random
@@ -8,145 +10,92 @@ from parameters import get_parameters
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
-class EnemyTank:
+#Initial velocities tried by the solver, and flight times (in ticks) tried by the intercept solver, by default
+#(the game passes its configuration to the solver, see config)
+VELOCITIES = DEFAULT_CONFIG.velocities
+FLIGHT_TICKS = DEFAULT_CONFIG.flight_ticks
+
+class EnemyTank(BaseTank):
 
     '''
     Represents an enemy tank in the game. It is used to handle the movement and shooting of the enemy tank.
+    Its numeric fields are stored in a TankStore (see entities).
+
+    Attributes (besides the ones of BaseTank):
+
+        - moving_steps (int):             the number of steps the tank has to move (stored)
+        - direction (int):                the direction the tank is moving, 1 for right, -1 for left (stored)
+        - loading_time (int):             the time it takes for the tank to reload after firing, in ms (stored)
+        - loaded (bool):                  True if the tank has reloaded and can fire, False otherwise (stored, as 0 or 1)
+        - lane (Lane):                    the lane of the level the tank stands on (see navigation), None if not placed
+
+    Methods (besides the ones of BaseTank):
 
-    Attributes:
-
-        - hp (int):                       the health points of the tank
-        - size (int):                     the size of the tank
-        - x (int):                        the x-coordinate of the top-left corner of the tank
-        - y (int):                        the y-coordinate of the top-left corner of the tank
-        - tank_speed (int):               the speed at which the tank moves
-        - moving_steps (int):             the number of steps the tank has to move
-        - direction (int):                the direction the tank is moving (1 for right, -1 for left)
-        - firing_power (float):           the power of the tank's next shot
-        - firing_angle (float):           the angle at which the tank will fire its next shot
-        - firing (bool):                  True if the tank is currently firing, False otherwise
-        - got_hit (bool):                 True if the tank was hit by a projectile, False otherwise
-        - time_counter (int):             the number of game ticks that have passed since the tank last fired
-        - loading_time (int):             the time it takes for the tank to reload after firing
-        - TANK_IMAGE (Surface):           a Pygame Surface object representing the enemy tank's image
-        - TANK_EXPLOSION_IMAGE (Surface): a Pygame Surface object representing the image of an exploding tank
-        - rect (Rect):                    a Pygame Rect object representing the bounding box of the tank's image
-
-    Methods:
-
-        - draw_tank:                Draws the enemy tank on a given window surface
-        - draw_gun:                 Draws the gun of the tank on a given window surface
         - fire:                     Fires a bullet from the tank
         - get_possible_trajectory:  Computes the angle and power for the bullet trajectory that hits the player tank
+        - get_intercept_trajectory: Computes the angle and power for the bullet trajectory that meets the moving player tank
         - update_firing_angle :     Updates the firing angle of the tank
         - collision:                Checks if the bullet has collided with the list of obstacles
-        - handle_bullet_hit:        Handles the case when the bullet hits the tank
-        - draw_hp_bar:              Draws the health bar of the tank on a given window surface
+        - reload:                   Marks the tank as loaded (called by the scheduler when the loading time is over)
         - distance_to_obstacles:    Computes the distance to the nearest obstacle (left and rigth) from the tank's position
+        - choose_move:              Chooses the direction and the distance of the next move of the tank
+        - dodge:                    Chooses the move that gets the tank out of the way of a shell
         - move:                     Moves the tank in a given direction and a certain distance
 
     '''
 
-    def __init__(self, x0, y0, loading_time):
-        self.hp = 100
-        self.size = 70
-        self.x = x0
-        self.y = y0
-        self.tank_speed = 2
-        self.moving_steps = 0
-        self.direction = 1
-        self.firing_power = 0
-        self.firing_angle = 30
-        self.firing = False
-        self.got_hit = False
-        self.time_counter = 0
-        self.loading_time = loading_time
-        self.TANK_IMAGE = pg.transform.scale(pg.image.load(r'images\enemy_image.png'), (self.size, self.size))
-        self.TANK_EXPLOSION_IMAGE = pg.transform.scale(pg.image.load(r'images\enemy_tank_explosion.png'), (self.size, self.size))
-        self.rect = pg.Rect(self.x, self.y, self.size, self.size)
-
-    @property
-    def firing_x0(self):
-        return self.x + 0.4*self.size
-
-    @property
-    def firing_y0(self):
-        return self.y + 0.4*self.size
-    
-    def draw_tank(self, WINDOW):
-
-        '''
-        Draws the tank on a given window surface. It draws the tank's gun, firing angle, and health bar,
-        and then draws the tank itself, depending on whether it has been hit by a bullet or not.
-
-        Parameters:
-            - WINDOW (Surface): The window surface on which to draw the tank.
-
-        Returns:
-            - None
-    '''
-
-        self.rect = pg.Rect(self.x, self.y, self.size, self.size)
-        self.draw_gun(WINDOW)
-        self.draw_hp_bar(WINDOW)
-
-        if self.got_hit:
-            WINDOW.blit(self.TANK_EXPLOSION_IMAGE, self.rect)
-            self.got_hit = False
-
-        else:
-            WINDOW.blit(self.TANK_IMAGE, self.rect)
-
-    def draw_gun(self, WINDOW, gun_length = 20, gun_width = 5, gun_color = 'DARK_GREY'):
-
-        '''
-        Draws the tank's gun on a given window surface.
+    __slots__ = ('lane',)
 
-        Parameters:
-
-            - WINDOW (Surface):     The window surface on which to draw the gun.
-            - gun_length (float):   The length of the gun. Defaults to 20.
-            - gun_width (float):    The width of the gun. Defaults to 5.
-            - gun_color (str):      The color of the gun. Defaults to 'DARK_GREY'.
-
-        Returns: None
+    moving_steps = Column('moving_steps')
+    direction = Column('direction')
+    loading_time = Column('loading_time')
+    loaded = Column('loaded')
 
-        '''
+    #The gun is drawn flipped, as the enemies fire from right to left
+    GUN_ROTATION = 90
 
-        x0, y0 = self.firing_x0, self.firing_y0
-        theta = math.radians(self.firing_angle + 90)    #We add 90 degrees because the tank's gun is flipped
-        x, y = x0 + gun_length*math.cos(theta), y0 - gun_length*math.sin(theta)
-        pg.draw.line(WINDOW, COLORS[gun_color],(x0, y0), (x, y), width = gun_width)
+    def __init__(self, x0, y0, loading_time, store = None, tank_speed = DEFAULT_CONFIG.enemy_speed):
+        super().__init__(x0, y0, TEAM_ENEMY, store, tank_speed)
+        self.moving_steps = 0
+        self.direction = 1
+        self.loading_time = loading_time
+        self.loaded = False
+        self.lane = None
+        self.TANK_IMAGE = load_image('enemy_image.png', (self.size, self.size))
+        self.TANK_EXPLOSION_IMAGE = load_image('enemy_tank_explosion.png', (self.size, self.size))
 
-    def fire(self, tank_x0, tank_y0, obstacles):
+    def fire(self, tank, obstacles, config = DEFAULT_CONFIG):
 
         '''
         
-        Fires a bullet (if possible) from the tank. It computes the angle and initial velocity of firing needed to hit the player tank.
+        Fires a bullet (if possible) from the tank. It computes the angle and initial velocity of firing needed to hit the player tank
+        where it will be when the bullet arrives (see get_intercept_trajectory).
 
         Parameters:
 
-            - tank_x0 (float): The x coordinate of the player tank top-left corner.
-            - tank_y0 (float): The y coordinate of the player tank top-left corner.
-            - obstacles (list): A list of Obstacle objects.
+            - tank (Tank): The player tank.
+            - obstacles (Obstacles): The obstacles of the level.
+            - config (Config): The configuration of the game (the tables of the solver, see config).
 
         Returns: None
         
         '''
 
-        self.firing_angle, self.firing_power = self.get_possible_trajectory(tank_x0, tank_y0, obstacles)
+        firing_angle, firing_power = self.get_intercept_trajectory(tank, obstacles, config)
 
-        if self.firing_angle is None:
+        #No trajectory hits the player (the fields are stored as numbers, so None is not kept)
+        if firing_angle is None:
             self.firing = False
             self.firing_angle = 30
+            self.firing_power = 0
         
         else:
+            self.firing_angle, self.firing_power = firing_angle, firing_power
             self.firing = True
-            self.bullet = Bullet(
+            self.bullet = StoredBullet(self,
                 self.firing_x0, self.firing_y0, self.firing_power, self.firing_angle + 90) #We add 90 degrees because the bullet is fired from rigth to left
-            self.time_counter = 0
 
-    def get_possible_trajectory(self, tank_x0, tank_y0, obstacles):
+    def get_possible_trajectory(self, tank_x0, tank_y0, obstacles, config = DEFAULT_CONFIG):
 
         '''
 
@@ -158,6 +107,7 @@ class EnemyTank:
             - tank_x0 (float): The x coordinate of the player tank top-left corner.
             - tank_y0 (float): The y coordinate of the player tank top-left corner.
             - obstacles (list): A list of obstacles.
+            - config (Config): The configuration of the game (the velocities tried, see config).
 
         Returns:
 
@@ -165,10 +115,7 @@ class EnemyTank:
             - v (float): The initial velocity of the bullet.
         '''
         
-        #A range of velocities (adapted to the size of the window)
-        possible_v = np.linspace(1, 41, 21)
-
-        for v in possible_v:
+        for v in config.velocities:
 
             #The discriminant of the quadratic equation that determines the possible firing angles
             discriminant = (v**4) - (gravity*(gravity*tank_x0**2 + 2*tank_y0*v**2))
@@ -188,7 +135,69 @@ class EnemyTank:
         
         return None, None
     
-    def update_firing_angle(self, tank_x0, tank_y0, obstacles):
+    def get_intercept_trajectory(self, tank, obstacles, config = DEFAULT_CONFIG):
+
+        '''
+
+        Computes the angle and initial velocity of firing needed to hit the player tank where it will be when the bullet arrives,
+        assuming it keeps its velocity (see Tank.move) within the part of the world it can move in.
+
+        For every flight time of the configuration (FLIGHT_TICKS by default), the predicted position of the player fixes the only trajectory that reaches it
+        in that time. The ones with a firing angle in [0, 90] and a velocity in the range of its velocities are followed step by step
+        (the positions of Bullet.update, in closed form) and the first one, with the shortest flight, that is not destroyed
+        before the end of its flight (by an obstacle, or leaving the world) is chosen. All the flight times are evaluated
+        at once with NumPy.
+
+        Parameters:
+
+            - tank (Tank): The player tank.
+            - obstacles (Obstacles): The obstacles of the level.
+            - config (Config): The configuration of the game (the tables of the solver, see config).
+
+        Returns:
+
+            - theta (float): The firing angle (in degrees), None if no trajectory hits the player.
+            - v (float): The initial velocity of the bullet, None if no trajectory hits the player.
+        '''
+
+        x0, y0 = self.firing_x0, self.firing_y0
+
+        #Predicted top-left corner of the bullet when it hits the centre of the tank (the tank moves after every step but the first)
+        ticks = config.flight_ticks
+        tank_x = np.clip(tank.x + tank.vx*(ticks - 1), 0, tank.max_x - tank.size)
+        dx = tank_x + tank.size/2 - 3.5 - x0
+        dy = tank.y + tank.size/2 - 3.5 - y0
+
+        #Velocity that reaches it after the flight time: y(t) = y0 + vy*t + g*t^2/2 - g*dt*t, with t = ticks*dt
+        t = ticks*DELTA_T
+        vx = dx/t
+        vy = (dy - 0.5*gravity*t**2 + gravity*DELTA_T*t)/t
+        v = np.hypot(vx, vy)
+        theta = np.degrees(np.arctan2(-vy, vx)) - 90
+
+        valid = (theta >= 0) & (theta <= 90) & (v >= config.velocities[0]) & (v <= config.velocities[-1])
+        ticks, vx, vy, v, theta = ticks[valid], vx[valid], vy[valid], v[valid], theta[valid]
+
+        #Positions of the bullets at every step (rows: flight times, columns: steps)
+        steps = np.arange(1, ticks.max() + 1) if len(ticks) else np.arange(1)
+        xs, ys = path(x0, y0, vx[:, None], vy[:, None], steps)
+
+        #Bullets destroyed before the end of their flight: leaving the world, or hitting an obstacle (only checked for the others)
+        in_flight = steps <= ticks[:, None]
+        destroyed = (((ys > FLOOR_POS[1]) | (ys < 0) | (xs > obstacles.width)) & in_flight).any(axis = 1)
+        check = in_flight & ~destroyed[:, None]
+        hits = np.zeros(check.shape, dtype = bool)
+        hits[check] = obstacles.collide_rects(xs[check], ys[check], 7, 7)
+        destroyed |= hits.any(axis = 1)
+
+        clear = np.flatnonzero(~destroyed)
+
+        if len(clear):
+            return float(theta[clear[0]]), float(v[clear[0]])
+
+        return None, None
+
+    def update_firing_angle(self, tank_x0, tank_y0, obstacles, config = DEFAULT_CONFIG):
 
         '''
         Updates the firing angle of the enemy tank based on the position of the user tank and the obstacles. 
@@ -199,11 +208,12 @@ class EnemyTank:
             - tank_x0 (float): The x coordinate of the user tank.
             - tank_y0 (float): The y coordinate of the user tank.
             - obstacles (Obstacles): The list of obstacles objects.
+            - config (Config): The configuration of the game (the velocities tried, see config).
 
         Returns: None
         
         '''
-        theta, _ = self.get_possible_trajectory(tank_x0, tank_y0, obstacles)
+        theta, _ = self.get_possible_trajectory(tank_x0, tank_y0, obstacles, config)
 
         if theta is not None:
             self.firing_angle = theta
@@ -232,6 +242,7 @@ class EnemyTank:
 
         #Time step
         delta_t = 0.1
+        collidepoint = obstacles.collidepoint
 
         #While the bullet does not hit the ground
         while y < HEIGHT - 50:
@@ -242,141 +253,259 @@ class EnemyTank:
             vy += gravity * delta_t
 
             #Checking if the bullet collides with an obstacle
-            for obstacle in obstacles.obstacles:
-                if obstacle.collidepoint(x, y) :
-                    return True
+            if collidepoint(x, y):
+                return True
 
         #No collision   
         return False
     
-    def handle_bullet_hit(self, bullet_damage):
+    def reload(self):
+        self.loaded = True
 
-        '''
-        Updates the tank's health points and sets got_hit to True.
-        It is called when the tank is hit by a bullet.
+    def distance_to_obstacles(self):
 
-        Parameters:
-            - bullet_damage (int): The damage dealt by the bullet that hit the tank.
-
-        Returns: None
         '''
+        Computes the left and rigth distances to the nearest obstacle (including tanks) from the tank's position.
+        Only the obstacles on the same y-level as the tank interfere with it: they are the ends of its walkable span
+        and the neighbours on its lane (see navigation), so it is a lookup instead of a scan of the whole level.
+        It is used when handling the motion of the tank.
 
-        self.hp -= bullet_damage
-        self.got_hit = True
-
-    def draw_hp_bar(self, WINDOW):
+        Parameters: None
 
-        '''
-        Draws the tank's health bar on a given window surface.
-        It draws a green rectangle (representing the tank's current health) on top of a red rectangle (representing the tank's maximum health
-
-        Parameters:
-            - WINDOW (Surface): The window surface on which to draw the health bar.
+        Returns:
 
-        Returns: None
+            A tuple containing the minimum left and right distances to the nearest obstacle or enemy tank
+            (both 0 if the tank is not on a lane).
         '''
 
-        x0, y0 = self.x, self.y - 10
-        pg.draw.rect(WINDOW, COLORS['RED'], (x0, y0, self.size, 5))
-        pg.draw.rect(WINDOW, COLORS['GREEN'], (x0, y0, self.size*self.hp/100, 5))
+        if self.lane is None:
+            return 0, 0
 
-    def distance_to_obstacles(self, obstacles, other_enemies):
+        return self.lane.free_distances(self)
+    
+    def choose_move(self):
 
         '''
-        Computes the left and rigth distances to the nearest obstacle (including tanks) from the tank's position.
-        We need to check that the obstacle is on the same y-level as the tank, as they don't interfere with each other. 
-        It is used when handling the motion of the tank.
-
-        Parameters:
-
-            - obstacles:  a list of obstacles present in the game.
-            - other_enemies: a list of the enemies, excluding the tank itself.
+        Chooses the direction and the number of steps of the next move of the tank (when it is not moving).
+        It computes the distance to the nearest obstacle on the left and on the right of the tank,
+        and chooses a random distance in the direction of the greatest minimum distance, avoiding collisions or getting stuck.
 
-        Returns:
+        Parameters: None
 
-            A tuple containing the minimum left and right distances to the nearest obstacle or enemy tank.
+        Returns: None
         '''
- 
-        #Initial distance to the right wall
-        min_left_distance = 999999
-        min_right_distance = WIDTH - self.rect.right
 
-        for i, boundary in enumerate(obstacles.boundaries):
+        nearest_left, nearest_right = self.distance_to_obstacles()
 
-            #If the obstacle is on the same y level as the tank
-            if abs(self.y - obstacles.obstacles[i].centery) < 100:
+        #Case 1: moves to the right
+        if nearest_left < nearest_right:
+            self.direction = 1
+            moving_distance = random.randint(0, math.floor(nearest_right / 2)) #We divide by 2 to avoid collisions of two tanks moving in opposite directions
+            self.moving_steps = math.floor(moving_distance / self.tank_speed)
 
-                left_boundary, right_boundary = boundary
+        #Case 2: moves to the left
+        elif nearest_left > nearest_right:
+            self.direction = -1
+            moving_distance = random.randint(0, math.floor(nearest_left / 2))
+            self.moving_steps = math.floor(moving_distance / self.tank_speed)
 
-                #Right and left distances to the obstacle
-                right_distance = right_boundary - self.rect.right
-                left_distance = left_boundary - self.rect.left
+    def dodge(self, left, right):
 
-                #Updating the (right) minimum distance
-                if right_distance > 0 and right_distance < min_right_distance:
-                    min_right_distance = right_distance
-
-                #Updating the (left) minimum distance
-                if left_distance < 0 and abs(left_distance) < min_left_distance:
-                    min_left_distance = abs(left_distance)
+        '''
+        Chooses the move that gets the tank out of a danger zone of its lane (the part a shell goes through, see
+        Navigation.danger_zones): the shortest way out that fits in the free space around the tank,
+        or as far as possible if there is none.
 
-        for enemy in other_enemies:
+        Parameters:
 
-            #If the enemy is on the same y level as the tank
-            if enemy.y == self.y:
+            - left (float): The left border of the danger zone.
+            - right (float): The right border of the danger zone.
 
-                #For right distance
-                enemy_left, enemy_right = enemy.x, enemy.x + enemy.size
+        Returns: None
+        '''
 
-                #Right and left distances to the enemy
-                right_distance = enemy_left - self.rect.right
-                left_distance = enemy_right - self.rect.left
+        nearest_left, nearest_right = self.distance_to_obstacles()
+        ways_out = [(needed, direction, free) for needed, direction, free in
+                    ((right - self.x, 1, nearest_right), (self.x + self.size - left, -1, nearest_left)) if needed <= free]
 
-                #Updating the (right) minimum distance
-                if right_distance > 0 and right_distance < min_right_distance:
-                    min_right_distance = right_distance
+        if ways_out:
+            needed, direction, free = min(ways_out)
+        else:
+            needed, direction, free = max((nearest_right, 1, nearest_right), (nearest_left, -1, nearest_left))
 
-                #Updating the (left) minimum distance
-                if left_distance < 0 and abs(left_distance) < min_left_distance:
-                    min_left_distance = abs(left_distance)
+        self.direction = direction
+        self.moving_steps = min(math.ceil(needed / self.tank_speed), math.floor(free / self.tank_speed))
 
-        return min_left_distance, min_right_distance
-    
-    def move(self, obstacles, enemies):
+    def move(self):
 
         '''
         Moves the tank a random distance based on the distance to the nearest obstacle (including oder enemy tanks).
-        It computes the distance to the nearest obstacle on the left and on the right of the tank, 
-        and moves the tank in the direction of the greatest minimum distance, avoiding collisions or getting stuck.
-
-        Parameters:
+        If it is not moving, it chooses its next move first (see choose_move).
 
-            obstacles:  a list of obstacles present in the game.
-            enemies:    a list of enemies present in the game.
+        Parameters: None
 
         Returns: None
         '''
     
         #If not moving, we compute the moving distance and direction
         if self.moving_steps == 0:
-
-            nearest_left, nearest_right = self.distance_to_obstacles(obstacles, enemies)
-
-            #Case 1: moves to the right
-            if nearest_left < nearest_right:
-                self.direction = 1
-                moving_distance = random.randint(0, math.floor(nearest_right / 2)) #We divide by 2 to avoid collisions of two tanks moving in opposite directions
-                self.moving_steps = math.floor(moving_distance / self.tank_speed)
-            
-            #Case 2: moves to the left
-            elif nearest_left > nearest_right:
-                self.direction = -1
-                moving_distance = random.randint(0, math.floor(nearest_left / 2))
-                self.moving_steps = math.floor(moving_distance / self.tank_speed)
+            self.choose_move()
         
         #If moving, we update the tank's position, depending on the direction and the tank's speed
         if self.moving_steps > 0:
+            old_x = self.x
             self.x += self.direction*self.tank_speed
             self.moving_steps -= 1
+            self.lane.move(self, old_x)
+
+def aim_angles(dx, dy, velocities = VELOCITIES):
+
+    '''
+    Computes, for a group of enemies at once, the firing angle of the slowest of the velocities that reaches the player
+    (the same scan as EnemyTank.get_possible_trajectory, without checking the obstacles).
+    It is used to aim the guns between shots; the obstacles are checked when an enemy fires.
+
+    Parameters:
+
+        - dx (ndarray): The horizontal distances from the enemies to the player tank.
+        - dy (ndarray): The vertical distances from the enemies to the player tank.
+        - velocities (ndarray): The initial velocities tried (the ones of the configuration of the game, see config).
+
+    Returns:
+
+        - ndarray: The firing angles (in degrees), NaN for the enemies that cannot reach the player.
+    '''
+
+    dx, dy = dx[:, None], dy[:, None]
+    v2 = velocities**2
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+
+        #The discriminant and the two possible firing angles, for every enemy (rows) and velocity (columns)
+        discriminant = v2**2 - gravity*(gravity*dx**2 + 2*dy*v2)
+        root = np.sqrt(discriminant)
+        theta1 = np.degrees(np.arctan((v2 + root)/(gravity*dx)))
+        theta2 = np.degrees(np.arctan((v2 - root)/(gravity*dx)))
+
+    valid1 = (discriminant >= 0) & (theta1 >= 0) & (theta1 <= 90)
+    valid2 = (discriminant >= 0) & (theta2 >= 0) & (theta2 <= 90)
+
+    #The first velocity with a valid angle (the first angle is preferred, as in the scan)
+    enemies = np.arange(len(dx))
+    first = np.argmax(valid1 | valid2, axis = 1)
+    angles = np.where(valid1[enemies, first], theta1[enemies, first], theta2[enemies, first])
+
+    return np.where(valid1[enemies, first] | valid2[enemies, first], angles, np.nan)
+
+def update_enemies(enemies, tank, obstacles, navigation, scheduler, camera = None, config = DEFAULT_CONFIG):
+
+    '''
+    Updates all the enemies of a level for one tick. Instead of handling one enemy after another, every stage
+    (aiming, dodging, motion, firing, bullets, deaths) works on the columns of their TankStore at once, and the Python work
+    left is per event: an enemy that chooses a new move, fires, or has a bullet in flight.
+    The enemies must share a TankStore (as the enemies of a level do, see new_level).
+
+    With a camera, only the enemies that think in this tick (the ones near the view, and the ones of the far chunks
+    whose turn it is, see camera) aim, dodge, move and fire. The bullets in flight of all the enemies move every tick.
+
+    Parameters:
+
+        - enemies (list):           The enemy tanks (the dead ones are removed from it).
+        - tank (Tank):              The player tank.
+        - obstacles (Obstacles):    The obstacles of the level.
+        - navigation (Navigation):  The navigation of the level (the dead enemies are removed from it).
+        - scheduler (Scheduler):    The scheduler of the reloads.
+        - camera (Camera):          The camera of the game (None to update all the enemies every tick).
+        - config (Config):          The configuration of the game (the tables of the solver, see config).
+
+    Returns: None
+    '''
 
-    
\ No newline at end of file
+    if not enemies:
+        return
+
+    store = enemies[0].store
+    tanks = store.tanks
+    rows = np.fromiter((enemy.index for enemy in enemies), dtype = np.intp, count = len(enemies))
+    x, y = store.view('x'), store.view('y')
+    moving_steps, direction = store.view('moving_steps'), store.view('direction')
+    loaded, firing = store.view('loaded'), store.view('firing')
+    speed = store.view('tank_speed')
+
+    #The enemies that think in this tick
+    thinking = rows if camera is None else camera.thinking(rows, x[rows])
+
+    #Aiming at the player
+    angles = aim_angles(x[thinking] - tank.x, y[thinking] - tank.y, config.velocities)
+    aimed = ~np.isnan(angles)
+    store.view('firing_angle')[thinking[aimed]] = angles[aimed]
+
+    #Dodging the shell of the player: the enemies in a danger zone it has not left yet that are not already moving out of it
+    #choose a new move
+    if tank.firing and tank.bullet.danger_zones:
+        ticks = tank.bullet.ticks
+
+        for lane_y, zones in tank.bullet.danger_zones.items():
+
+            on_lane = thinking[y[thinking] == lane_y]
+            enemy_x = x[on_lane]
+            final_x = enemy_x + direction[on_lane]*moving_steps[on_lane]*speed[on_lane]
+
+            for left, right, first_tick, last_tick in zones:
+
+                if last_tick < ticks:
+                    continue
+
+                endangered = (enemy_x < right) & (enemy_x + EnemyTank.size > left) & (final_x < right) & (final_x + EnemyTank.size > left)
+
+                for row in on_lane[endangered].tolist():
+                    tanks[row].dodge(left, right)
+
+    #Choosing the next move of the enemies that are not moving (it depends on their neighbours, so one at a time)
+    for row in thinking[moving_steps[thinking] == 0].tolist():
+        tanks[row].choose_move()
+
+    #Moving the others one step, and updating their order on their lane and their hitbox (it is not only updated when they are drawn)
+    moving = thinking[moving_steps[thinking] > 0]
+    old_x = x[moving]
+    x[moving] += direction[moving]*speed[moving]
+    moving_steps[moving] -= 1
+
+    for row, x0 in zip(moving.tolist(), old_x.tolist()):
+        enemy = tanks[row]
+        enemy.lane.move(enemy, x0)
+        enemy.rect.x = enemy.x
+
+    #Firing, for the enemies that are loaded and not firing (the scheduler reloads them after their loading time)
+    for row in thinking[(loaded[thinking] != 0) & (firing[thinking] == 0)].tolist():
+        enemy = tanks[row]
+        enemy.fire(tank, obstacles, config)
+        enemy.loaded = False
+        scheduler.schedule(enemy.loading_time, enemy.reload)
+
+    #Moving the bullets in flight (of all the enemies)
+    flying = rows[firing[rows] != 0]
+    bullet_x, bullet_y = store.view('bullet_x'), store.view('bullet_y')
+    bullet_vx, bullet_vy = store.view('bullet_vx'), store.view('bullet_vy')
+    bullet_x[flying] += bullet_vx[flying]*DELTA_T
+    bullet_y[flying] += bullet_vy[flying]*DELTA_T - 0.5*gravity*DELTA_T**2
+    bullet_vy[flying] += gravity*DELTA_T
+    store.view('bullet_ticks')[flying] += 1
+
+    #Checking if they hit the player tank (or an obstacle, or left the world)
+    for row in flying.tolist():
+        enemy = tanks[row]
+        enemy.bullet.update_rect()
+
+        if enemy.bullet.check_bullet_collision(obstacles, tank):
+            enemy.firing = False
+            del enemy.bullet
+
+    #Removing the dead enemies, in one pass
+    dead = store.view('hp')[rows] <= 0
+
+    if dead.any():
+        for row in rows[dead].tolist():
+            navigation.remove(tanks[row])
+
+        enemies[:] = [enemy for enemy, is_dead in zip(enemies, dead.tolist()) if not is_dead]
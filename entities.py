@@ -0,0 +1,310 @@
+import math
+from array import array
+import numpy as np
+import pygame as pg
+from assets import scale_image
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Storage of the tanks. The numeric state of all the tanks of a level (position, velocity, health, gun, motion and reload
+timers, team, and the bullet in flight of the enemies) is kept in a TankStore: one typed array per field (struct of arrays), with one row per tank.
+A tank object (Tank or EnemyTank) is a thin view of its row: its fields are read and written through Column
+descriptors, and the rest of its state lives in __slots__, so a tank has no __dict__.
+
+The code that works on a single tank uses the attributes as before (tank.x, enemy.hp, ...), and the code that works
+on all the tanks at once can use the columns as NumPy arrays (see TankStore.view), without copying them.
+
+'''
+
+#Teams of the tanks
+TEAM_PLAYER = 0
+TEAM_ENEMY = 1
+
+class TankStore:
+
+    '''
+    The numeric fields of a group of tanks, as one typed array (of doubles) per field.
+
+    Attributes:
+
+        - capacity (int):   the number of rows of the arrays
+        - count (int):      the number of rows used
+        - columns (tuple):  the arrays, in the order of FIELDS
+        - tanks (list):     the tank of every row
+        - views (dict):     the cached NumPy views of the columns
+
+    Methods:
+
+        - allocate:     adds a row for a tank
+        - view:         returns a NumPy view of a column (only the rows used)
+        - release:      forgets the tanks of the store (when their level is discarded)
+
+    '''
+
+    FIELDS = ('x', 'y', 'vx', 'hp', 'firing_angle', 'firing_power', 'firing', 'moving_steps', 'direction', 'loading_time', 'loaded',
+              'team', 'tank_speed', 'bullet_x', 'bullet_y', 'bullet_vx', 'bullet_vy', 'bullet_ticks')
+
+    def __init__(self, capacity = 1):
+        self.capacity = max(capacity, 1)
+        self.count = 0
+        self.columns = tuple(array('d', bytes(8 * self.capacity)) for _ in self.FIELDS)
+        self.tanks = []
+        self.views = {}
+
+    def allocate(self, tank):
+
+        '''
+        Adds a row for a tank. When the store is full, the arrays are replaced by bigger copies
+        (so the NumPy views taken before are no longer valid).
+
+        Parameters:
+
+            - tank (BaseTank): the tank
+
+        Returns:
+
+            - int: the index of the row
+        '''
+
+        if self.count == self.capacity:
+            self.capacity *= 2
+            self.columns = tuple(column + array('d', bytes(8 * (self.capacity - len(column)))) for column in self.columns)
+            self.views.clear()
+
+        self.tanks.append(tank)
+        self.count += 1
+
+        return self.count - 1
+
+    def view(self, field):
+
+        '''
+        Returns a NumPy view of a column (writing to it writes to the tanks).
+
+        Parameters:
+
+            - field (str): the name of the field
+
+        Returns:
+
+            - ndarray: the values of the field of the tanks, by row
+        '''
+
+        view = self.views.get(field)
+
+        if view is None or len(view) != self.count:
+            view = self.views[field] = np.frombuffer(self.columns[self.FIELDS.index(field)], dtype = np.float64)[:self.count]
+
+        return view
+
+    def release(self):
+
+        '''
+        Forgets the tanks of the store. The tanks and their store reference each other, so without it they would only
+        be freed by a collection of the garbage collector (see Game.release_level).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        self.tanks.clear()
+        self.views.clear()
+
+class Column:
+
+    '''
+    Descriptor of a field of the tanks stored in their TankStore.
+    '''
+
+    __slots__ = ('field',)
+
+    def __init__(self, field):
+        self.field = TankStore.FIELDS.index(field)
+
+    def __get__(self, tank, owner = None):
+        if tank is None:
+            return self
+        return tank.store.columns[self.field][tank.index]
+
+    def __set__(self, tank, value):
+        tank.store.columns[self.field][tank.index] = value
+
+class BaseTank:
+
+    '''
+    The state and the behaviour shared by the player tank and the enemy tanks.
+
+    Attributes:
+
+        - store (TankStore):              the store that holds the numeric fields of the tank
+        - index (int):                    the row of the tank in the store
+        - x, y (float):                   the coordinates of the tank's top-left corner (stored)
+        - hp (float):                     the tank's health points (stored)
+        - firing_angle (float):           the angle at which the tank's gun is aimed (stored)
+        - firing_power (float):           the power of the tank's next shot (stored)
+        - firing (bool):                  whether the tank is currently firing or not (stored, as 0 or 1)
+        - team (float):                   the team of the tank, TEAM_PLAYER or TEAM_ENEMY (stored)
+        - tank_speed (float):             the speed at which the tank moves, in pixels per tick (stored)
+        - size (int):                     the size of the tank (shared by all the tanks)
+        - got_hit (bool):                 whether the tank shows the flash of a hit
+        - on_hit (function):              called with the tank when it is hit (None if nothing has to be done)
+        - flash_timer (Timer):            the timer that ends the flash of the last hit (None if there is no flash)
+        - bullet (Bullet):                the bullet fired by the tank (only while it is flying)
+        - TANK_IMAGE (Surface):           the image of the tank (shared by all the tanks of the same kind)
+        - TANK_EXPLOSION_IMAGE (Surface): the image of the tank when it is hit
+        - rect (Rect):                    the rectangular hitbox of the tank
+        - hp_bar_rect (Rect):             the (red) background rect of the health bar, updated in place (shared)
+        - hp_rect (Rect):                 the (green) rect of the health bar, updated in place (shared)
+
+    Methods:
+
+        - firing_x0:            returns the x-coordinate of the point from which the tank fires
+        - firing_y0:            returns the y-coordinate of the point from which the tank fires
+        - gun_angle:            returns the angle of the gun (and of the shots) in degrees, counterclockwise from the right
+        - draw_tank:            draws the tank on a given window surface
+        - draw_aim:             draws the aim of the tank, if it shows it (nothing by default)
+        - draw_gun:             draws the tank's gun on a given window surface
+        - handle_bullet_hit:    updates the tank's health points and sets got_hit to True
+        - draw_hp_bar:          draws the tank's health bar above the tank on a given window surface
+
+    '''
+
+    __slots__ = ('store', 'index', 'got_hit', 'on_hit', 'flash_timer', 'bullet',
+                 'TANK_IMAGE', 'TANK_EXPLOSION_IMAGE', 'rect')
+
+    x = Column('x')
+    y = Column('y')
+    hp = Column('hp')
+    firing_angle = Column('firing_angle')
+    firing_power = Column('firing_power')
+    firing = Column('firing')
+    team = Column('team')
+    tank_speed = Column('tank_speed')
+
+    size = 70
+
+    #Rects updated in place to draw the health bars (the tanks are drawn one after another, so they share them)
+    hp_bar_rect = pg.Rect(0, 0, size, 5)
+    hp_rect = pg.Rect(0, 0, size, 5)
+
+    #Horizontal position of the gun (relative to the size) and rotation of the gun drawing
+    FIRING_X = 0.4
+    GUN_ROTATION = 0
+
+    def __init__(self, x0, y0, team, store = None, tank_speed = 1):
+        self.store = store if store is not None else TankStore()
+        self.index = self.store.allocate(self)
+        self.x = x0
+        self.y = y0
+        self.hp = 100
+        self.firing_angle = 30
+        self.firing_power = 0
+        self.team = team
+        self.tank_speed = tank_speed
+        self.firing = False
+        self.got_hit = False
+        self.on_hit = None
+        self.flash_timer = None
+        self.rect = pg.Rect(x0, y0, self.size, self.size)
+
+    @property
+    def firing_x0(self):
+        return self.x + self.FIRING_X*self.size
+
+    @property
+    def firing_y0(self):
+        return self.y + 0.4*self.size
+
+    @property
+    def gun_angle(self):
+        return self.firing_angle + self.GUN_ROTATION
+
+    def draw_tank(self, WINDOW, camera_x = 0, scale = 1):
+
+        '''
+        Draws the tank on a given window surface. It draws the tank's gun, aim (see draw_aim) and health bar,
+        and then draws the tank itself, depending on whether it has been hit by a bullet or not.
+
+        Parameters:
+            - WINDOW (Surface): The window surface on which to draw the tank.
+            - camera_x (int):   The x-coordinate of the left side of the view (see camera). Defaults to 0.
+            - scale (float):    The render scale of the surface (see game). Defaults to 1.
+
+        Returns: None
+        '''
+
+        self.rect.update(self.x, self.y, self.size, self.size)
+        self.draw_gun(WINDOW, camera_x = camera_x, scale = scale)
+        self.draw_aim(WINDOW, camera_x, scale)
+        self.draw_hp_bar(WINDOW, camera_x, scale)
+
+        image = self.TANK_EXPLOSION_IMAGE if self.got_hit else self.TANK_IMAGE
+        WINDOW.blit(scale_image(image, scale), ((self.rect.x - camera_x)*scale, self.rect.y*scale))
+
+    def draw_aim(self, WINDOW, camera_x = 0, scale = 1):
+        pass
+
+    def draw_gun(self, WINDOW, gun_length = 20, gun_width = 5, gun_color = 'DARK_GREY', camera_x = 0, scale = 1):
+
+        '''
+        Draws the tank's gun on a given window surface.
+
+        Parameters:
+
+            - WINDOW (Surface):     The window surface on which to draw the gun.
+            - gun_length (float):   The length of the gun. Defaults to 20.
+            - gun_width (float):    The width of the gun. Defaults to 5.
+            - gun_color (str):      The color of the gun. Defaults to 'DARK_GREY'.
+            - camera_x (int):       The x-coordinate of the left side of the view (see camera). Defaults to 0.
+            - scale (float):        The render scale of the surface (see game). Defaults to 1.
+
+        Returns: None
+
+        '''
+
+        x0, y0 = (self.firing_x0 - camera_x)*scale, self.firing_y0*scale
+        theta = math.radians(self.gun_angle)
+        x, y = x0 + gun_length*scale*math.cos(theta), y0 - gun_length*scale*math.sin(theta)
+        pg.draw.line(WINDOW, COLORS[gun_color],(x0, y0), (x, y), width = max(round(gun_width*scale), 1))
+
+    def handle_bullet_hit(self, bullet_damage):
+
+        '''
+        Updates the tank's health points, sets got_hit to True and calls on_hit (which ends the flash later).
+        It is called when the tank is hit by a bullet.
+
+        Parameters:
+            - bullet_damage (int): The damage dealt by the bullet that hit the tank.
+
+        Returns: None
+        '''
+
+        self.hp -= bullet_damage
+        self.got_hit = True
+
+        if self.on_hit is not None:
+            self.on_hit(self)
+
+    def draw_hp_bar(self, WINDOW, camera_x = 0, scale = 1):
+
+        '''
+        Draws the tank's health bar on a given window surface.
+        It draws a green rectangle (representing the tank's current health) on top of a red rectangle (representing the tank's maximum health
+
+        Parameters:
+            - WINDOW (Surface): The window surface on which to draw the health bar.
+            - camera_x (int):   The x-coordinate of the left side of the view (see camera). Defaults to 0.
+            - scale (float):    The render scale of the surface (see game). Defaults to 1.
+
+        Returns: None
+        '''
+
+        x0, y0 = (self.x - camera_x)*scale, (self.y - 10)*scale
+        height = max(round(5*scale), 1)
+        self.hp_bar_rect.update(x0, y0, self.size*scale, height)
+        pg.draw.rect(WINDOW, COLORS['RED'], self.hp_bar_rect)
+        self.hp_rect.update(x0, y0, self.size*scale*self.hp/100, height)
+        pg.draw.rect(WINDOW, COLORS['GREEN'], self.hp_rect)
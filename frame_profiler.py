@@ -0,0 +1,287 @@
+import csv
+import time
+from collections import deque
+import pygame as pg
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Lightweight per-stage frame profiler. It is enabled by setting the environment variable TANK_PROFILE=1
+before running main.py, and TANK_PROFILE_CSV=<path> streams the raw per-frame timings to a CSV file.
+While the game is running, F3 shows or hides the overlay with the statistics and the frame-time graph.
+
+The StartupTimer measures the time to the first frame by stage (TANK_STARTUP_REPORT=1 or --startup-report prints it).
+
+'''
+
+#Stages of a frame, in the order they happen in the main loop
+STAGES = ('events', 'handle_tank', 'handle_enemy', 'game_flow', 'draw_window', 'overlay', 'display_update', 'capture')
+
+class FrameProfiler:
+
+    '''
+    Records high-resolution timings of every stage of every frame. When it is disabled, all its methods
+    return immediately, so it can be left in the main loop.
+
+    Attributes:
+
+        - enabled (bool):           whether the profiler records timings or not
+        - show_overlay (bool):      whether the overlay is drawn on the window or not
+        - stages (tuple):           the names of the stages of a frame
+        - stage_index (dict):       the index of every stage in the per-frame record
+        - record (list):            the timings (in ms) of the stages of the current frame
+        - history (list):           a deque per stage with its last timings (the last entry is the whole frame)
+        - frame (int):              the number of frames recorded
+        - last_time (float):        the time of the last lap
+        - frame_start (float):      the time at which the current frame started
+        - csv_file (file):          the file the raw records are streamed to (None if not streaming)
+        - csv_writer (writer):      the CSV writer of csv_file
+        - refresh_every (int):      the number of frames between two refreshes of the overlay statistics
+        - FONT (Font):              the font of the overlay
+        - overlay (Surface):        the cached surface of the overlay
+
+    Methods:
+
+        - begin_frame:      starts recording a new frame
+        - lap:              records the time spent in a stage since the previous lap
+        - end_frame:        stores the record of the frame in the history and in the CSV file
+        - toggle_overlay:   shows or hides the overlay
+        - statistics:       computes the rolling mean, p95 and p99 of every stage
+        - draw_overlay:     draws the overlay on a given window surface
+        - render_overlay:   renders the cached surface of the overlay
+        - close:            closes the CSV file
+
+    '''
+
+    def __init__(self, enabled = False, csv_path = None, window = 240, stages = STAGES):
+        self.enabled = enabled
+        self.show_overlay = False
+        self.stages = stages
+        self.stage_index = {stage: i for i, stage in enumerate(stages)}
+        self.record = [0.0] * len(stages)
+        self.history = [deque(maxlen = window) for _ in range(len(stages) + 1)]
+        self.frame = 0
+        self.last_time = 0.0
+        self.frame_start = 0.0
+        self.csv_file = None
+        self.csv_writer = None
+        self.refresh_every = 15
+        self.FONT = None
+        self.overlay = None
+
+        if enabled and csv_path:
+            self.csv_file = open(csv_path, 'w', newline = '')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(('frame', 'frame_ms') + tuple(stage + '_ms' for stage in stages))
+
+    def begin_frame(self):
+
+        '''
+        Starts recording a new frame. It is called by the main loop right after waiting for the next frame,
+        so the time spent waiting is not part of the frame time.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if not self.enabled:
+            return
+
+        self.frame_start = self.last_time = time.perf_counter()
+
+    def lap(self, stage):
+
+        '''
+        Records the time spent in a stage, measured since the previous lap (or since the beginning of the frame).
+
+        Parameters:
+
+            - stage (str): the name of the stage that has just finished
+
+        Returns: None
+        '''
+
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.record[self.stage_index[stage]] += (now - self.last_time) * 1000
+        self.last_time = now
+
+    def end_frame(self):
+
+        '''
+        Stores the record of the frame in the rolling history and streams it to the CSV file.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if not self.enabled:
+            return
+
+        frame_ms = (self.last_time - self.frame_start) * 1000
+
+        for i, value in enumerate(self.record):
+            self.history[i].append(value)
+            self.record[i] = 0.0
+
+        self.history[-1].append(frame_ms)
+
+        if self.csv_writer is not None:
+            self.csv_writer.writerow([self.frame, round(frame_ms, 4)] + [round(values[-1], 4) for values in self.history[:-1]])
+
+        self.frame += 1
+
+    def toggle_overlay(self):
+
+        '''
+        Shows or hides the overlay (only if the profiler is enabled).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        self.show_overlay = self.enabled and not self.show_overlay
+        self.overlay = None
+
+    def statistics(self):
+
+        '''
+        Computes the rolling mean, 95th and 99th percentiles of every stage (and of the whole frame).
+
+        Parameters: None
+
+        Returns:
+            - list: a list of tuples (name, mean, p95, p99), in milliseconds
+        '''
+
+        result = []
+
+        for name, values in zip(self.stages + ('frame',), self.history):
+
+            if not values:
+                result.append((name, 0.0, 0.0, 0.0))
+                continue
+
+            ordered = sorted(values)
+            last = len(ordered) - 1
+            result.append((name, sum(ordered) / len(ordered), ordered[round(0.95 * last)], ordered[round(0.99 * last)]))
+
+        return result
+
+    def draw_overlay(self, WINDOW):
+
+        '''
+        Draws the overlay with the statistics of every stage and a graph of the last frame times.
+        The statistics are only re-rendered every refresh_every frames, the rest of frames the cached surface is blitted.
+
+        Parameters:
+
+            - WINDOW (pygame.Surface): the window surface to draw on
+
+        Returns: None
+        '''
+
+        if not self.show_overlay:
+            return
+
+        if self.overlay is None or self.frame % self.refresh_every == 0:
+            self.render_overlay()
+
+        WINDOW.blit(self.overlay, (WIDTH - self.overlay.get_width() - 10, 50))
+
+    def render_overlay(self):
+
+        '''
+        Renders the overlay surface: a table with the statistics and the frame-time graph.
+        The dashed line of the graph is the budget of a 60 FPS frame.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if self.FONT is None:
+            self.FONT = pg.font.SysFont('couriernew', 14)
+
+        line_height = self.FONT.get_linesize()
+        graph_height = 80
+        width = 340
+        height = line_height * (len(self.stages) + 2) + graph_height + 20
+
+        overlay = pg.Surface((width, height), pg.SRCALPHA)
+        overlay.fill((0, 0, 0, 170))
+
+        lines = [f"{'stage':<15}{'mean':>8}{'p95':>8}{'p99':>8}"]
+        lines += [f'{name:<15}{mean:8.2f}{p95:8.2f}{p99:8.2f}' for name, mean, p95, p99 in self.statistics()]
+
+        for i, line in enumerate(lines):
+            overlay.blit(self.FONT.render(line, 1, COLORS['WHITE']), (8, 4 + i * line_height))
+
+        #Frame-time graph (scaled so that 2 frame budgets fill the graph)
+        frame_times = self.history[-1]
+        top = height - graph_height - 8
+        budget = 1000 / 60
+        scale = graph_height / (2 * budget)
+
+        budget_y = top + graph_height - budget * scale
+        for x in range(8, width - 8, 8):
+            pg.draw.line(overlay, COLORS['YELLOW'], (x, budget_y), (x + 4, budget_y))
+
+        if len(frame_times) > 1:
+            step = (width - 16) / (frame_times.maxlen - 1)
+            points = [(8 + i * step, top + graph_height - min(value * scale, graph_height)) for i, value in enumerate(frame_times)]
+            pg.draw.lines(overlay, COLORS['GREEN'], False, points)
+
+        self.overlay = overlay
+
+    def close(self):
+
+        '''
+        Closes the CSV file (if any).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+
+class StartupTimer:
+
+    '''
+    Measures the time to the first frame of the game, by stage (e.g. the imports, the display, the assets, the level).
+
+    Attributes:
+
+        - last (float):     the time (perf_counter) the current stage started at
+        - stages (list):    the (name, ms) of the finished stages
+
+    Methods:
+
+        - lap:      ends the current stage
+        - report:   returns the report of the stages, with the total
+
+    '''
+
+    def __init__(self, start = None):
+        self.last = time.perf_counter() if start is None else start
+        self.stages = []
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self):
+        total = sum(ms for stage, ms in self.stages)
+        lines = [f'  {stage:<14}{ms:>9.1f} ms  {ms / total:>6.1%}' for stage, ms in self.stages] if total else []
+        return '\n'.join(['Startup (time to the first frame):'] + lines + [f"  {'total':<14}{total:>9.1f} ms"])
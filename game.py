@@ -1,10 +1,25 @@
 import pygame as pg
+from concurrent.futures import ThreadPoolExecutor
 from power_bar import PowerBar
-from new_level import create_new_level
+from new_level import get_level_template, count_levels, world_background
+from assets import load_image
+from frame_profiler import FrameProfiler
+from scheduler import Scheduler
+from navigation import Navigation
+from threat_map import ThreatMap
+from camera import Camera
+from obstacles import CRATER_RADIUS
+from enemy import update_enemies
+from entities import TEAM_ENEMY
+from config import Config, SCALE_GRID
+from states import PlayingState, LevelTransitionState, RetryState, GameOverState, VictoryState
 from parameters import get_parameters
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
+#Duration of the flash of a tank that has been hit (in ms)
+HIT_FLASH_TIME = 100
+
 class Game:
 
     '''
@@ -18,57 +33,300 @@ class Game:
         tank (Tank) :           A Tank object that represents the player.
         enemies (list) :        A list of EnemyTank objects.
         obstacles (Obstacles) : An Obstacles object.
+        navigation (Navigation): The walkable spans of the level and the enemies on them (see navigation).
         power_bar (PowerBar) :  A PowerBar object.
         play_again (bool) :     A boolean that indicates if the player wants to play again.
         BACKGROUND (Surface) :  The background of the game.
         LIVES (Surface) :       The image of the lives of the tank.
-        max_levels (int) :      The maximum number of levels of the game.
+        max_levels (int) :      The maximum number of levels of the game (the number of level files).
+        config (Config) :       The configuration of the game (see config), passed on to the levels and the enemy solver.
+        endless (bool) :        Whether the game goes on with generated levels after the last level (see config).
+        static_layer (Surface): The background, floor and obstacles of the current level (its whole world), rendered on a single surface.
+        HUD_FONT (Font) :       The font used to draw the number of enemies and the current level.
+        hud_texts (dict) :      A cache of the rendered HUD texts, so they are only rendered when they change.
+        fonts (dict) :          A cache of the fonts used by the windows of the game, by size.
+        state (GameState) :     The current state of the game (see states).
+        profiler (FrameProfiler): The frame profiler (disabled unless the game loop sets an enabled one).
+        loader (ThreadPoolExecutor): The background thread that prepares the next level.
+        scheduler (Scheduler) : The timed events of the game (reloads, hit flashes, countdowns), on simulation time.
+        threat_map (ThreatMap): The overlay of the floor positions the enemies can hit (hidden unless toggled, see threat_map).
+        camera (Camera) :       The part of the world shown in the window, following the player (see camera).
+        render_scale (float) :  The scale the world is drawn at, before it is scaled to the window (1 for full resolution, see config).
+        frame (Surface) :       The surface the world is drawn on at the render scale (None at full scale).
+        scaled_layer (Surface): The static layer at the render scale (None until it is needed).
+        scaled_craters (int) :  The craters of the level already carved in the scaled static layer.
 
     Methods
 
         init :                      Initializes the game (creates the tank, enemies, obstacles, etc).
+        prepare_level :             Creates the objects of a level (it can run in a background thread).
+        preload_level :             Prepares a level in the background thread.
+        apply_level :               Makes a prepared level the current one.
+        release_level :             Breaks the references between the objects of the current level.
+        change_state :              Changes the state of the game.
+        start_hit_flash :           Shows the flash of a hit tank and schedules its end.
+        font :                      Returns a (cached) font of a given size.
+        handle_event :              Handles the key events of the player (charging and firing a shot).
         handle_tank :               Handles the tank (movement, firing, etc).
         handle_enemy :              Handles the enemies (movement, firing, etc).
+        check_level_passed :        Checks if all the enemies of the level are dead.
         check_tank_is_dead :        Checks if the (player) tank is dead.
         handle_end_game :           Handles the end of the game (victory or defeat).
-        draw_next_level_window :    Draws the window that indicates the next level.
-        draw_play_again_window :    Draws the window to decide if the player wants to play again.
+        restart :                   Starts a new game from the first level.
         draw_window :               Draws the main window of the game (background, tank, enemies, obstacles, etc).
+        draw_world :                Draws the world (the level, the tanks and the bullets) at a given scale.
+        draw_hud :                  Draws the HUD (lives, enemies, level and power bar).
+        scaled_static_layer :       Returns the static layer at the render scale.
         draw_lives :                Draws on the window the current number of lives of the tank.
         draw_num_enemies :          Draws on the window the current number of enemies.
         draw_current_level :        Draws on the window the current level of the game.
+        render_hud_text :           Returns a (cached) rendered text of the HUD.
 
     '''
 
-    def __init__(self):
+    def __init__(self, config = None):
+
+        config = config if config is not None else Config()
+        render_scale = config.render_scale
 
         self.power_bar = PowerBar(30, HEIGHT/4, 40, 250, 100, 0)
         self.current_level = 1
         self.tank_lives = 3
         self.play_again = True
-        self.BACKGROUND = pg.transform.scale(pg.image.load( r'images\background1.png'), (WIDTH, HEIGHT))
-        self.LIVES = pg.transform.scale(pg.image.load( r'images\life.png'), (30, 30))
-        self.max_levels = 8
+        self.BACKGROUND = load_image('background1.png', (WIDTH, HEIGHT))
+        self.LIVES = load_image('life.png', (30, 30))
+        self.max_levels = count_levels()
+        self.config = config
+        self.endless = config.endless
+        self.HUD_FONT = pg.font.SysFont('comicsans', 30)
+        self.hud_texts = {}
+        self.fonts = {}
+        self.state = PlayingState(self)
+        self.profiler = FrameProfiler()
+        self.loader = None
+        self.scheduler = Scheduler()
+        self.threat_map = ThreatMap(velocities = config.velocities, updates_per_frame = config.threat_updates)
+        self.camera = Camera(far_tick_interval = config.far_tick_interval)
+        self.render_scale = render_scale
+        self.frame = None if render_scale == 1 else pg.Surface((round(WIDTH*render_scale), round(HEIGHT*render_scale)))
+        self.scaled_layer = None
+        self.scaled_craters = 0
+        self.tank = None
+        self.enemies = []
+        self.navigation = None
 
     def init(self):
 
         '''
         Initializes the game, creating a new level with new enemies, obstacles, and a player's tank.
         It is called at the beginning of the game, when the player passes to the next level, and when the player wants to play again.
+        In the endless mode, the levels after the last one are generated.
 
         Parameters: None
 
         Returns:    None
 
         '''
-            
-        self.tank, self.enemies, self.obstacles = create_new_level(self.current_level)
+
+        self.apply_level(self.prepare_level(self.current_level))
+        self.change_state(PlayingState(self))
+
+    def prepare_level(self, level):
+
+        '''
+        Creates the objects of a level (and the terrain of its obstacles, with the summed-area table used by the enemies
+        to aim) and renders its static layer, without changing the current level. The static layer is a copy of the one
+        of the level template, as the craters carved in the terrain are erased from it.
+        It does not touch the state of the game, so it can run in a background thread.
+        In the endless mode, the levels after the last one are generated.
+
+        Parameters
+
+            level (int) :   The level to prepare.
+
+        Returns:
+
+            tuple : The tank, the enemies, the obstacles, the navigation and the static layer of the level.
+
+        '''
+
+        if self.endless and level > self.max_levels:
+            from level_generator import endless_level
+            template = endless_level(level, self.max_levels + 1)
+        else:
+            template = get_level_template(level)
+
+        tank, enemies, obstacles = template.instantiate(self.config)
+        obstacles.build_terrain()
+        obstacles.layer = template.static_layer(self.BACKGROUND).copy()
+        obstacles.background = world_background(self.BACKGROUND, obstacles.width)
+
+        return tank, enemies, obstacles, Navigation(obstacles, enemies), obstacles.layer
+
+    def preload_level(self, level):
+
+        '''
+        Prepares a level in the background thread (see prepare_level).
+
+        Parameters
+
+            level (int) :   The level to prepare.
+
+        Returns:
+
+            Future : The preparation of the level (its result is the prepared level).
+
+        '''
+
+        if self.loader is None:
+            self.loader = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'level-loader')
+
+        return self.loader.submit(self.prepare_level, level)
+
+    def apply_level(self, prepared):
+
+        '''
+        Makes a prepared level (see prepare_level) the current one. The timers of the previous level are discarded
+        and the enemies start loading their first shot.
+
+        Parameters
+
+            prepared (tuple) :  The prepared level.
+
+        Returns: None
+
+        '''
+
+        self.release_level()
+        self.tank, self.enemies, self.obstacles, self.navigation, self.static_layer = prepared
+
+        self.scheduler.clear()
+        self.scaled_layer = None
+        self.camera.reset(self.obstacles.width)
+        self.camera.follow(self.tank)
+        self.tank.on_hit = self.start_hit_flash
+
+        for enemy in self.enemies:
+            enemy.on_hit = self.start_hit_flash
+            self.scheduler.schedule(enemy.loading_time, enemy.reload)
+
+    def release_level(self):
+
+        '''
+        Breaks the references between the objects of the current level (the tanks and their store and lanes, and
+        their callbacks) and forgets its threat map, so the level is freed by reference counting as soon as it is
+        replaced, instead of by a collection of the garbage collector (a full collection takes several ms: a hitch
+        in the next level).
+
+        Parameters: None
+
+        Returns: None
+
+        '''
+
+        if self.tank is None:
+            return
+
+        for tank in self.tank.store.tanks + [self.tank] + self.enemies:
+            tank.on_hit = tank.flash_timer = None
+
+        self.tank.store.release()
+        self.navigation.release()
+        self.threat_map.reset()
+
+    def start_hit_flash(self, tank):
+
+        '''
+        Shows the flash of a tank that has been hit for HIT_FLASH_TIME (a new hit restarts the flash).
+
+        Parameters
+
+            tank (Tank or EnemyTank) :  The tank that has been hit.
+
+        Returns: None
+
+        '''
+
+        if tank.flash_timer is not None:
+            tank.flash_timer.cancel()
+
+        tank.flash_timer = self.scheduler.schedule(HIT_FLASH_TIME, self.end_hit_flash, tank)
+
+    def end_hit_flash(self, tank):
+        tank.got_hit = False
+        tank.flash_timer = None
+
+    def change_state(self, state):
+
+        '''
+        Changes the state of the game and enters the new state.
+
+        Parameters
+
+            state (GameState) :     The new state.
+
+        Returns: None
+
+        '''
+
+        self.state = state
+        state.enter()
+
+    def font(self, size):
+
+        '''
+        Returns the font of the windows of the game with a given size (each size is only created once).
+
+        Parameters
+
+            size (int) :    The size of the font.
+
+        Returns:
+
+            Font : The font.
+
+        '''
+
+        font = self.fonts.get(size)
+
+        if font is None:
+            font = self.fonts[size] = pg.font.SysFont('comicsans', size)
+
+        return font
+
+    def handle_event(self, event):
+
+        '''
+        Handles the key events that control the shots of the (user) tank: pressing SPACE starts charging a shot
+        and releasing it fires.
+
+        Parameters
+
+            event (Event) :     A pygame event.
+
+        Returns: None
+
+        '''
+
+        #Check if the player wants to fire
+        if event.type == pg.KEYDOWN and event.key == pg.K_SPACE and not self.tank.firing:
+            self.tank.firing_power = 0
+
+        #Fire (the path of the shell is predicted once, so the enemies can dodge it)
+        elif event.type == pg.KEYUP and event.key == pg.K_SPACE and not self.tank.firing:
+            self.tank.fire()
+            self.tank.firing_power = 0
+
+            bullet = self.tank.bullet
+            bullet.predict_impact(self.obstacles)
+            bullet.danger_zones = self.navigation.danger_zones(bullet.path_x, bullet.path_y)
 
     def handle_tank(self, keys_pressed):
 
         '''
-        Handles all possible actions of the tank (movement, firing, etc).
-        It is called every frame by the game loop.
+        Handles all possible actions of the tank (movement, firing, etc) and moves the camera with it.
+        It is called every frame by the game loop. The bullet is only checked against the enemies it overlaps horizontally
+        (found in the lanes of the navigation), not against all the enemies of the world.
 
         Parameters
 
@@ -79,12 +337,15 @@ class Game:
         '''
 
         self.tank.move(keys_pressed)
+        self.camera.follow(self.tank)
 
         if self.tank.firing:
             self.tank.bullet.update()
 
         if hasattr(self.tank, 'bullet'):
-            collision = any([self.tank.bullet.check_bullet_collision(self.obstacles, enemy) for enemy in self.enemies])
+            bullet = self.tank.bullet
+            enemies = self.navigation.tanks_between(bullet.rect.left, bullet.rect.right) or [None]
+            collision = any([bullet.check_bullet_collision(self.obstacles, enemy) for enemy in enemies])
 
             if collision:
                 self.tank.firing = False
@@ -94,226 +355,176 @@ class Game:
 
         '''
         Handles all possible actions of the enemies (movement, firing, etc). It is called every frame by the game loop.
+        All the enemies are updated at once, stage by stage, and the dead ones are removed at the end (see enemy.update_enemies).
+        The enemies far from the camera only think one tick out of a few (see camera).
 
         Parameters: None
 
         Returns: None
     '''
 
-        for enemy in self.enemies:
+        update_enemies(self.enemies, self.tank, self.obstacles, self.navigation, self.scheduler, self.camera, self.config)
+        self.threat_map.update(self.enemies, self.obstacles)
+
+    def check_level_passed(self):
 
-            #Updating firing angle
-            enemy.update_firing_angle(enemy.x - self.tank.x, enemy.y - self.tank.y, self.obstacles)
-            
-            #List of enemies excluding the current enemy
-            enemies_to_check = self.enemies.copy()
-            enemies_to_check.remove(enemy)
+        '''
+        Checks if all the enemies of the level are dead. Then the game is won if it was the last level
+        (there is no last level in the endless mode), otherwise the game goes to the next level.
+
+        Parameters: None
 
-            enemy.move(self.obstacles, enemies_to_check)
+        Returns:
 
-            #Check if enemy is firing and if it is time to fire
-            if not enemy.firing and enemy.time_counter > enemy.loading_time:
-                enemy.fire(enemy.x - self.tank.x, enemy.y - self.tank.y, self.obstacles)
-                enemy.time_counter = 0
+            bool : True if the level has been passed, False otherwise.
+        '''
 
-            #Update enemy bullet
-            if enemy.firing:
-                enemy.bullet.update()
-            
-            #Check if enemy bullet hit the tank
-            if hasattr(enemy, 'bullet'):
-                collision = enemy.bullet.check_bullet_collision(self.obstacles, self.tank)
+        if self.enemies:
+            return False
 
-                #If collision, delete bullet
-                if collision:
-                    enemy.firing = False
-                    del enemy.bullet
+        if self.current_level == self.max_levels and not self.endless:
+            self.handle_end_game(victory=True)
+        else:
+            self.change_state(LevelTransitionState(self, passed=True))
 
-            #Check if enemy is dead
-            if enemy.hp <= 0:
-                self.enemies.remove(enemy)
+        return True
 
-    def check_tank_is_dead(self, WINDOW):
+    def check_tank_is_dead(self):
 
         '''
         Checks if the (user) tank is dead and handles the game over accordingly.
         It distinguishes between the case where the tank has no more lives and the case
         where the tank has at least one life left and can continue playing.
 
-        Parameters:
-
-            WINDOW (pygame.Surface): The window surface to draw on
+        Parameters: None
 
         Returns: None
         '''
 
         #Case where the tank has no more lives
         if self.tank.hp <= 0 and self.tank_lives == 1:
-            self.handle_end_game(WINDOW, victory=False)
+            self.handle_end_game(victory=False)
 
-        #Case where the tank has at least one life left
+        #Case where the tank has at least one life left (the countdown takes the life)
         elif self.tank.hp <= 0 and self.tank_lives > 0:
-            self.draw_next_level_window(WINDOW, self.current_level, passed=False)
-            self.tank_lives -= 1
-            self.init()
+            self.change_state(RetryState(self))
 
-    def handle_end_game(self, WINDOW, victory):
+    def handle_end_game(self, victory):
 
         '''
         
-        Handles the end of the game (victory or defeat) and calls the function to draw the window to decide if the player wants to play again.
+        Handles the end of the game (victory or defeat): the game goes to the menu where the player decides if they want to play again.
 
         Parameters:
 
-            WINDOW (pygame.Surface):    The window surface to draw on
             victory (bool):             Whether the player has won or lost the game.
 
         Returns: None
         
         '''
 
-        self.play_again = self.draw_play_again(WINDOW, victory)
+        self.change_state(VictoryState(self) if victory else GameOverState(self))
 
-        #Continue playing
-        if self.play_again:
-            self.current_level = 1
-            self.tank_lives = 3
-            self.init()
+    def restart(self):
 
-    def draw_next_level_window(self, WINDOW, level, passed = True):
+        '''
+        Starts a new game from the first level with all the lives.
+
+        Parameters: None
 
+        Returns: None
         '''
-        Draws the window that indicates the next level. It is called when the player passes to the next level or when the player fails a level.
-        Depending on the case, the window will indicate that the player has passed the level or that the player has failed the level.
+
+        self.current_level = 1
+        self.tank_lives = 3
+        self.init()
+
+    def draw_window(self, WINDOW):
+
+        '''
+        
+        Draws the main events of the game on the window. 
+        The world (see draw_world) is drawn at the render scale: on the window itself at full scale, otherwise on the
+        smaller frame surface, which is then scaled to the window at once. The HUD is drawn on the window at full scale.
+        The window is not updated here: the game loop updates it once everything (e.g. the profiler overlay) has been drawn.
 
         Parameters:
 
             WINDOW (pygame.Surface):    The window surface to draw on
-            level (int):                The current level.
-            passed (bool):              Whether the player has passed the level or not.
 
         Returns: None
         
         '''
 
-        #Counter to keep track of the time the window is displayed
-        counter = 3
+        if self.frame is None:
+            self.draw_world(WINDOW, 1)
 
-        while counter > 0:
+        else:
+            self.draw_world(self.frame, self.render_scale)
+            pg.transform.scale(self.frame, (WIDTH, HEIGHT), WINDOW)
 
-            #Big background rect
-            pg.draw.rect(WINDOW, COLORS['LIGHT_BLUE'], (WIDTH/2 - 250, HEIGHT/2 -200, 500, 400))
+        self.draw_hud(WINDOW)
 
-            #Draw a rect with a smaller size to make a border
-            pg.draw.rect(WINDOW, COLORS['BLACK'], (WIDTH/2 - 250, HEIGHT/2 -200, 500, 400), 5)
+    def draw_world(self, WINDOW, scale):
 
-            font = pg.font.SysFont('comicsans', 40)
+        '''
 
-            #Two possible texts depending on whether the player has passed the level or not
-            if passed:
-                text1 = font.render(f"You've passed level {level}!", 1, COLORS['BLACK'])
-                text2 = font.render(f"Next level in...", 1, COLORS['BLACK'])
-            else:
-                text1 = font.render(f"You've failed level {level}!", 1, COLORS['BLACK'])
-                text2 = font.render(f"Try again in...", 1, COLORS['BLACK'])
+        Draws the world (the level, the tanks and the bullets) on a surface at a given scale, in the coordinates of the
+        world. Only the part of the world in the view of the camera is drawn: the enemies are found in the lanes of the
+        navigation, and the bullets of the enemies in the columns of the store.
 
-            WINDOW.blit(text1, (WIDTH/2 - text1.get_width()/2, HEIGHT/2 - 150 - text1.get_height()/2))
-            WINDOW.blit(text2, (WIDTH/2 - text2.get_width()/2, HEIGHT/2 - 30 - text2.get_height()/2))
+        Parameters:
 
-            #Displaying the counter
-            font = pg.font.SysFont('comicsans', 100)
-            text = font.render(str(counter), 1, COLORS['BLACK'])
-            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 + 20))
+            WINDOW (pygame.Surface):    The surface to draw on (the window, or the frame at the render scale)
+            scale (float):              The scale of the surface
 
-            #Draw circle around the counter
-            pg.draw.circle(WINDOW, COLORS['BLACK'], (WIDTH/2, HEIGHT/2 + 20 + text.get_height()/2), text.get_height()/2 + 5, 5)
+        Returns: None
 
-            pg.display.update()
-            pg.time.delay(1000)
+        '''
 
-            counter -= 1
+        camera_x = self.camera.x
+        left, right = self.camera.view(margin = 0)
 
-    def draw_play_again(self, WINDOW, victory = False):
+        #Background, floor and obstacles
+        layer = self.static_layer if scale == 1 else self.scaled_static_layer()
+        WINDOW.blit(layer, (0, 0), (round(camera_x*scale), 0, WINDOW.get_width(), WINDOW.get_height()))
 
-        '''
-        Draws the window that asks the user if he wants to play again or not.
-        It is called when the player has lost all his lives or when the player has won the game, inside the handle_end_game function.
+        #Floor positions the enemies can hit (if shown)
+        self.threat_map.draw(WINDOW, camera_x, scale)
 
-        Parameters:
+        #User tank
+        self.tank.draw_tank(WINDOW, camera_x, scale)
 
-            WINDOW (pygame.Surface):    The window surface to draw on
-            victory (bool):             Whether the player has won or lost the game.
+        #Bullet (user tank)
+        if self.tank.firing:
+            self.tank.bullet.draw_bullet(WINDOW, camera_x = camera_x, scale = scale)
 
-        Returns:
-            bool : True if the player wants to play again, False otherwise.
-        
-        '''
-        
-        while True:
-
-            #Big background rect
-            pg.draw.rect(WINDOW, COLORS['LIGHT_BLUE'], (WIDTH/2 - 200, HEIGHT/2 -200, 400, 400))
-            #Draw a rect with a smaller size to make a border
-            pg.draw.rect(WINDOW, COLORS['BLACK'], (WIDTH/2 - 200, HEIGHT/2 -200, 400, 400), 5)
-            
-            font = pg.font.SysFont('comicsans', 60)
-
-            #Two possible texts depending on whether the player has won or lost the game
-            if victory:
-                text = font.render('Victory!', 1, COLORS['BLACK'])
-            else:
-                text = font.render('Game Over', 1, COLORS['BLACK'])
-
-            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 - 150 - text.get_height()/2))
-
-            pg.draw.rect(WINDOW, COLORS['LIGHT_GREY'], (WIDTH/2 - 100, HEIGHT/2 -80, 200, 100))
-            pg.draw.rect(WINDOW, COLORS['LIGHT_GREY'], (WIDTH/2 - 100, HEIGHT/2 + 40, 200, 100))
-
-            #Background rect
-            pg.draw.rect(WINDOW, COLORS['WHITE'], (WIDTH/2 - 100, HEIGHT/2 -80, 200, 100), 5)
-            pg.draw.rect(WINDOW, COLORS['WHITE'], (WIDTH/2 - 100, HEIGHT/2 + 40, 200, 100), 5)
-
-            #Play again and quit buttons
-            font = pg.font.SysFont('comicsans', 30)
-            text = font.render('Play again', 1, COLORS['BLACK'])
-            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 -80 + text.get_height()/2))
-
-            text = font.render('Quit', 1, COLORS['BLACK'])
-            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 + 50 + text.get_height()/2))
-
-            pg.display.update()
-
-            #Event handling (play again or quit)
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    pg.quit()
-                    run = False
-                    break
-
-                if event.type == pg.MOUSEBUTTONDOWN:
-                    mouse_pos = pg.mouse.get_pos()
-
-                    if WIDTH/2 - 100 <= mouse_pos[0] <= WIDTH/2 + 100 and HEIGHT/2 -80 <= mouse_pos[1] <= HEIGHT/2 + 20:
-                        return True
-                    
-                    elif WIDTH/2 - 100 <= mouse_pos[0] <= WIDTH/2 + 100 and HEIGHT/2 + 40 <= mouse_pos[1] <= HEIGHT/2 + 140:
-                        return False
-                    
-    def draw_window(self, WINDOW):
+        #Enemy (in the view)
+        for enemy in self.navigation.tanks_between(left, right):
+            enemy.draw_tank(WINDOW, camera_x, scale)
+
+        #Bullet (enemy, in the view)
+        store = self.tank.store
+        bullet_x = store.view('bullet_x')
+        in_view = (store.view('firing') != 0) & (store.view('hp') > 0) & (store.view('team') == TEAM_ENEMY) \
+                  & (bullet_x > left - 10) & (bullet_x < right)
+
+        for row in in_view.nonzero()[0]:
+            store.tanks[row].bullet.draw_bullet(WINDOW, camera_x = camera_x, scale = scale)
+
+    def draw_hud(self, WINDOW):
 
         '''
-        
-        Draws the main events of the game on the window. 
+
+        Draws the HUD on the window: the lives, the number of enemies, the current level and the power bar.
 
         Parameters:
 
             WINDOW (pygame.Surface):    The window surface to draw on
 
         Returns: None
-        
+
         '''
-        #Background
-        WINDOW.blit(self.BACKGROUND, (0, 0))
 
         #Number of lives
         self.draw_lives(WINDOW, self.tank_lives)
@@ -324,32 +535,44 @@ class Game:
         #Current level
         self.draw_current_level(WINDOW, self.current_level)
 
-        #Floor
-        floor = pg.Rect(FLOOR_POS[0], FLOOR_POS[1], FLOOR_WIDTH, FLOOR_HEIGHT)
-        pg.draw.rect(WINDOW, COLORS['LIGHT_GREY'], floor)
+        #Power bar
+        self.power_bar.draw_power_bar(WINDOW, self.tank.firing_power)
 
-        #User tank
-        self.tank.draw_tank(WINDOW)
+    def scaled_static_layer(self):
 
-        #Bullet (user tank)
-        if self.tank.firing:
-            self.tank.bullet.draw_bullet(WINDOW)
+        '''
 
-        #Obstacles
-        self.obstacles.draw_obstacles(WINDOW)
+        Returns the static layer at the render scale. It is scaled once per level, and then only the regions of the
+        new craters are scaled again (aligned to SCALE_GRID pixels, so they are scaled to whole pixels).
 
-        #Power bar
-        self.power_bar.draw_power_bar(WINDOW, self.tank.firing_power)
+        Parameters: None
 
-        #Enemy
-        for enemy in self.enemies:
-            enemy.draw_tank(WINDOW)
+        Returns:
+
+            Surface : The scaled static layer.
+
+        '''
+
+        scale = self.render_scale
+        craters = self.obstacles.craters
+
+        if self.scaled_layer is None:
+            width, height = self.static_layer.get_size()
+            self.scaled_layer = pg.transform.smoothscale(self.static_layer, (round(width*scale), round(height*scale)))
+            self.scaled_craters = len(craters)
 
-            #Bullet (enemy)
-            if enemy.firing:
-                enemy.bullet.draw_bullet(WINDOW)
+        for x, y in craters[self.scaled_craters:]:
+            left, top = (x - CRATER_RADIUS) // SCALE_GRID * SCALE_GRID, (y - CRATER_RADIUS) // SCALE_GRID * SCALE_GRID
+            right, bottom = -(-(x + CRATER_RADIUS + 1) // SCALE_GRID) * SCALE_GRID, -(-(y + CRATER_RADIUS + 1) // SCALE_GRID) * SCALE_GRID
+            area = self.static_layer.get_rect().clip((left, top, right - left, bottom - top))
 
-        pg.display.update()
+            if area.width and area.height:
+                region = pg.transform.smoothscale(self.static_layer.subsurface(area), (round(area.width*scale), round(area.height*scale)))
+                self.scaled_layer.blit(region, (round(area.x*scale), round(area.y*scale)))
+
+        self.scaled_craters = len(craters)
+
+        return self.scaled_layer
 
     def draw_lives(self, WINDOW, num_lives):
 
@@ -382,8 +605,7 @@ class Game:
         
         '''
 
-        font = pg.font.SysFont('comicsans', 30)
-        text = font.render('Enemies: ' + str(len(self.enemies)), 1, COLORS['BLACK'])
+        text = self.render_hud_text('Enemies', len(self.enemies))
         WINDOW.blit(text, (WIDTH - text.get_width() - 10, 10))
 
     def draw_current_level(self, WINDOW, level):
@@ -400,6 +622,32 @@ class Game:
         
         '''
 
-        font = pg.font.SysFont('comicsans', 30)
-        text = font.render('Level: ' + str(level), 1, COLORS['BLACK'])
-        WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, 10))
\ No newline at end of file
+        text = self.render_hud_text('Level', level)
+        WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, 10))
+
+    def render_hud_text(self, label, value):
+
+        '''
+
+        Returns the rendered HUD text for a given label and value. The text is only rendered the first time
+        it is needed and then reused from the cache, so drawing the HUD does not allocate new surfaces every frame.
+
+        Parameters:
+
+            label (str):    The label of the text (e.g. 'Level').
+            value (int):    The value shown next to the label.
+
+        Returns:
+
+            Surface : The rendered text.
+
+        '''
+
+        key = (label, value)
+        text = self.hud_texts.get(key)
+
+        if text is None:
+            text = self.HUD_FONT.render(label + ': ' + str(value), 1, COLORS['BLACK'])
+            self.hud_texts[key] = text
+
+        return text
\ No newline at end of file
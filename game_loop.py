@@ -0,0 +1,165 @@
+import pygame as pg
+from frame_profiler import FrameProfiler
+
+'''
+The outer loop of the game. It is the only loop of the game: every state (playing, countdowns, menus, pause)
+runs inside it (see states), so all of them share the same frame pacing, event handling and instrumentation.
+The same loop runs the game (real time, keyboard and mouse) and the headless scenarios of the benchmark
+(fixed time step, scripted inputs), and it can record the inputs of a session and play them back (see replay)
+and capture the presented frames to disk (see capture).
+
+'''
+
+#Longest time step given to the states (in ms), so a long pause (e.g. a menu or a dragged window) is not simulated at once
+MAX_DT = 250
+
+class GameLoop:
+
+    '''
+    Runs the frames of the game. Every frame it waits for the frame cap, collects the events and the pressed keys,
+    dispatches them to the current state of the game, updates the state and draws it (unless the state is idle,
+    then the loop sleeps until the next event).
+
+    Attributes:
+
+        - game (Game):                          the game
+        - WINDOW (Surface):                     the window surface to draw on
+        - fps (int):                            the frame cap (None for an uncapped frame rate)
+        - fixed_dt (float):                     the time step of every frame in ms (None to use the real frame time)
+        - controller (ScriptedPlayer):          the source of the inputs (None for the keyboard), see scripted_player
+                                                (its dt, if not None, is the time step of the frame, e.g. in a replay)
+        - profiler (FrameProfiler):             the frame profiler (a disabled one by default)
+        - allocation_tracker (AllocationTracker): the allocation tracker (None if not tracking)
+        - recorder (Recorder):                  the recorder of the inputs of the frames (None if not recording), see replay
+        - capture (FrameCapture):               the capture of the presented frames (None if not capturing), see capture
+        - clock (Clock):                        the clock that paces the frames
+        - frames (int):                         the number of frames run
+
+    Methods:
+
+        - step:             runs one frame
+        - run:              runs frames until the player quits
+        - handle_event:     dispatches an event
+
+    '''
+
+    def __init__(self, game, WINDOW, fps = 60, fixed_dt = None, controller = None, profiler = None, allocation_tracker = None, recorder = None, capture = None):
+        self.game = game
+        self.WINDOW = WINDOW
+        self.fps = fps
+        self.fixed_dt = fixed_dt
+        self.controller = controller
+        self.profiler = profiler or FrameProfiler()
+        self.allocation_tracker = allocation_tracker
+        self.recorder = recorder
+        self.capture = capture
+        self.clock = pg.time.Clock()
+        self.frames = 0
+
+        game.profiler = self.profiler
+
+    def step(self):
+
+        '''
+        Runs one frame of the game.
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        game = self.game
+        profiler = self.profiler
+
+        if self.fps:
+            self.clock.tick(self.fps)
+        else:
+            self.clock.tick()
+
+        dt = self.fixed_dt if self.fixed_dt is not None else min(self.clock.get_time(), MAX_DT)
+
+        #Idle states (e.g. the menus) sleep until the next event instead of drawing the same frame again
+        events = pg.event.get()
+        if not events and self.controller is None and game.state.is_idle():
+            events = [pg.event.wait()]
+
+        profiler.begin_frame()
+
+        if self.controller is None:
+            keys_pressed = pg.key.get_pressed()
+        else:
+            keys_pressed, scripted_events = self.controller.update(game)
+            events += scripted_events
+
+            if self.controller.dt is not None:
+                dt = self.controller.dt
+
+        if self.recorder is not None:
+            self.recorder.record(dt, keys_pressed, events)
+
+        for event in events:
+            self.handle_event(event)
+
+        profiler.lap('events')
+
+        if game.play_again:
+            game.state.update(keys_pressed, dt)
+
+            #Draw everything (unless nothing has changed)
+            if not game.state.is_idle():
+                game.state.render(self.WINDOW)
+                profiler.draw_overlay(self.WINDOW)
+                profiler.lap('overlay')
+                pg.display.update()
+                profiler.lap('display_update')
+
+                if self.capture is not None:
+                    self.capture.capture(self.WINDOW)
+                    profiler.lap('capture')
+
+        profiler.end_frame()
+
+        if self.allocation_tracker is not None:
+            self.allocation_tracker.end_frame()
+
+        self.frames += 1
+
+    def handle_event(self, event):
+
+        '''
+        Handles the events common to all the states (closing the window, the profiler overlay and the threat map)
+        and passes the event to the current state.
+
+        Parameters:
+
+            event (Event) :     A pygame event.
+
+        Returns: None
+        '''
+
+        if event.type == pg.QUIT:
+            self.game.play_again = False
+
+        #Show/hide the profiler overlay
+        elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+            self.profiler.toggle_overlay()
+
+        #Show/hide the threat map
+        elif event.type == pg.KEYDOWN and event.key == pg.K_F4:
+            self.game.threat_map.toggle()
+
+        else:
+            self.game.state.handle_event(event)
+
+    def run(self):
+
+        '''
+        Runs frames until the player quits (closing the window or from the end-of-game menu).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        while self.game.play_again:
+            self.step()
@@ -0,0 +1,218 @@
+import random
+from new_level import compile_level
+from navigation import TANK_OFFSET, TANK_SIZE
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Procedural generation of levels. A seeded generator builds level data in the same format as the level files
+(see new_level), so a generated level is compiled and instantiated exactly like a shipped one.
+It is used for the endless mode (the levels after the last shipped one) and to build big scenes for profiling.
+
+Layout of a generated level:
+
+    - The player stands on the floor on the left, behind a wall (as in the shipped levels).
+    - The enemy area (on the right of the wall) has small walls standing on the floor and rows of platforms.
+      The rows are far enough from each other and from the floor for the enemies to only see the obstacles
+      of their own surface.
+    - The enemies stand on the free slots of the surfaces (the floor segments and the platforms). When there are
+      more enemies than slots, several enemies share a slot (only useful as a load generator).
+
+'''
+
+#Space reserved for every enemy on a surface
+SLOT_WIDTH = 80
+
+#x-coordinate where the enemy area starts (right side of the wall that protects the player)
+DIVIDER_X = 500
+DIVIDER_WIDTH = 40
+AREA_LEFT = DIVIDER_X + DIVIDER_WIDTH
+
+#y-coordinates of the tops of the rows of platforms
+PLATFORM_ROWS = (450, 270, 90)
+PLATFORM_HEIGHT = 40
+
+def surface_slots(left, right, top):
+
+    '''
+    Returns the positions (x, y) where enemies can stand on a surface.
+
+    Parameters:
+
+        left (int) :    The x-coordinate of the left border of the surface.
+        right (int) :   The x-coordinate of the right border of the surface.
+        top (int) :     The y-coordinate of the top of the surface.
+
+    Returns:
+
+        list : The (x, y) positions of the tanks.
+
+    '''
+
+    count = (right - left) // SLOT_WIDTH
+    margin = (right - left - count * SLOT_WIDTH) // 2
+
+    return [(left + margin + i * SLOT_WIDTH + (SLOT_WIDTH - TANK_SIZE) // 2, top - TANK_OFFSET) for i in range(count)]
+
+def generate_level_data(seed, n_enemies = 5, n_platforms = 2, n_walls = 1, loading_time = (2000, 5000), name = None, world_width = WIDTH):
+
+    '''
+    Generates the data of a level (in the format of the level files) from a seed.
+
+    Parameters:
+
+        seed (int) :            The seed of the generator (the same seed always gives the same level).
+        n_enemies (int) :       The number of enemies.
+        n_platforms (int) :     The number of platforms, spread over the rows of platforms.
+        n_walls (int) :         The number of small walls on the floor of the enemy area.
+        loading_time (tuple) :  The range (min, max) of the loading times of the enemies (in ms).
+        name (str) :            The name of the level (by default, it includes the seed).
+        world_width (int) :     The width of the world (wider than the window for a scrolling level, see camera).
+
+    Returns:
+
+        dict : The data of the level.
+
+    '''
+
+    rng = random.Random(seed)
+
+    #Wall that protects the player
+    divider_height = rng.randint(200, 350)
+    obstacles = [{'x': DIVIDER_X, 'y': FLOOR_POS[1] - divider_height, 'width': DIVIDER_WIDTH, 'height': divider_height + 100}]
+
+    #Small walls splitting the floor of the enemy area into segments
+    area_width = world_width - AREA_LEFT
+    floor_segments = []
+    segment_left = AREA_LEFT
+
+    for i in range(n_walls):
+        wall_x = AREA_LEFT + (i + 1) * area_width // (n_walls + 1) - 10
+        wall_height = rng.randint(60, 150)
+        obstacles.append({'x': wall_x, 'y': FLOOR_POS[1] - wall_height, 'width': 20, 'height': wall_height + 100})
+        floor_segments.append((segment_left, wall_x))
+        segment_left = wall_x + 20
+
+    floor_segments.append((segment_left, world_width))
+
+    #Platforms, spread over the rows
+    platforms = []
+    rows = [[] for _ in PLATFORM_ROWS]
+
+    for i in range(n_platforms):
+        rows[i % len(PLATFORM_ROWS)].append(i)
+
+    for top, row in zip(PLATFORM_ROWS, rows):
+
+        if not row:
+            continue
+
+        cell_width = area_width // len(row)
+
+        for i in range(len(row)):
+
+            #Wide enough for (at least) one tank if there is room for it
+            if cell_width >= SLOT_WIDTH + 20:
+                width = rng.randint(SLOT_WIDTH, cell_width - 10)
+            else:
+                width = max(cell_width - 4, 1)
+
+            left = AREA_LEFT + i * cell_width + rng.randint(0, cell_width - width)
+            obstacles.append({'x': left, 'y': top, 'width': width, 'height': PLATFORM_HEIGHT})
+            platforms.append((left, left + width, top))
+
+    #Free slots of all the surfaces (floor segments and platforms)
+    slots = []
+    for left, right in floor_segments:
+        slots += surface_slots(left, right, FLOOR_POS[1])
+    for left, right, top in platforms:
+        slots += surface_slots(left, right, top)
+
+    rng.shuffle(slots)
+
+    if not slots:
+        slots = surface_slots(AREA_LEFT, world_width, FLOOR_POS[1])
+
+    enemies = []
+    for i in range(n_enemies):
+        x, y = slots[i % len(slots)]
+        enemies.append({'x': x, 'y': y, 'loading_time': rng.randint(*loading_time)})
+
+    data = {
+        'name': name or f'Generated level (seed {seed})',
+        'metadata': {'generated': True, 'seed': seed},
+        'player': {'x': 100, 'y': FLOOR_POS[1] - TANK_OFFSET},
+        'enemies': enemies,
+        'obstacles': obstacles,
+    }
+
+    if world_width != WIDTH:
+        data['width'] = world_width
+
+    return data
+
+def generate_level(seed, **options):
+
+    '''
+    Generates a level from a seed and compiles it into a LevelTemplate (see generate_level_data for the options).
+
+    Parameters:
+
+        seed (int) :    The seed of the generator.
+
+    Returns:
+
+        LevelTemplate : The compiled level.
+
+    '''
+
+    return compile_level(generate_level_data(seed, **options), f'<generated level, seed {seed}>')
+
+def endless_level(level, first_level):
+
+    '''
+    Generates a level of the endless mode. The difficulty grows with the number of levels played after
+    the shipped ones: more enemies, more obstacles and shorter loading times.
+
+    Parameters:
+
+        level (int) :       The number of the level.
+        first_level (int) : The number of the first generated level.
+
+    Returns:
+
+        LevelTemplate : The compiled level.
+
+    '''
+
+    depth = level - first_level
+    fastest = max(800, 2000 - 100 * depth)
+
+    return generate_level(level, n_enemies = min(3 + depth, 20), n_platforms = min(1 + depth // 2, 6),
+                          n_walls = min(depth // 3, 3), loading_time = (fastest, fastest + 2500), name = f'Level {level}')
+
+def create_stress_level(n_enemies, n_obstacles = 10, seed = 0, world_width = WIDTH):
+
+    '''
+    Creates the objects of a big generated level, to be used as a load generator (e.g. for profiling).
+
+    Parameters:
+
+        n_enemies (int) :   The number of enemies.
+        n_obstacles (int) : The (approximate) number of obstacles.
+        seed (int) :        The seed of the generator.
+        world_width (int) : The width of the world.
+
+    Returns:
+
+        tank (Tank) :           The tank object of the player.
+        enemies (list) :        A list of enemy tank objects.
+        obstacles (Obstacles) : An object of the Obstacles class that contains the obstacles.
+
+    '''
+
+    n_walls = min(max(n_obstacles // 10, 0), 8)
+    n_platforms = max(n_obstacles - n_walls - 1, 0)
+
+    return generate_level(seed, n_enemies = n_enemies, n_platforms = n_platforms, n_walls = n_walls, world_width = world_width).instantiate()
@@ -1,5 +1,23 @@
+import time
+
+#The start of the imports (see the startup report, in play)
+START_TIME = time.perf_counter()
+
+import gc
+import os
+import sys
+import json
+import random
+import argparse
+from concurrent.futures import wait
 import pygame as pg
 from game import Game
+from game_loop import GameLoop
+from states import RetryState, GameOverState, VictoryState
+from frame_profiler import FrameProfiler, StartupTimer
+from assets import preload_images
+from new_level import count_levels
+from config import Config
 from parameters import get_parameters
 
 '''
@@ -11,82 +29,517 @@ The player controls a tank that can fire projectiles. The goal is to destroy all
 The player can move the tank left and right (LEFT ARROW and RIGTH ARROW), and fire projectiles (SPACEBAR).
 The player can also adjust the power of the projectile by holding the SPACEBAR.
 It can also adjust the angle of the projectile by pressing UP ARROW and DOWN ARROW.
+The game can be paused (and resumed) with P or ESCAPE.
 
 The enemies move in a straight line, and can be destroyed by the player's projectiles. They will try to destroy the player's tank.
 
 Each level is progressively more difficult than the previous one. There are (currently) 8 levels in the game.
 The player has 3 lives to pass all the levels.
 
+The game is configured (see config) with a JSON file (--config <path> or TANK_CONFIG=<path>), with environment
+variables (TANK_<FIELD>) or with command-line flags (--<field>, 'python main.py --help' lists them). For example:
+
+    --track-allocs (TANK_TRACK_ALLOCS=1) enables the allocation tracking debug mode, which reports
+    the objects retained per frame by the main loop and the transient memory peak of the frames.
+    --profile (TANK_PROFILE=1) enables the frame profiler (F3 shows its overlay), and --profile-csv <path>
+    (TANK_PROFILE_CSV=<path>) streams its per-frame timings to a CSV file.
+    --endless (TANK_ENDLESS=1) enables the endless mode: after the last level, the game goes on with generated levels.
+    --fps <n> (TANK_FPS=<n>) changes the frame cap (0 for an uncapped frame rate).
+
+F4 shows the threat heatmap (the floor positions the enemies can hit, see threat_map).
+
+The window can be resized: the game is drawn at its own resolution (WIDTH x HEIGHT) and scaled to the window, so the
+size of the window does not change the game. --render-scale <scale> (TANK_RENDER_SCALE=<scale>, e.g. 0.5 or 0.75)
+draws the world at a lower resolution, which is faster on slow machines (the HUD is still drawn at full resolution).
+
+Command line ('python main.py --help' lists all the options):
+
+    python main.py [play] [--level N] [--headless] [--uncapped] [--ticks N] [--seed N]
+                   [--record PATH | --replay PATH] [--cprofile PATH] [configuration flags]
+
+--level starts the game at a level. --headless plays without a window, at an uncapped frame rate, with the scripted
+player (see scripted_player) until the game is over. --record writes the inputs of the session to a file and --replay
+plays them again, exactly (see replay): e.g. a session played in the window can be replayed headlessly to measure it.
+--cprofile runs the session under cProfile and writes the statistics to a file (for pstats or a viewer).
+--capture PATH (TANK_CAPTURE) writes the presented frames to a directory of PNG files, a .rgb/.raw file of raw RGB frames
+or, with '|command', to the input of an encoder (see capture). The frames are written by a background thread: with
+--capture-policy drop (the default) the frames it cannot keep up with are dropped, with block the game waits for it
+(e.g. to capture every frame of a replay). The frames captured and dropped are printed at the end.
+--startup-report (TANK_STARTUP_REPORT=1) prints the time to the first frame, by stage: the imports, the options,
+the display, the assets (all the images are decoded by a pool of threads while the display is initialized, see
+assets) and the level. The modules only some modes need (the versus mode, the recordings, the scripted player,
+the allocation tracker, the level generator) are imported when they are used.
+
+Running 'python main.py bench' plays scripted scenarios through all the levels headlessly (see bench; it also takes
+--cprofile).
+
+Running 'python main.py versus host' hosts a two-player game over the network, and 'python main.py versus join <host>'
+joins it (see versus).
+
 '''
 
-def main():
+def main(argv = None):
+
+    '''
+    Plays the game (see the options with 'python main.py --help'): in a window with the keyboard, or headlessly with the
+    scripted player (see scripted_player), from a given level, optionally recording the session or playing a recording
+    (see replay), and optionally under cProfile.
+
+    Parameters:
+
+        argv (list): The command-line arguments (sys.argv[1:], without 'play', when run as 'python main.py').
+
+    Returns:
+
+        int : The exit code.
+
+    '''
+
+    timer = StartupTimer(START_TIME)
+    timer.lap('imports')
+
+    parser = argparse.ArgumentParser(prog = 'main.py', description = 'Tank destroyer.',
+                                     epilog = "'main.py bench' (scripted benchmark of all the levels) and 'main.py versus' "
+                                              "(two-player game over the network) have their own options (see --help).")
+    parser.add_argument('--level', type = int, default = 1, help = 'level the game starts at (default 1)')
+    parser.add_argument('--headless', action = 'store_true',
+                        help = 'play without a window, at an uncapped frame rate: the scripted player plays (or the --replay recording)')
+    parser.add_argument('--uncapped', action = 'store_true', help = 'uncapped frame rate (the same as --fps 0)')
+    parser.add_argument('--ticks', type = int, help = 'stop after this many frames')
+    parser.add_argument('--seed', type = int, help = 'seed of the random motion of the enemies (random by default)')
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument('--record', metavar = 'PATH', help = 'record the session to a file')
+    recording.add_argument('--replay', metavar = 'PATH',
+                           help = 'play a recorded session (its level, seed and configuration, but the display flags of the command line)')
+    parser.add_argument('--cprofile', metavar = 'PATH', help = 'profile the session with cProfile and write the statistics (pstats) to a file')
+    Config.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        config = Config.load(args = args)
+        replayer = None
+
+        if args.replay:
+            from replay import Replayer
+            replayer = Replayer.load(args.replay)
+            config = replayer.configuration(config)
+
+    except (OSError, ValueError, KeyError) as error:
+        parser.error(str(error))
+
+    if args.uncapped:
+        config = config.replace(fps = 0)
+
+    timer.lap('options')
+
+    if args.cprofile:
+        return run_profiled(lambda: play(args, config, replayer, timer), args.cprofile)
+
+    return play(args, config, replayer, timer)
+
+def play(args, config, replayer = None, timer = None):
+
+    '''
+    Plays a session of the game (see main).
+
+    Parameters:
+
+        args (Namespace):       The command-line arguments (see main).
+        config (Config):        The configuration of the game.
+        replayer (Replayer):    The recording played (None to play with the keyboard or the scripted player).
+        timer (StartupTimer):   The timer of the startup, from the start of the imports (None to start it here).
+
+    Returns:
+
+        int : The exit code.
+
+    '''
+
+    if args.headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    level = replayer.level if replayer is not None else args.level
+    seed = replayer.seed if replayer is not None else args.seed if args.seed is not None else random.randrange(2**32)
+    random.seed(seed)
+
+    timer = timer or StartupTimer()
+
+    #The images are decoded in the background while the display is initialized (only the modules of pygame the game uses)
+    images = preload_images()
 
+    pg.display.init()
     pg.font.init()
-    pg.init()
 
     WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLOR, gravity = get_parameters()
 
-    FPS = 60
-
-    WINDOW = pg.display.set_mode((WIDTH, HEIGHT))
+    WINDOW = pg.display.set_mode((WIDTH, HEIGHT), 0 if args.headless else pg.SCALED | pg.RESIZABLE)
     pg.display.set_caption('Tank destroyer')
+    timer.lap('display')
 
-    clock = pg.time.Clock()
+    wait(images)
+    timer.lap('assets')
 
     #Initialize game
-    game = Game()
+    game = Game(config)
+
+    if level < 1 or level > game.max_levels and not config.endless:
+        pg.quit()
+        print(f'main.py: error: there is no level {level} (1 to {game.max_levels}, or more with --endless)')
+        return 2
+
+    game.current_level = level
+    game.init()
+    timer.lap('level')
+
+    #Allocation tracking (debug mode)
+    allocation_tracker = None
+    if config.track_allocs:
+        from allocation_tracker import AllocationTracker
+        allocation_tracker = AllocationTracker()
+        allocation_tracker.start()
+
+    #Frame profiler (does nothing unless enabled)
+    profiler = FrameProfiler(config.profile, config.profile_csv)
+
+    #The inputs: the keyboard, a recording, or the scripted player (headless, on a fixed time step)
+    controller = replayer
+    if controller is None and args.headless:
+        from scripted_player import ScriptedPlayer
+        controller = ScriptedPlayer()
+
+    recorder = None
+    if args.record:
+        from replay import Recorder
+        recorder = Recorder(level, seed, config)
+
+    #Capture of the presented frames (written by a background thread, see capture)
+    capture = None
+    if config.capture:
+        from capture import FrameCapture
+
+        try:
+            capture = FrameCapture(config.capture, WIDTH, HEIGHT, config.fps or 60, config.capture_policy, config.capture_queue)
+        except OSError as error:
+            pg.quit()
+            print(f'main.py: error: capture: {error}')
+            return 2
+
+    fixed_dt = 1000 / 60 if args.headless and replayer is None else None
+
+    loop = GameLoop(game, WINDOW, None if args.headless else config.fps or None, fixed_dt, controller, profiler, allocation_tracker, recorder, capture)
+
+    #Main loop (the current state of the game handles the events, updates and draws the frame). Headlessly, the scripted
+    #player cannot use the end-of-game menu, so the session ends with the game
+    start = time.perf_counter()
+
+    try:
+        while game.play_again and (args.ticks is None or loop.frames < args.ticks) and not (replayer is not None and replayer.finished()):
+            loop.step()
+
+            if loop.frames == 1:
+                timer.lap('first frame')
+                if config.startup_report:
+                    print(timer.report())
+
+            if controller is not None and replayer is None and isinstance(game.state, (GameOverState, VictoryState)):
+                break
+
+    finally:
+        #The frame rate of the loop (without the frames the capture still has to write)
+        elapsed = time.perf_counter() - start
+
+        if recorder is not None:
+            recorder.save(args.record)
+            print(f'Recorded {len(recorder.frames)} frames to {args.record} (seed {seed})')
+
+        if capture is not None:
+            capture.close()
+            print(capture.report())
+
+    if args.headless or replayer is not None or args.ticks is not None:
+        print(f'{loop.frames} frames in {elapsed:.2f} s ({loop.frames / max(elapsed, 1e-9):.0f} frames/s): '
+              f'level {game.current_level}, {game.tank_lives} lives, {type(game.state).__name__}')
+
+    if allocation_tracker is not None:
+        allocation_tracker.stop()
+
+    profiler.close()
+    pg.quit()
+
+    return 0
+
+def run_profiled(function, path):
+
+    '''
+    Runs a function under cProfile, writes the statistics to a file (they can be read with pstats or a viewer such as
+    snakeviz) and prints the functions with the highest cumulative time.
+
+    Parameters:
+
+        function (function):    The function (without arguments).
+        path (str):             The file the statistics are written to.
+
+    Returns:
+
+        The result of the function.
+
+    '''
+
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+
+    try:
+        return profile.runcall(function)
+
+    finally:
+        profile.dump_stats(path)
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+        print(f'Profile written to {path}')
+
+def percentile(ordered, q):
+    return ordered[round(q * (len(ordered) - 1))] if ordered else 0.0
+
+def peak_rss_kb():
+
+    '''
+    Returns the peak resident set size of the process in KiB (None where the resource module is not available).
+    '''
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def play_scripted_level(WINDOW, level, max_ticks, seed, config = None):
+
+    '''
+    Plays a level with the scripted player through the game loop, at an uncapped frame rate and with a fixed time step
+    (every tick advances the game 1/60 s), so every run plays exactly the same game.
+    As in the game, when the player dies the level starts again after the countdown (but the scripted player never
+    runs out of lives). The scenario ends when the level is cleared or after max_ticks ticks.
+
+    Parameters:
+
+        WINDOW (pygame.Surface):    The window surface to draw on
+        level (int):                The level to play.
+        max_ticks (int):            The maximum number of ticks of the scenario.
+        seed (int):                 The seed of the random motion of the enemies.
+        config (Config):            The configuration of the game (the defaults if None; its frame cap is not used).
+
+    Returns:
+
+        dict : The outcome of the scenario, its number of ticks and deaths, the ticks per second and the frame-time percentiles (in ms).
+
+    '''
+
+    from scripted_player import ScriptedPlayer
+
+    random.seed(seed + level)
+
+    game = Game(config)
+    game.current_level = level
     game.init()
 
-    #Main loop
-    while game.play_again:
-        
-        clock.tick(FPS)
-
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                pg.quit()
-            
-            #Check if the player wants to fire
-            if event.type == pg.KEYDOWN and event.key == pg.K_SPACE and not game.tank.firing :
-                game.tank.firing_power = 0
-            
-            #Fire
-            elif event.type == pg.KEYUP and event.key == pg.K_SPACE and not game.tank.firing:
-                game.tank.fire()
-                game.tank.firing_power = 0
-
-        keys_pressed = pg.key.get_pressed()
-
-        #Handle (user) tank and enemies
-        game.handle_tank(keys_pressed)
-        game.handle_enemy()
-
-        #Draw everything
-        game.draw_window(WINDOW)
-
-        #Check if all enemies are dead
-        if len(game.enemies) == 0:
-
-            #Check if player has passed all levels
-            if game.current_level == game.max_levels:
-                game.handle_end_game(WINDOW, victory=True)
-            
-            #If not, next level
-            else:
-                game.draw_next_level_window(WINDOW, game.current_level, passed=True)
-                game.current_level += 1
-                game.init()
-
-        #Update time counter (loading) for enemies
-        for enemy in game.enemies:
-            enemy.time_counter += clock.get_time()
-
-        game.check_tank_is_dead(WINDOW)
+    loop = GameLoop(game, WINDOW, fps = None, fixed_dt = 1000 / 60, controller = ScriptedPlayer())
+    frame_times = []
+    outcome = 'timeout'
+    deaths = 0
+
+    start = time.perf_counter()
+
+    while len(frame_times) < max_ticks:
+
+        frame_start = time.perf_counter()
+        state = game.state
+
+        loop.step()
+
+        frame_times.append((time.perf_counter() - frame_start) * 1000)
+
+        #The scripted player never runs out of lives (the countdown takes back the life given here)
+        if game.state is not state and isinstance(game.state, RetryState):
+            deaths += 1
+            game.tank_lives += 1
+
+        elif not game.enemies:
+            outcome = 'cleared'
+            break
+
+    elapsed = time.perf_counter() - start
+    frame_times.sort()
+
+    return {'level': level, 'outcome': outcome, 'ticks': len(frame_times), 'deaths': deaths, 'ticks_per_sec': len(frame_times) / elapsed,
+            'frame_ms_p50': percentile(frame_times, 0.5), 'frame_ms_p95': percentile(frame_times, 0.95),
+            'frame_ms_p99': percentile(frame_times, 0.99), 'frame_ms_max': frame_times[-1]}
+
+def compare_with_baseline(results, baseline, threshold):
+
+    '''
+    Compares the results of the benchmark with a baseline. A regression is a drop of the ticks per second
+    or a rise of the 95th percentile of the frame time bigger than the threshold (relative). The results of another
+    configuration of the game (see config) are still compared, with a warning.
+
+    Parameters:
+
+        results (dict):     The results of the benchmark.
+        baseline (dict):    The baseline results.
+        threshold (float):  The relative change allowed (e.g. 0.1 for 10%).
+
+    Returns:
+
+        list : The descriptions of the regressions (empty if there are none).
+
+    '''
+
+    regressions = []
+
+    changed = sorted(name for name, value in results.get('config', {}).items() if baseline.get('config', {}).get(name, value) != value)
+    if changed:
+        print('Warning: the baseline was run with another configuration (' +
+              ', '.join(f"{name} {baseline['config'][name]} -> {results['config'][name]}" for name in changed) + ')')
+
+    baseline_levels = {entry['level']: entry for entry in baseline['levels']}
+
+    for name, entry, reference in [('overall', results['overall'], baseline['overall'])] + \
+            [(f"level {entry['level']}", entry, baseline_levels.get(entry['level'])) for entry in results['levels']]:
+
+        if reference is None:
+            continue
+
+        if entry['ticks_per_sec'] < reference['ticks_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {entry['ticks_per_sec']:.0f} ticks/s (baseline {reference['ticks_per_sec']:.0f})")
+
+        if entry['frame_ms_p95'] > reference['frame_ms_p95'] * (1 + threshold):
+            regressions.append(f"{name}: p95 frame {entry['frame_ms_p95']:.2f} ms (baseline {reference['frame_ms_p95']:.2f} ms)")
 
+        if 'ticks' in reference and entry['ticks'] != reference['ticks']:
+            print(f"Warning: {name} played {entry['ticks']} ticks (baseline {reference['ticks']}), the scenario has changed")
+
+    return regressions
+
+def bench(argv = None):
+
+    '''
+    End-to-end benchmark of the whole game. It plays a scripted scenario on each level headlessly
+    (see play_scripted_level), reports the ticks per second, the frame-time percentiles and the peak RSS,
+    and compares them with a stored baseline. The configuration of the game (see config) is recorded with the results,
+    so the variants of the performance knobs (e.g. --solver-velocities 11) can be compared with each other.
+
+    Parameters:
+
+        argv (list): The command-line arguments (sys.argv[2:] when run as 'python main.py bench').
+
+    Returns:
+
+        int : The exit code: 1 if there is a regression beyond the threshold, 0 otherwise.
+
+    '''
+
+    parser = argparse.ArgumentParser(prog = 'main.py bench', description = 'Scripted end-to-end benchmark of the game.')
+    parser.add_argument('--baseline', default = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json'),
+                        help = 'baseline file to compare with')
+    parser.add_argument('--threshold', type = float, default = 0.15, help = 'relative regression allowed (default 0.15)')
+    parser.add_argument('--update-baseline', action = 'store_true', help = 'store the results as the new baseline')
+    parser.add_argument('--output', help = 'JSON file the results are written to')
+    parser.add_argument('--max-ticks', type = int, default = 1800, help = 'maximum ticks per level')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the random motion of the enemies')
+    parser.add_argument('--cprofile', metavar = 'PATH', help = 'profile the scenarios with cProfile and write the statistics (pstats) to a file')
+    Config.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        config = Config.load(args = args)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    from benchmarks import environment_metadata
+    WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLOR, gravity = get_parameters()
+
+    pg.display.init()
+    pg.font.init()
+    WINDOW = pg.display.set_mode((WIDTH, HEIGHT))
+
+    def play_levels():
+
+        levels = []
+        for level in range(1, count_levels() + 1):
+            levels.append(play_scripted_level(WINDOW, level, args.max_ticks, args.seed, config))
+
+            #The game of the scenario references itself (e.g. through its state): it is freed before the next scenario,
+            #out of the measured ticks, so the games do not pile up until an automatic collection
+            gc.collect()
+
+            entry = levels[-1]
+            print(f"level {level}: {entry['outcome']:<8} {entry['ticks']:>5} ticks  {entry['deaths']} deaths  {entry['ticks_per_sec']:>8.0f} ticks/s  "
+                  f"p50 {entry['frame_ms_p50']:.2f} ms  p95 {entry['frame_ms_p95']:.2f} ms  p99 {entry['frame_ms_p99']:.2f} ms")
+
+        return levels
+
+    #Under the profiler, the timings are slower (they are still compared with the baseline)
+    levels = run_profiled(play_levels, args.cprofile) if args.cprofile else play_levels()
+
+    total_ticks = sum(entry['ticks'] for entry in levels)
+    total_time = sum(entry['ticks'] / entry['ticks_per_sec'] for entry in levels)
+
+    results = {
+        'metadata': environment_metadata(),
+        'config': config.as_dict(),
+        'overall': {'ticks': total_ticks, 'ticks_per_sec': total_ticks / total_time,
+                    'frame_ms_p95': max(entry['frame_ms_p95'] for entry in levels), 'peak_rss_kb': peak_rss_kb()},
+        'levels': levels,
+    }
+
+    print(f"overall: {total_ticks} ticks  {results['overall']['ticks_per_sec']:.0f} ticks/s  peak RSS {results['overall']['peak_rss_kb']} KiB")
     pg.quit()
 
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent = 2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent = 2)
+        print(f'Baseline stored in {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline found at {args.baseline} (run with --update-baseline to create it)')
+        return 0
+
+    with open(args.baseline) as file:
+        regressions = compare_with_baseline(results, json.load(file), args.threshold)
+
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+
+    return 1 if regressions else 0
+
+def versus_main(argv = None):
+
+    #The versus mode (and its network code) is only imported when it is played
+    import versus
+    return versus.main(argv)
+
+#The commands of 'python main.py <command>' (playing is the default)
+COMMANDS = {'play': main, 'bench': bench, 'versus': versus_main}
+
 if __name__ == '__main__':
-    main()
+
+    command = COMMANDS.get(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    if command is not None:
+        sys.exit(command(sys.argv[2:]))
+
+    sys.exit(main(sys.argv[1:]))
 
 
 
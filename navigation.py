@@ -0,0 +1,313 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Navigation of the enemy tanks. When a level is created, the surfaces a tank can stand on (the floor and the
+obstacles that act as a FLOOR, see Obstacles) are split into walkable spans: the parts of the surface that are
+not blocked by the obstacles crossing the height of the tanks standing on it. The spans at the same height form a lane.
+
+Each lane also keeps the tanks standing on it sorted by x, so the free space around a tank (up to the end of its
+span or to the next tank) is found with a binary search instead of checking every obstacle and every tank.
+
+'''
+
+#Offset between the top of a surface and the y-coordinate of a tank standing on it
+TANK_OFFSET = 54
+TANK_SIZE = 70
+
+class Lane:
+
+    '''
+    The walkable spans at a given height and the tanks standing on them.
+
+    Attributes:
+
+        - y (int):              the y-coordinate of the tanks standing on the lane
+        - spans (list):         the walkable spans (left, right), sorted
+        - span_lefts (list):    the left borders of the spans (to search them)
+        - xs (list):            the x-coordinates of the tanks on the lane, sorted
+        - tanks (list):         the tanks on the lane, in the order of xs
+
+    Methods:
+
+        - span_index:       returns the index of the span under a given x-coordinate
+        - add:              adds a tank to the lane
+        - remove:           removes a tank from the lane
+        - move:             updates the position of a tank that has moved
+        - free_distances:   returns the free distances on the left and on the right of a tank
+
+    '''
+
+    def __init__(self, y, spans):
+        self.y = y
+        self.spans = spans
+        self.span_lefts = [left for left, right in spans]
+        self.xs = []
+        self.tanks = []
+
+    def span_index(self, x):
+        i = bisect_right(self.span_lefts, x) - 1
+        return i if i >= 0 and x < self.spans[i][1] else None
+
+    def index(self, tank, x):
+        i = bisect_left(self.xs, x)
+        while self.tanks[i] is not tank:
+            i += 1
+        return i
+
+    def add(self, tank):
+        i = bisect_right(self.xs, tank.x)
+        self.xs.insert(i, tank.x)
+        self.tanks.insert(i, tank)
+
+    def remove(self, tank):
+        i = self.index(tank, tank.x)
+        del self.xs[i]
+        del self.tanks[i]
+
+    def move(self, tank, old_x):
+
+        '''
+        Updates the position of a tank that has moved from old_x to tank.x. The tanks of a lane do not overtake
+        each other, but if they do (e.g. when they are spawned at the same position) the order is repaired locally.
+
+        Parameters:
+
+            - tank (EnemyTank):     the tank
+            - old_x (float):        the x-coordinate of the tank before moving
+
+        Returns: None
+        '''
+
+        xs, tanks = self.xs, self.tanks
+        i = self.index(tank, old_x)
+        xs[i] = tank.x
+
+        while i > 0 and xs[i - 1] > xs[i]:
+            xs[i - 1], xs[i] = xs[i], xs[i - 1]
+            tanks[i - 1], tanks[i] = tanks[i], tanks[i - 1]
+            i -= 1
+
+        while i < len(xs) - 1 and xs[i + 1] < xs[i]:
+            xs[i + 1], xs[i] = xs[i], xs[i + 1]
+            tanks[i + 1], tanks[i] = tanks[i], tanks[i + 1]
+            i += 1
+
+    def free_distances(self, tank):
+
+        '''
+        Computes the free distances on the left and on the right of a tank: up to the end of its span or to the
+        nearest tank of the lane (the tanks overlapping it are ignored, as they can only move away from it).
+
+        Parameters:
+
+            - tank (EnemyTank):     the tank
+
+        Returns:
+
+            A tuple with the left and right free distances (both 0 if the tank is not on a span).
+        '''
+
+        x, right_edge = tank.x, tank.x + tank.size
+        span = self.span_index(x)
+
+        if span is None:
+            return 0, 0
+
+        left, right = self.spans[span]
+        left_distance, right_distance = max(x - left, 0), max(right - right_edge, 0)
+
+        #Nearest tanks that do not overlap the tank (all the tanks have the same size)
+        xs = self.xs
+        i = bisect_left(xs, x - tank.size) - 1
+        if i >= 0:
+            left_distance = min(left_distance, x - (xs[i] + tank.size))
+
+        i = bisect_right(xs, right_edge)
+        if i < len(xs):
+            right_distance = min(right_distance, xs[i] - right_edge)
+
+        return left_distance, right_distance
+
+class Navigation:
+
+    '''
+    The navigation structure of a level: the lanes with their walkable spans and the tanks on them.
+    It is built once per level.
+
+    Attributes:
+
+        - obstacles (Obstacles):    the obstacles of the level
+        - lanes (dict):             the lanes, by the y-coordinate of the tanks standing on them
+
+    Methods:
+
+        - lane:         returns the lane at a given height (building it the first time)
+        - add:          adds a tank to the lane it stands on
+        - remove:       removes a tank from its lane
+        - release:      removes all the tanks from their lanes (when the level is discarded)
+        - danger_zones: returns the parts of the lanes a shell goes through
+        - tanks_between: returns the tanks of all the lanes in a horizontal range
+
+    '''
+
+    def __init__(self, obstacles, tanks = ()):
+        self.obstacles = obstacles
+        self.lanes = {}
+
+        #Lanes of the floor and of the obstacles that act as a surface
+        self.lane(FLOOR_POS[1] - TANK_OFFSET)
+        for obstacle in obstacles.obstacles:
+            if obstacle.width > obstacle.height:
+                self.lane(obstacle.top - TANK_OFFSET)
+
+        for tank in tanks:
+            self.add(tank)
+
+    def lane(self, y):
+
+        lane = self.lanes.get(y)
+
+        if lane is None:
+            lane = self.lanes[y] = Lane(y, self.walkable_spans(y))
+
+        return lane
+
+    def walkable_spans(self, y):
+
+        '''
+        Computes the walkable spans for the tanks at a given height: the surfaces under them minus the parts
+        blocked by the obstacles that cross their height. Where there is no surface (e.g. a tank placed in the air),
+        the whole width of the world is the surface.
+
+        Parameters:
+
+            - y (int):  the y-coordinate of the tanks
+
+        Returns:
+
+            - list: the spans (left, right), sorted
+        '''
+
+        surface_top = y + TANK_OFFSET
+        surfaces = []
+        blockers = []
+
+        if surface_top == FLOOR_POS[1]:
+            surfaces.append((FLOOR_POS[0], self.obstacles.width))
+
+        for obstacle in self.obstacles.obstacles:
+
+            if obstacle.top == surface_top and obstacle.width > obstacle.height:
+                surfaces.append((obstacle.left, obstacle.right))
+
+            elif obstacle.top < y + TANK_SIZE and obstacle.bottom > y:
+                blockers.append((obstacle.left, obstacle.right))
+
+        if not surfaces:
+            surfaces.append((0, self.obstacles.width))
+
+        #Merging the surfaces that touch and removing the blocked parts
+        spans = []
+        for left, right in sorted(surfaces):
+            if spans and left <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], right))
+            else:
+                spans.append((left, right))
+
+        for block_left, block_right in sorted(blockers):
+            cut = []
+            for left, right in spans:
+                if block_right <= left or block_left >= right:
+                    cut.append((left, right))
+                    continue
+                if left < block_left:
+                    cut.append((left, block_left))
+                if block_right < right:
+                    cut.append((block_right, right))
+            spans = cut
+
+        return spans
+
+    def add(self, tank):
+        tank.lane = self.lane(tank.y)
+        tank.lane.add(tank)
+
+    def remove(self, tank):
+        if tank.lane is not None:
+            tank.lane.remove(tank)
+            tank.lane = None
+
+    def release(self):
+
+        '''
+        Removes all the tanks from their lanes. The tanks and their lanes reference each other, so without it they
+        would only be freed by a collection of the garbage collector (see Game.release_level).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        for lane in self.lanes.values():
+            for tank in lane.tanks:
+                tank.lane = None
+            lane.xs.clear()
+            lane.tanks.clear()
+
+    def danger_zones(self, xs, ys, size = 7):
+
+        '''
+        Finds the parts of the lanes that a shell goes through, from its predicted positions (see Bullet.predict_impact):
+        for every lane, the horizontal ranges where the shell is at the height of the tanks standing on it (one range
+        each time it goes through that height). It is computed once per shot and shared by all the enemies.
+
+        Parameters:
+
+            - xs (ndarray):     the predicted x-coordinates of the shell at every tick
+            - ys (ndarray):     the predicted y-coordinates of the shell at every tick
+            - size (int):       the size of the shell
+
+        Returns:
+
+            - dict: the danger zones of every lane, as a list of (left, right, first tick, last tick), by the y of the lanes
+        '''
+
+        zones = {}
+
+        for y in self.lanes:
+            crossing = np.flatnonzero((ys < y + TANK_SIZE) & (ys + size > y))
+
+            #Splitting the ticks at the height of the lane into consecutive runs
+            for run in np.split(crossing, np.flatnonzero(np.diff(crossing) > 1) + 1):
+                if len(run):
+                    zone_xs = xs[run]
+                    zones.setdefault(y, []).append((float(zone_xs.min()), float(zone_xs.max()) + size, int(run[0]) + 1, int(run[-1]) + 1))
+
+        return zones
+
+    def tanks_between(self, left, right):
+
+        '''
+        Finds the tanks (of all the lanes) that overlap a horizontal range, with a binary search in every lane,
+        so the cost does not depend on the number of tanks out of the range (e.g. to draw only the tanks in the view).
+
+        Parameters:
+
+            - left (float):     the left border of the range
+            - right (float):    the right border of the range
+
+        Returns:
+
+            - list: the tanks
+        '''
+
+        tanks = []
+
+        for lane in self.lanes.values():
+            tanks += lane.tanks[bisect_right(lane.xs, left - TANK_SIZE):bisect_left(lane.xs, right)]
+
+        return tanks
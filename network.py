@@ -0,0 +1,644 @@
+import time
+import socket
+import struct
+from collections import deque
+import numpy as np
+import pygame as pg
+
+'''
+Networking of the versus mode (see versus), over UDP. The host runs the authoritative game and sends snapshots of its
+state to the clients, and the clients send their inputs to the host.
+
+Packets (the first byte is the kind of the packet):
+
+    - 'H' (client -> host):     hello, sent until the host answers.
+    - 'W' (host -> client):     welcome: the level played and the slot of the client (1 for the second player,
+                                more for the spectators).
+    - 'I' (client -> host):     the last INPUT_REDUNDANCY inputs of the client (one byte per tick, numbered), so a lost
+                                packet does not lose inputs, and the tick of the last snapshot received (the ack).
+    - 'S' (host -> client):     a snapshot: the state of the game and the new events (e.g. the craters).
+
+The state of a snapshot is a vector of numbers, quantized (each field has its step, e.g. a quarter of pixel for the
+positions) and delta-compressed: it is sent as the difference with the last snapshot acknowledged by the client
+(a bitmask of the values that changed and their differences, as variable-length integers), or in full when there is
+no such snapshot. The events are a list that only grows, so only the ones the client has not acknowledged are sent.
+
+Both sides measure the traffic (bytes per second), and the client measures the end-to-end input latency: the time
+from the moment an input is sent to the moment a snapshot shows the host has played it.
+
+'''
+
+DEFAULT_PORT = 50007
+
+#Snapshots sent per second (the host plays 60 ticks per second)
+SNAPSHOT_RATE = 20
+
+#Inputs repeated in every input packet
+INPUT_REDUNDANCY = 8
+
+#Inputs the host keeps waiting for a client (beyond that, it skips the oldest ones to catch up)
+MAX_INPUT_QUEUE = 6
+
+#Snapshots kept by the host (as the bases of the deltas) and by the client (to decode them)
+HISTORY = 64
+
+#Events sent in a snapshot at most (the rest go in the next ones)
+MAX_EVENTS = 64
+
+#Time between two hellos of a client (in ms)
+HELLO_INTERVAL = 500
+
+#Base tick of a full snapshot
+NO_BASE = 0xFFFFFFFF
+
+#Keys of the inputs, in the order of their bits
+INPUT_KEYS = (pg.K_LEFT, pg.K_RIGHT, pg.K_UP, pg.K_DOWN, pg.K_SPACE)
+SPACE_BIT = 1 << INPUT_KEYS.index(pg.K_SPACE)
+
+HEADER = struct.Struct('<IIIH')
+EVENTS_HEADER = struct.Struct('<IH')
+EVENT = struct.Struct('<3i')
+INPUT_HEADER = struct.Struct('<IIB')
+WELCOME = struct.Struct('<HB')
+
+def now_ms():
+    return time.perf_counter() * 1000
+
+def encode_input(keys_pressed):
+
+    '''
+    Returns the input of a tick (the keys of INPUT_KEYS that are pressed) as a byte.
+
+    Parameters:
+
+        keys_pressed (list) :   The keys pressed (as returned by pygame.key.get_pressed()).
+
+    Returns:
+
+        int : The bits of the keys pressed.
+
+    '''
+
+    bits = 0
+    for i, key in enumerate(INPUT_KEYS):
+        if keys_pressed[key]:
+            bits |= 1 << i
+
+    return bits
+
+class InputKeys:
+
+    '''
+    Replacement of pygame.key.get_pressed() for the inputs received from the network (see encode_input).
+    It can be indexed with the pygame key constants.
+
+    Attributes:
+
+        - bits (int): the bits of the keys pressed
+
+    '''
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __getitem__(self, key):
+        return key in INPUT_KEYS and bool(self.bits & (1 << INPUT_KEYS.index(key)))
+
+def write_varints(values):
+
+    '''
+    Encodes integers as variable-length integers (7 bits per byte), after mapping the signed values to unsigned ones
+    (0, -1, 1, -2, ... to 0, 1, 2, 3, ...), so small differences take one byte.
+
+    Parameters:
+
+        values (list) : The integers.
+
+    Returns:
+
+        bytearray : The encoded integers.
+
+    '''
+
+    data = bytearray()
+
+    for value in values:
+        value = value*2 if value >= 0 else -value*2 - 1
+
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+
+        data.append(value)
+
+    return data
+
+def read_varints(data, offset, count):
+
+    '''
+    Decodes integers encoded by write_varints.
+
+    Parameters:
+
+        data (bytes) :      The packet.
+        offset (int) :      The position of the first integer in the packet.
+        count (int) :       The number of integers.
+
+    Returns:
+
+        values (list) : The integers.
+        offset (int) :  The position after the last integer.
+
+    '''
+
+    values = []
+
+    for _ in range(count):
+        value = shift = 0
+
+        while True:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+
+        values.append(value >> 1 if value % 2 == 0 else -(value >> 1) - 1)
+
+    return values, offset
+
+def encode_delta(state, base):
+
+    '''
+    Encodes a quantized state as its difference with a base state: a bitmask of the values that changed,
+    followed by their differences (see write_varints).
+
+    Parameters:
+
+        state (ndarray) :   The quantized state (integers).
+        base (ndarray) :    The base state (zeros for a full snapshot).
+
+    Returns:
+
+        bytes : The encoded state.
+
+    '''
+
+    changed = state != base
+
+    return np.packbits(changed, bitorder = 'little').tobytes() + write_varints((state - base)[changed].tolist())
+
+def decode_delta(data, offset, base):
+
+    '''
+    Decodes a state encoded by encode_delta.
+
+    Parameters:
+
+        data (bytes) :      The packet.
+        offset (int) :      The position of the encoded state in the packet.
+        base (ndarray) :    The base state.
+
+    Returns:
+
+        state (ndarray) :   The quantized state.
+        offset (int) :      The position after the encoded state.
+
+    '''
+
+    mask_size = (len(base) + 7) // 8
+    changed = np.unpackbits(np.frombuffer(data, np.uint8, mask_size, offset), count = len(base), bitorder = 'little').astype(bool)
+    differences, offset = read_varints(data, offset + mask_size, int(changed.sum()))
+
+    state = base.copy()
+    state[changed] += np.array(differences, dtype = np.int64)
+
+    return state, offset
+
+class NetStats:
+
+    '''
+    Measures the traffic of a connection and, on a client, the input latency.
+
+    Attributes:
+
+        - start (float):        the time the measures started (in ms)
+        - total_bytes (int):    the bytes counted since the start
+        - recent (deque):       the (time, bytes) of the packets of the last second
+        - latencies (deque):    the last input latencies (in ms)
+
+    Methods:
+
+        - add_bytes:        counts a packet
+        - add_latency:      adds a latency sample
+        - bytes_per_second: returns the traffic of the last second
+        - report:           returns the averages since the start
+
+    '''
+
+    def __init__(self):
+        self.start = now_ms()
+        self.total_bytes = 0
+        self.recent = deque()
+        self.latencies = deque(maxlen = 600)
+
+    def add_bytes(self, size):
+        now = now_ms()
+        self.total_bytes += size
+        self.recent.append((now, size))
+
+        while self.recent[0][0] < now - 1000:
+            self.recent.popleft()
+
+    def add_latency(self, latency):
+        self.latencies.append(latency)
+
+    def bytes_per_second(self):
+        return sum(size for moment, size in self.recent if moment >= now_ms() - 1000)
+
+    def report(self):
+
+        '''
+        Returns the measures since the start: the average traffic and the latency (mean and 95th percentile).
+
+        Parameters: None
+
+        Returns:
+
+            dict : The measures.
+        '''
+
+        seconds = max(now_ms() - self.start, 1) / 1000
+        latencies = sorted(self.latencies)
+
+        return {'bytes_per_sec': self.total_bytes / seconds,
+                'latency_ms_mean': sum(latencies) / len(latencies) if latencies else None,
+                'latency_ms_p95': latencies[round(0.95 * (len(latencies) - 1))] if latencies else None}
+
+class Connection:
+
+    '''
+    A client of the host.
+
+    Attributes:
+
+        - address (tuple):      the address of the client
+        - slot (int):           1 for the second player, more for the spectators
+        - inputs (dict):        the inputs received and not played yet, by number
+        - next_seq (int):       the number of the next input to play
+        - played_seq (int):     the number of the last input played (0 if none)
+        - bits (int):           the last input played
+        - acked_tick (int):     the tick of the last snapshot the client has received (None if none)
+        - known_events (dict):  the number of events the client knows once it has received a snapshot, by tick
+        - stats (NetStats):     the traffic sent to the client
+
+    '''
+
+    def __init__(self, address, slot):
+        self.address = address
+        self.slot = slot
+        self.inputs = {}
+        self.next_seq = 1
+        self.played_seq = 0
+        self.bits = 0
+        self.acked_tick = None
+        self.known_events = {}
+        self.stats = NetStats()
+
+class Server:
+
+    '''
+    The network side of the host: it receives the hellos and the inputs of the clients and sends them the snapshots.
+
+    Attributes:
+
+        - socket (socket):      the UDP socket
+        - level (int):          the level played (sent to the clients)
+        - steps (ndarray):      the quantization step of every value of the state
+        - interval (int):       the ticks between two snapshots
+        - connections (dict):   the clients, by address
+        - history (dict):       the quantized states of the last snapshots, by tick
+        - tick (int):           the number of ticks played
+
+    Methods:
+
+        - poll:             receives the packets of the clients
+        - next_input:       returns the next input of a client to play
+        - player:           returns the connection of the second player (None if nobody has joined)
+        - end_tick:         counts a tick and sends the snapshots when it is time
+        - send_snapshot:    sends a snapshot to a client
+        - close:            closes the socket
+
+    '''
+
+    def __init__(self, level, steps, port = DEFAULT_PORT, rate = SNAPSHOT_RATE, fps = 60):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('', port))
+        self.socket.setblocking(False)
+        self.level = level
+        self.steps = np.asarray(steps, dtype = np.float64)
+        self.interval = max(round(fps / rate), 1)
+        self.connections = {}
+        self.history = {}
+        self.tick = 0
+
+    def poll(self):
+
+        '''
+        Receives all the packets waiting in the socket: the hellos (a new client gets the next slot)
+        and the inputs (they are kept until they are played, see next_input).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        while True:
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return
+
+            connection = self.connections.get(address)
+
+            if data[:1] == b'H':
+                if connection is None:
+                    connection = self.connections[address] = Connection(address, len(self.connections) + 1)
+                self.socket.sendto(b'W' + WELCOME.pack(self.level, connection.slot), address)
+
+            elif data[:1] == b'I' and connection is not None and len(data) >= 1 + INPUT_HEADER.size:
+                acked_tick, newest, count = INPUT_HEADER.unpack_from(data, 1)
+
+                #Only the acks of the snapshots sent to this client are trusted (a stray or forged packet could name any tick)
+                if acked_tick in connection.known_events and (connection.acked_tick is None or acked_tick > connection.acked_tick):
+                    connection.acked_tick = acked_tick
+
+                #Only the inputs of the second player are played (the spectators only send their acks)
+                if connection.slot != 1:
+                    continue
+
+                for i, bits in enumerate(data[1 + INPUT_HEADER.size:1 + INPUT_HEADER.size + count]):
+                    seq = newest - count + 1 + i
+                    if seq >= connection.next_seq:
+                        connection.inputs[seq] = bits
+
+    def next_input(self, connection):
+
+        '''
+        Returns the next input of a client, in order. If it has not arrived, the last one is played again (without
+        counting it as played). If the client is too far ahead, the oldest inputs are skipped so the latency does not
+        build up, and if some inputs have been lost, they are skipped.
+
+        Parameters:
+
+            connection (Connection) :   The client.
+
+        Returns:
+
+            int : The input (see encode_input).
+        '''
+
+        inputs = connection.inputs
+
+        if inputs and (connection.next_seq not in inputs or len(inputs) > MAX_INPUT_QUEUE):
+            connection.next_seq = max(connection.next_seq, min(inputs), max(inputs) - MAX_INPUT_QUEUE + 1)
+
+            for seq in [seq for seq in inputs if seq < connection.next_seq]:
+                del inputs[seq]
+
+        if connection.next_seq in inputs:
+            connection.bits = inputs.pop(connection.next_seq)
+            connection.played_seq = connection.next_seq
+            connection.next_seq += 1
+
+        return connection.bits
+
+    def player(self):
+        return next((connection for connection in self.connections.values() if connection.slot == 1), None)
+
+    def end_tick(self, state, events):
+
+        '''
+        Counts a tick and, every interval ticks, quantizes the state and sends a snapshot to every client.
+
+        Parameters:
+
+            state (list) :  The values of the state (see steps).
+            events (list) : All the events since the start (tuples of 3 integers).
+
+        Returns: None
+        '''
+
+        self.tick += 1
+
+        if self.tick % self.interval:
+            return
+
+        quantized = np.round(np.asarray(state, dtype = np.float64) / self.steps).astype(np.int64)
+
+        for connection in self.connections.values():
+            self.send_snapshot(connection, quantized, events)
+            connection.known_events.pop(self.tick - HISTORY*self.interval, None)
+
+        self.history[self.tick] = quantized
+        self.history.pop(self.tick - HISTORY*self.interval, None)
+
+    def send_snapshot(self, connection, quantized, events):
+
+        '''
+        Sends a snapshot to a client: the state as a delta of the last snapshot it has acknowledged (in full if it is
+        no longer in the history), and the events it does not know.
+
+        Parameters:
+
+            connection (Connection) :   The client.
+            quantized (ndarray) :       The quantized state.
+            events (list) :             All the events since the start.
+
+        Returns: None
+        '''
+
+        base = self.history.get(connection.acked_tick)
+        first_event = connection.known_events.get(connection.acked_tick)
+
+        if base is None or first_event is None:
+            base_tick, base, first_event = NO_BASE, np.zeros_like(quantized), 0
+        else:
+            base_tick = connection.acked_tick
+
+        new_events = events[first_event:first_event + MAX_EVENTS]
+        connection.known_events[self.tick] = first_event + len(new_events)
+
+        packet = b'S' + HEADER.pack(self.tick, base_tick, connection.played_seq, len(quantized)) + encode_delta(quantized, base) + \
+                 EVENTS_HEADER.pack(first_event, len(new_events)) + b''.join(EVENT.pack(*event) for event in new_events)
+
+        self.socket.sendto(packet, connection.address)
+        connection.stats.add_bytes(len(packet))
+
+    def close(self):
+        self.socket.close()
+
+class Client:
+
+    '''
+    The network side of a client: it joins the host, sends the inputs and receives the snapshots.
+
+    Attributes:
+
+        - socket (socket):      the UDP socket
+        - address (tuple):      the address of the host
+        - steps (ndarray):      the quantization step of every value of the state
+        - level (int):          the level played (None until the host answers)
+        - slot (int):           the slot given by the host (None until it answers)
+        - last_hello (float):   the time of the last hello (in ms)
+        - snapshots (dict):     the quantized states of the last snapshots, by tick
+        - last_tick (int):      the tick of the last snapshot received (None if none)
+        - seq (int):            the number of the last input sent
+        - sent (deque):         the (number, input, time) of the inputs the host has not played yet
+        - played_seq (int):     the number of the last input the host has played
+        - played_bits (int):    the last input the host has played
+        - stats (NetStats):     the traffic received and the input latency
+
+    Methods:
+
+        - poll:         sends the hellos and receives the packets of the host
+        - send_input:   sends the input of a tick
+        - pending:      returns the inputs the host has not played yet
+        - close:        closes the socket
+
+    '''
+
+    def __init__(self, host, steps, port = DEFAULT_PORT):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.address = (socket.gethostbyname(host), port)
+        self.steps = np.asarray(steps, dtype = np.float64)
+        self.level = self.slot = None
+        self.last_hello = None
+        self.snapshots = {}
+        self.last_tick = None
+        self.seq = 0
+        self.sent = deque()
+        self.played_seq = 0
+        self.played_bits = 0
+        self.stats = NetStats()
+
+    def poll(self):
+
+        '''
+        Sends a hello if the host has not answered yet, and receives the packets of the host.
+        The snapshots older than the last one are dropped (UDP does not keep the order).
+
+        Parameters: None
+
+        Returns:
+
+            list : The new snapshots, as (state, events, first event) with the state as floats.
+        '''
+
+        if self.slot is None and (self.last_hello is None or now_ms() - self.last_hello > HELLO_INTERVAL):
+            self.last_hello = now_ms()
+            self.socket.sendto(b'H', self.address)
+
+        snapshots = []
+
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError):
+                return snapshots
+
+            self.stats.add_bytes(len(data))
+
+            if data[:1] == b'W' and len(data) >= 1 + WELCOME.size:
+                self.level, self.slot = WELCOME.unpack_from(data, 1)
+
+            elif data[:1] == b'S':
+                snapshot = self.read_snapshot(data)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+
+    def read_snapshot(self, data):
+
+        '''
+        Decodes a snapshot (see Server.send_snapshot) and updates the inputs the host has played.
+
+        Parameters:
+
+            data (bytes) :  The packet.
+
+        Returns:
+
+            tuple : The state (as floats), the events and the number of the first event (None if the snapshot is
+                    older than the last one, if its base is unknown, or if the packet is malformed, e.g. truncated).
+        '''
+
+        if len(data) < 1 + HEADER.size:
+            return None
+
+        tick, base_tick, played_seq, count = HEADER.unpack_from(data, 1)
+
+        if self.last_tick is not None and tick <= self.last_tick or count != len(self.steps):
+            return None
+
+        base = np.zeros(count, dtype = np.int64) if base_tick == NO_BASE else self.snapshots.get(base_tick)
+        if base is None:
+            return None
+
+        try:
+            state, offset = decode_delta(data, 1 + HEADER.size, base)
+            first_event, n_events = EVENTS_HEADER.unpack_from(data, offset)
+            events = [EVENT.unpack_from(data, offset + EVENTS_HEADER.size + i*EVENT.size) for i in range(n_events)]
+        except (struct.error, IndexError, ValueError):
+            return None
+
+        self.snapshots[tick] = state
+        self.last_tick = tick
+
+        while len(self.snapshots) > HISTORY:
+            del self.snapshots[min(self.snapshots)]
+
+        #The input latency: from the moment the last input played was sent, to now
+        while self.sent and self.sent[0][0] <= played_seq:
+            seq, bits, moment = self.sent.popleft()
+            if seq == played_seq:
+                self.played_bits = bits
+                self.stats.add_latency(now_ms() - moment)
+
+        self.played_seq = max(self.played_seq, played_seq)
+
+        return state * self.steps, events, first_event
+
+    def send_input(self, bits):
+
+        '''
+        Sends the input of a tick, with the previous ones (see INPUT_REDUNDANCY) and the ack of the last snapshot.
+
+        Parameters:
+
+            bits (int) :    The input (see encode_input).
+
+        Returns: None
+        '''
+
+        if self.slot is None:
+            return
+
+        self.seq += 1
+        self.sent.append((self.seq, bits, now_ms()))
+
+        #The inputs the host never played (e.g. it has stopped) are forgotten
+        if len(self.sent) > HISTORY:
+            self.sent.popleft()
+
+        recent = [bits for seq, bits, moment in list(self.sent)[-INPUT_REDUNDANCY:]]
+        acked_tick = NO_BASE if self.last_tick is None else self.last_tick
+
+        self.socket.sendto(b'I' + INPUT_HEADER.pack(acked_tick, self.seq, len(recent)) + bytes(recent), self.address)
+
+    def pending(self):
+        return [bits for seq, bits, moment in self.sent if seq > self.played_seq]
+
+    def close(self):
+        self.socket.close()
@@ -1,106 +1,465 @@
+import os
+import json
+import hashlib
+import pygame as pg
 from enemy import EnemyTank
 from obstacles import Obstacles
 from tank import Tank
+from entities import TankStore
+from config import DEFAULT_CONFIG
 from parameters import get_parameters
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
-def create_new_level(level):
+'''
+Levels of the game. Every level is defined in a JSON (or TOML) file of the levels folder, named level_<n>.json,
+with the spawn point of the player, the enemies (spawn point and loading_time) and the obstacles:
+
+    {
+        "name": "Level 2",
+        "metadata": {"description": "..."},                         (optional)
+        "width": 3300,                                              (optional, the width of the world, see camera)
+        "player": {"x": 100, "y": 596},
+        "enemies": [{"x": 700, "y": 596, "loading_time": 5000}],
+        "obstacles": [{"x": 500, "y": 400, "width": 40, "height": 350}]
+    }
+
+Each file is validated and compiled into a LevelTemplate, with the derived data of the obstacles (boundaries and
+collision grid) precomputed. The compiled templates are cached on disk (levels/.cache, as JSON), keyed by the hash
+of the file, so a level is only compiled again when its file changes (or when its cached file cannot be read).
+Adding a level only needs a new file.
+
+'''
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+CACHE_DIR = os.path.join(LEVELS_DIR, '.cache')
+
+#Changing the compiled format must change this version, so the old cached files are ignored
+COMPILER_VERSION = 3
+
+_templates = {}
+_backgrounds = {}
+
+class LevelTemplate:
 
     '''
-    
-    A function that defines the parameters of the game depending on the current level of the game.
-    It changes the number of enemies, their positions and the obstacles.
+    A compiled level, ready to be instantiated. It contains the spawn points of the tanks and the obstacles
+    with their derived data, so creating the objects of the level does not compute anything.
 
-    Parameters : 
-    
-        level (int) :      The current level of the game.
+    Attributes:
 
-    Returns :
+        - name (str):           the name of the level
+        - metadata (dict):      optional information about the level (e.g. a description)
+        - width (int):          the width of the world of the level
+        - player (tuple):       the (x, y) spawn point of the player
+        - enemies (list):       a list of (x, y, loading_time) of the enemies
+        - obstacles (list):     a list of (x, y, width, height) of the obstacles
+        - boundaries (list):    the boundaries of the obstacles (see Obstacles)
+        - grid (dict):          the collision grid of the obstacles (see Obstacles)
+        - layer (Surface):      the static layer, once it has been rendered
+        - layer_background (Surface): the background the static layer was rendered with
 
-        tank (Tank) :      The tank object of the player.
-        enemies (list) :   A list of enemy tank objects that contains the enemies of the new level.
-        obstacles (Obstacles) : An object of the Obstacles class that contains the obstacles of the new level.
+    Methods:
+
+        - instantiate:      creates the tank, the enemies and the obstacles of the level
+        - static_layer:     returns the static layer (background, floor and obstacles) of the level
+        - to_dict:          returns the compiled data, as plain JSON values (used to cache it)
+        - from_dict:        creates a template from the data of to_dict (class method)
+
+    '''
+
+    def __init__(self, name, metadata, player, enemies, obstacles, boundaries, grid, width = WIDTH):
+        self.name = name
+        self.metadata = metadata
+        self.width = width
+        self.player = player
+        self.enemies = enemies
+        self.obstacles = obstacles
+        self.boundaries = boundaries
+        self.grid = grid
+        self.layer = None
+        self.layer_background = None
+
+    def instantiate(self, config = DEFAULT_CONFIG):
+
+        '''
+        Creates the objects of the level.
+
+        Parameters:
+
+            config (Config) :   The configuration of the game (the speeds of the tanks, see config).
+
+        Returns:
+
+            tank (Tank) :           The tank object of the player.
+            enemies (list) :        A list of enemy tank objects.
+            obstacles (Obstacles) : An object of the Obstacles class that contains the obstacles.
+
+        '''
+
+        #All the tanks of the level share a store (see entities)
+        store = TankStore(1 + len(self.enemies))
+        tank = Tank(*self.player, store, self.width, config.tank_speed)
+        enemies = [EnemyTank(x, y, loading_time, store, config.enemy_speed) for x, y, loading_time in self.enemies]
+
+        obstacles = Obstacles(self.width)
+        obstacles.obstacles = [pg.Rect(obstacle) for obstacle in self.obstacles]
+        obstacles.boundaries = list(self.boundaries)
+        obstacles.grid = {cell: list(indices) for cell, indices in self.grid.items()}
+
+        return tank, enemies, obstacles
+
+    def static_layer(self, background):
+
+        '''
+        Returns the static layer of the level: the background (repeated along the world) with the floor and the obstacles
+        drawn on it. It is only rendered the first time it is requested (or if the background changes) and then reused.
+
+        Parameters:
+
+            background (Surface) :  The background of the game.
+
+        Returns:
+
+            Surface : The static layer.
+
+        '''
+
+        if self.layer is None or self.layer_background is not background:
+            obstacles = Obstacles(self.width)
+            obstacles.obstacles = [pg.Rect(obstacle) for obstacle in self.obstacles]
+            self.layer = render_static_layer(background, obstacles)
+            self.layer_background = background
+
+        return self.layer
+
+    def to_dict(self):
+        return {'name': self.name, 'metadata': self.metadata, 'player': self.player, 'enemies': self.enemies,
+                'obstacles': self.obstacles, 'boundaries': self.boundaries, 'width': self.width,
+                'grid': [[column, row, indices] for (column, row), indices in self.grid.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+
+        '''
+        Creates a template from its compiled data (see to_dict), restoring the tuples and the cells of the grid.
+
+        Parameters:
+
+            data (dict) :   The compiled data, as read from the cache.
+
+        Returns:
+
+            LevelTemplate : The template.
+
+        '''
+
+        return cls(data['name'], data['metadata'], tuple(data['player']), [tuple(enemy) for enemy in data['enemies']],
+                   [tuple(obstacle) for obstacle in data['obstacles']], [tuple(boundary) for boundary in data['boundaries']],
+                   {(column, row): indices for column, row, indices in data['grid']}, data['width'])
+
+def world_background(background, width):
+
+    '''
+    Returns the background of a world of a given width: the background of the game repeated along the world
+    (the background itself if the world is as wide as it). It is only built once per background and width.
+
+    Parameters:
+
+        background (Surface) :  The background of the game.
+        width (int) :           The width of the world.
+
+    Returns:
+
+        Surface : The background of the world.
+
+    '''
+
+    if width == background.get_width():
+        return background
+
+    key = (id(background), width)
+    cached = _backgrounds.get(key)
+
+    if cached is None or cached[0] is not background:
+        tiled = pg.Surface((width, background.get_height()), 0, background)
+        for x in range(0, width, background.get_width()):
+            tiled.blit(background, (x, 0))
+        cached = _backgrounds[key] = (background, tiled)
+
+    return cached[1]
+
+def render_static_layer(background, obstacles):
+
+    '''
+    Renders the parts of a level that never change (background, floor and obstacles) on a single surface as wide
+    as the world, so the part in the view can be drawn with a single blit every frame.
+
+    Parameters:
+
+        background (Surface) :      The background of the game.
+        obstacles (Obstacles) :     The obstacles of the level.
+
+    Returns:
+
+        Surface : The static layer (in the format of the display, if there is one).
+
+    '''
+
+    layer = world_background(background, obstacles.width).copy()
+
+    if pg.display.get_surface() is not None:
+        layer = layer.convert()
+
+    pg.draw.rect(layer, COLORS['LIGHT_GREY'], (FLOOR_POS[0], FLOOR_POS[1], obstacles.width - FLOOR_POS[0], FLOOR_HEIGHT))
+    obstacles.draw_obstacles(layer)
+
+    return layer
+
+def validate_level(data, source):
+
+    '''
+    Checks that the data of a level file is valid. It raises a ValueError describing the first problem found.
+
+    Parameters:
+
+        data (dict) :   The data read from the level file.
+        source (str) :  The name of the level file (used in the error messages).
+
+    Returns: None
+
+    '''
+
+    def error(message):
+        raise ValueError(f'{source}: {message}')
+
+    def check_number(entry, key, where, minimum = None, maximum = None):
+        value = entry.get(key)
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            error(f"{where} needs a number '{key}'")
+
+        if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+            error(f"{where}: '{key}' = {value} is out of range [{minimum}, {maximum}]")
+
+    if not isinstance(data, dict):
+        error('the level must be an object')
+
+    unknown = set(data) - {'name', 'metadata', 'width', 'player', 'enemies', 'obstacles'}
+    if unknown:
+        error(f"unknown keys {sorted(unknown)}")
+
+    if not isinstance(data.get('name', ''), str):
+        error("'name' must be a string")
+
+    if not isinstance(data.get('metadata', {}), dict):
+        error("'metadata' must be an object")
+
+    if 'width' in data:
+        check_number(data, 'width', 'the level', WIDTH)
+
+    width = data.get('width', WIDTH)
+
+    if not isinstance(data.get('player'), dict):
+        error("the level needs a 'player' object")
+
+    check_number(data['player'], 'x', 'player', 0, width)
+    check_number(data['player'], 'y', 'player', 0, HEIGHT)
+
+    if not isinstance(data.get('enemies'), list) or not data['enemies']:
+        error("the level needs a non-empty list of 'enemies'")
+
+    for i, enemy in enumerate(data['enemies']):
+        if not isinstance(enemy, dict):
+            error(f'enemy {i} must be an object')
+        check_number(enemy, 'x', f'enemy {i}', 0, width)
+        check_number(enemy, 'y', f'enemy {i}', 0, HEIGHT)
+        check_number(enemy, 'loading_time', f'enemy {i}', 0)
+
+    if not isinstance(data.get('obstacles', []), list):
+        error("'obstacles' must be a list")
+
+    for i, obstacle in enumerate(data.get('obstacles', [])):
+        if not isinstance(obstacle, dict):
+            error(f'obstacle {i} must be an object')
+        check_number(obstacle, 'x', f'obstacle {i}', 0, width)
+        check_number(obstacle, 'y', f'obstacle {i}', 0, HEIGHT)
+        check_number(obstacle, 'width', f'obstacle {i}', 1, width)
+        check_number(obstacle, 'height', f'obstacle {i}', 1, HEIGHT)
+
+def compile_level(data, source = '<level>'):
+
+    '''
+    Validates the data of a level and compiles it into a LevelTemplate.
+
+    Parameters:
+
+        data (dict) :   The data of the level (as read from a level file).
+        source (str) :  The name of the level file (used in the error messages).
+
+    Returns:
+
+        LevelTemplate : The compiled level.
+
+    '''
+
+    validate_level(data, source)
+
+    width = int(data.get('width', WIDTH))
+    obstacles = Obstacles(width)
+    for obstacle in data.get('obstacles', []):
+        obstacles.add_obstacle(obstacle['x'], obstacle['y'], obstacle['width'], obstacle['height'])
+
+    return LevelTemplate(
+        data.get('name', os.path.splitext(os.path.basename(source))[0]),
+        data.get('metadata', {}),
+        (data['player']['x'], data['player']['y']),
+        [(enemy['x'], enemy['y'], enemy['loading_time']) for enemy in data['enemies']],
+        [tuple(obstacle) for obstacle in obstacles.obstacles],
+        obstacles.boundaries,
+        obstacles.grid,
+        width,
+    )
+
+def load_level(path):
+
+    '''
+    Loads a level file (JSON or TOML). If the file has already been compiled (and has not changed since),
+    the compiled template is read from the cache instead.
+
+    Parameters:
+
+        path (str) :    The path of the level file.
+
+    Returns:
+
+        LevelTemplate : The compiled level.
+
+    '''
+
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    digest = hashlib.sha256(content + str(COMPILER_VERSION).encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(CACHE_DIR, f'{stem}-{digest}.json')
+
+    #A missing, outdated or damaged cached file is only a cache: the level is compiled again
+    try:
+        with open(cache_path) as file:
+            return LevelTemplate.from_dict(json.load(file))
+    except Exception:
+        pass
+
+    if path.endswith('.toml'):
+        import tomllib
+        data = tomllib.loads(content.decode('utf-8'))
+    else:
+        data = json.loads(content)
+
+    template = compile_level(data, path)
+
+    #Storing the compiled level (and removing the outdated versions of the same file)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok = True)
+
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith(stem + '-'):
+                os.remove(os.path.join(CACHE_DIR, name))
+
+        with open(cache_path, 'w') as file:
+            json.dump(template.to_dict(), file, separators = (',', ':'))
+    except OSError:
+        pass
+
+    return template
+
+def level_path(level):
+
+    '''
+    Returns the path of the file of a level (JSON or TOML), or None if the level does not exist.
+
+    Parameters:
+
+        level (int) :   The number of the level.
+
+    Returns:
+
+        str : The path of the level file.
 
     '''
 
-    if level == 1:
-        tank = Tank(100, FLOOR_POS[1] - 54)
+    for extension in ('.json', '.toml'):
+        path = os.path.join(LEVELS_DIR, f'level_{level}{extension}')
+        if os.path.exists(path):
+            return path
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 100000)]   #Not firing
+    return None
 
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
+def count_levels():
 
-    elif level == 2:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+    '''
+    Returns the number of levels of the game (the levels are numbered from 1 without gaps).
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 5000)]
+    Parameters: None
 
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
+    Returns:
 
-    elif level == 3:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+        int : The number of levels.
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 4000),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 5500)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
+    '''
 
-    elif level == 4:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+    level = 0
+    while level_path(level + 1) is not None:
+        level += 1
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 2500),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 3500)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
+    return level
 
-    elif level == 5:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+def get_level_template(level):
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 3000),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 3500), EnemyTank(850, FLOOR_POS[1] - 54, 4000)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
+    '''
+    Returns the compiled template of a level. Every level file is only loaded once.
 
-    elif level == 6:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+    Parameters:
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 3500),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 3000),
-                   EnemyTank(1000, HEIGHT/2 - 104, 2000)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
-        obstacles.add_obstacle(WIDTH / 2 + 250, HEIGHT/2 - 50, WIDTH / 2 - 250, 40)
+        level (int) :   The number of the level.
 
-    elif level == 7:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+    Returns:
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 3500),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 3000),
-                   EnemyTank(1000, HEIGHT/2 - 104, 2000),
-                   EnemyTank(900, HEIGHT/2 - 104, 4500)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
-        obstacles.add_obstacle(WIDTH / 2 + 250, HEIGHT/2 - 50, WIDTH / 2 - 250, 40)
+        LevelTemplate : The compiled level.
+
+    '''
 
-    elif level == 8:
-        tank = Tank(100, FLOOR_POS[1] - 54 )
+    template = _templates.get(level)
 
-        enemies = [EnemyTank(700, FLOOR_POS[1] - 54, 3500),
-                   EnemyTank(1000, FLOOR_POS[1] - 54, 3000),
-                   EnemyTank(1000, HEIGHT/2 - 104, 2000),
-                   EnemyTank(900, HEIGHT/2 - 104, 4500), EnemyTank(550, 96, 100)]
-        
-        obstacles = Obstacles()
-        obstacles.add_obstacle(500, HEIGHT/2 + 50, 40, HEIGHT/2)
-        obstacles.add_obstacle(WIDTH / 2 + 250, HEIGHT/2 - 50, WIDTH / 2 - 250, 40)
-        obstacles.add_obstacle(500, 150, 200, 40)
+    if template is None:
+        path = level_path(level)
+
+        if path is None:
+            raise ValueError(f'There is no file for level {level} in {LEVELS_DIR}')
+
+        template = load_level(path)
+        _templates[level] = template
+
+    return template
+
+def create_new_level(level):
+
+    '''
+
+    A function that creates the objects of the game depending on the current level of the game,
+    from the compiled template of the level.
+
+    Parameters :
+
+        level (int) :      The current level of the game.
+
+    Returns :
+
+        tank (Tank) :      The tank object of the player.
+        enemies (list) :   A list of enemy tank objects that contains the enemies of the new level.
+        obstacles (Obstacles) : An object of the Obstacles class that contains the obstacles of the new level.
+
+    '''
 
-    return tank, enemies, obstacles
\ No newline at end of file
+    return get_level_template(level).instantiate()
@@ -1,8 +1,15 @@
 import pygame as pg
+import numpy as np
 from parameters import get_parameters
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
+#Height (in pixels) of the bands of the summed-area table (the rects checked at once cannot be higher)
+BAND_HEIGHT = 32
+
+#Radius (in pixels) of the craters carved by the shells
+CRATER_RADIUS = 9
+
 class Obstacles:
 
     '''
@@ -12,15 +19,38 @@ class Obstacles:
     We define two types of obstacles : the ones that act as a WALL (tanks and bullets cannot pass through)
     and the ones that behave as a FLOOR, in which a tank can move above.
 
+    The obstacles are destructible: the shells carve craters in them. The pixels that are left form the terrain, a bitmap
+    of the world above the floor (the floor cannot be destroyed). The rects of the obstacles are the level as it was
+    created: they are used to find quickly the obstacles near a point or rect, and the collisions are then confirmed
+    in the terrain. A crater only updates the pixels it removes: in the terrain, in the summed-area table and in the
+    surface the obstacles are drawn on.
+
     Attributes:
 
+        - width (int):     the width of the world (it can be wider than the window, see camera)
         - obstacles (list): a list of pygame.Rect representing the obstacles in the game
         - boundary (list): a list of tuples containing the x-coordinates of the left and right borders of each obstacle, seen by the enemy tank*
+        - grid (dict):     a uniform grid that maps each (column, row) cell to the indices of the obstacles that overlap it.
+                           It is used to check collisions only against the obstacles near a point or rect
+        - terrain (ndarray):    the pixels covered by obstacles, by row and column (built when needed)
+        - area_table (ndarray): the summed-area table of the terrain, in bands of BAND_HEIGHT rows (built with the terrain,
+                                to check many rects at once)
+        - version (int):        the number of changes of the terrain (to know if something computed with it is outdated)
+        - layer (Surface):      the surface the obstacles are drawn on, updated when a crater is carved (None if there is none)
+        - background (Surface): the background shown where the terrain is carved
+        - craters (list):       the centres (x, y) of the craters carved, in order (to carve them again elsewhere, see network)
 
     Methods:
 
-        - add_obstacle:     Adds a new obstacle to the collection of obstacles
-        - draw_obstacles:   Draws all the obstacles in the collection on a given window surface
+        - add_obstacle:       Adds a new obstacle to the collection of obstacles
+        - collidepoint:       Checks if a point is inside any obstacle
+        - colliderect:        Checks if a rect collides with any obstacle
+        - covers:             Checks if any pixel of the terrain is inside a rect
+        - build_terrain:      Builds the terrain and its summed-area table from the obstacles
+        - remove_from_table:  Updates the summed-area table after removing some pixels of the terrain
+        - collide_rects:      Checks which of many rects (with the same size) collide with any obstacle
+        - carve:              Carves a crater in the terrain
+        - draw_obstacles:     Draws all the obstacles in the collection on a given window surface
 
     *Depending on the relative position of the tank and the obstacle, the boundary can coincide with the left or right border of the obstacle.
     For example, if the tank is above the obstacle (it is a surface), the left border of the obstacle will coincide with the left boundary.
@@ -28,9 +58,23 @@ class Obstacles:
 
     '''
 
-    def __init__(self):
+    #Size (in pixels) of the cells of the grid
+    CELL_SIZE = 100
+
+    #Up to this number of obstacles, checking all of them is faster than looking up the grid
+    GRID_THRESHOLD = 16
+
+    def __init__(self, width = WIDTH):
+        self.width = width
         self.obstacles = []
         self.boundaries = []
+        self.grid = {}
+        self.terrain = None
+        self.area_table = None
+        self.version = 0
+        self.layer = None
+        self.background = None
+        self.craters = []
 
     def add_obstacle(self, x, y, width, height):
 
@@ -59,6 +103,249 @@ class Obstacles:
         else:
             self.boundaries.append((obstacle.right, obstacle.left))
 
+        self.terrain = self.area_table = None
+        self.version += 1
+
+        #Registering the obstacle in every cell of the grid it overlaps
+        index = len(self.obstacles) - 1
+        for column in range(obstacle.left // self.CELL_SIZE, (obstacle.right - 1) // self.CELL_SIZE + 1):
+            for row in range(obstacle.top // self.CELL_SIZE, (obstacle.bottom - 1) // self.CELL_SIZE + 1):
+                self.grid.setdefault((column, row), []).append(index)
+
+    def collidepoint(self, x, y):
+
+        '''
+        Checks if a point is inside any obstacle. If there are many obstacles, only the ones of the grid cell of the point are checked.
+        The point must also be in the terrain (it may have been carved).
+
+        Parameters:
+
+            - x (float): the x-coordinate of the point
+            - y (float): the y-coordinate of the point
+
+        Returns:
+
+            - True if the point is inside an obstacle, False otherwise.
+        '''
+
+        #Coordinates truncated as pygame does
+        x, y = int(x), int(y)
+
+        if len(self.obstacles) <= self.GRID_THRESHOLD:
+            for obstacle in self.obstacles:
+                if obstacle.collidepoint(x, y):
+                    return self.covers(x, y, x + 1, y + 1)
+            return False
+
+        cell = self.grid.get((x // self.CELL_SIZE, y // self.CELL_SIZE))
+
+        if cell is None:
+            return False
+
+        obstacles = self.obstacles
+        for index in cell:
+            if obstacles[index].collidepoint(x, y):
+                return self.covers(x, y, x + 1, y + 1)
+
+        return False
+
+    def colliderect(self, rect):
+
+        '''
+        Checks if a rect collides with any obstacle. If there are many obstacles, only the ones of the grid cells overlapped by the rect are checked.
+        The collision is then confirmed in the terrain (the rect may only overlap craters).
+
+        Parameters:
+
+            - rect (pygame.Rect): the rect to check
+
+        Returns:
+
+            - True if the rect collides with an obstacle, False otherwise.
+        '''
+
+        if len(self.obstacles) <= self.GRID_THRESHOLD:
+            if rect.collidelist(self.obstacles) == -1:
+                return False
+            return self.covers(rect.left, rect.top, rect.right, rect.bottom)
+
+        grid, obstacles = self.grid, self.obstacles
+
+        for column in range(rect.left // self.CELL_SIZE, (rect.right - 1) // self.CELL_SIZE + 1):
+            for row in range(rect.top // self.CELL_SIZE, (rect.bottom - 1) // self.CELL_SIZE + 1):
+                for index in grid.get((column, row), ()):
+                    if rect.colliderect(obstacles[index]):
+                        return self.covers(rect.left, rect.top, rect.right, rect.bottom)
+
+        return False
+
+    def covers(self, left, top, right, bottom):
+
+        '''
+        Checks if any pixel of the terrain is inside a rect, given by its borders (the parts outside the terrain are not checked).
+
+        Parameters:
+
+            - left, top, right, bottom (int): the borders of the rect
+
+        Returns:
+
+            - True if a pixel of the terrain is inside the rect, False otherwise.
+        '''
+
+        if self.terrain is None:
+            self.build_terrain()
+
+        return bool(self.terrain[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)].any())
+
+    def build_terrain(self):
+
+        '''
+        Builds the terrain from the rects of the obstacles (the pixels above the floor covered by any of them)
+        and its summed-area table. It is called when the level is created (or when the terrain is first needed).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        self.terrain = np.zeros((FLOOR_POS[1], self.width), dtype = bool)
+
+        for obstacle in self.obstacles:
+            self.terrain[max(obstacle.top, 0):max(obstacle.bottom, 0), max(obstacle.left, 0):max(obstacle.right, 0)] = True
+
+        #Summed-area table of every band of BAND_HEIGHT rows: the cell (band, y, x) holds the number of covered pixels of the band
+        #above and on the left of (x, y). The number of covered pixels of a rect (not higher than a band) is then found with
+        #6 lookups in the (up to) 2 bands it overlaps, and a change of the terrain only updates the bands of its rows
+        bands = -(-FLOOR_POS[1] // BAND_HEIGHT)
+        rows = np.zeros((bands*BAND_HEIGHT, self.width), dtype = bool)
+        rows[:FLOOR_POS[1]] = self.terrain
+        rows = rows.reshape(bands, BAND_HEIGHT, self.width)
+
+        self.area_table = np.zeros((bands, BAND_HEIGHT + 1, self.width + 1), dtype = np.int32)
+        self.area_table[:, 1:, 1:] = rows.cumsum(axis = 1, dtype = np.int32).cumsum(axis = 2, dtype = np.int32)
+
+    def remove_from_table(self, removed, left, top):
+
+        '''
+        Updates the summed-area table after removing some pixels of the terrain: the table of the removed pixels (a small
+        region) is subtracted from the cells of the bands below and on the right of them, so nothing is accumulated again.
+
+        Parameters:
+
+            - removed (ndarray):    the removed pixels of a region of the terrain, by row and column
+            - left (int):           the x-coordinate of the left border of the region
+            - top (int):            the y-coordinate of the top border of the region
+
+        Returns: None
+        '''
+
+        for band in range(top // BAND_HEIGHT, (top + len(removed) - 1) // BAND_HEIGHT + 1):
+
+            #The removed pixels in the band, from the row first (relative to the band)
+            start = band*BAND_HEIGHT
+            first = max(top - start, 0)
+            part = removed[max(start - top, 0):start + BAND_HEIGHT - top]
+            height, width = part.shape
+
+            counts = np.zeros((height + 1, width + 1), dtype = np.int32)
+            counts[1:, 1:] = part.cumsum(axis = 0, dtype = np.int32).cumsum(axis = 1, dtype = np.int32)
+
+            #Cells inside the region, on its right, below it and below on its right
+            table = self.area_table[band]
+            bottom, right = first + height, left + width
+            table[first + 1:bottom + 1, left + 1:right + 1] -= counts[1:, 1:]
+            table[first + 1:bottom + 1, right + 1:] -= counts[1:, width:]
+            table[bottom + 1:, left + 1:right + 1] -= counts[height:, 1:]
+            table[bottom + 1:, right + 1:] -= counts[height, width]
+
+    def collide_rects(self, xs, ys, width, height):
+
+        '''
+        Checks which of many rects with the same size (e.g. the positions of bullets along their paths) collide with
+        any obstacle, at once with NumPy. It counts the covered pixels of every rect in the summed-area table of the terrain,
+        so the cost does not depend on the number of obstacles (the parts of the rects outside the terrain are not checked).
+
+        Parameters:
+
+            - xs (ndarray):     the x-coordinates of the top-left corners of the rects (truncated as pygame does)
+            - ys (ndarray):     the y-coordinates of the top-left corners of the rects
+            - width (int):      the width of the rects
+            - height (int):     the height of the rects (up to BAND_HEIGHT)
+
+        Returns:
+
+            - ndarray: for every rect, True if it collides with an obstacle, False otherwise.
+        '''
+
+        if not self.obstacles or len(xs) == 0:
+            return np.zeros(len(xs), dtype = bool)
+
+        if self.terrain is None:
+            self.build_terrain()
+
+        lefts, tops = np.trunc(xs).astype(int), np.trunc(ys).astype(int)
+        left, right = np.clip(lefts, 0, self.width), np.clip(lefts + width, 0, self.width)
+        top, bottom = np.clip(tops, 0, FLOOR_POS[1]), np.clip(tops + height, 0, FLOOR_POS[1])
+        table = self.area_table
+
+        #Rows of the rects in the band of their top
+        band = np.minimum(top // BAND_HEIGHT, len(table) - 1)
+        start = band*BAND_HEIGHT
+        first, last = top - start, np.minimum(bottom - start, BAND_HEIGHT)
+        covered = table[band, last, right] - table[band, first, right] - table[band, last, left] + table[band, first, left]
+
+        #Rows of the rects in the next band (the first row of a band is 0)
+        next_band = np.minimum(band + 1, len(table) - 1)
+        last = np.clip(bottom - start - BAND_HEIGHT, 0, BAND_HEIGHT)
+        covered += table[next_band, last, right] - table[next_band, last, left]
+
+        return covered > 0
+
+    def carve(self, x, y, radius = CRATER_RADIUS):
+
+        '''
+        Carves a crater (a disc) in the terrain, where a shell has hit it. Only the pixels of the crater are updated:
+        in the terrain, in the bands of the summed-area table it overlaps and, if there is one, in the surface the
+        obstacles are drawn on (where the background is shown again).
+
+        Parameters:
+
+            - x (float):        the x-coordinate of the centre of the crater
+            - y (float):        the y-coordinate of the centre of the crater
+            - radius (int):     the radius of the crater
+
+        Returns: None
+        '''
+
+        if self.terrain is None:
+            self.build_terrain()
+
+        x, y = int(x), int(y)
+        left, right = max(x - radius, 0), min(x + radius + 1, self.width)
+        top, bottom = max(y - radius, 0), min(y + radius + 1, FLOOR_POS[1])
+
+        if left >= right or top >= bottom:
+            return
+
+        rows, columns = np.ogrid[top:bottom, left:right]
+        region = self.terrain[top:bottom, left:right]
+        removed = region & ((columns - x)**2 + (rows - y)**2 <= radius**2)
+
+        if not removed.any():
+            return
+
+        region[removed] = False
+        self.remove_from_table(removed, left, top)
+        self.version += 1
+        self.craters.append((x, y))
+
+        #Showing the background where the terrain has been removed (the arrays of the surfaces are indexed by column and row)
+        if self.layer is not None:
+            removed = removed.T
+            layer = pg.surfarray.pixels3d(self.layer)[left:right, top:bottom]
+            layer[removed] = pg.surfarray.pixels3d(self.background)[left:right, top:bottom][removed]
+
     def draw_obstacles(self, WINDOW, color = 'LIGHT_GREY'):
 
         '''
@@ -18,6 +18,9 @@ class PowerBar:
         - height (int):    the height of the power bar
         - max_power (int): the maximum power value that can be set for the power bar
         - min_power (int): the minimum power value that can be set for the power bar
+        - background_rect (pygame.Rect): the rect of the background of the power bar
+        - power_rect (pygame.Rect):      the rect of the power level, updated in place every frame
+        - color_range (tuple):           the colors of the power level (red for low values, green for high values)
 
     Methods:
 
@@ -34,6 +37,9 @@ class PowerBar:
         self.height = height
         self.max_power = max_power
         self.min_power = min_power
+        self.background_rect = pg.Rect((self.x, self.y), (self.width, self.height))
+        self.power_rect = pg.Rect((self.x + 2, self.y + self.height), (self.width - 2, 0))
+        self.color_range = (COLORS['RED'], COLORS['GREEN'])
 
     def draw_lines(self, WINDOW, rect, color):
 
@@ -69,9 +75,8 @@ class PowerBar:
         Returns: None
         '''
 
-        background_rect = pg.Rect((self.x, self.y), (self.width, self.height))
-        pg.draw.rect(WINDOW, COLORS[color], background_rect)
-        self.draw_lines(WINDOW, background_rect, 'BLACK')
+        pg.draw.rect(WINDOW, COLORS[color], self.background_rect)
+        self.draw_lines(WINDOW, self.background_rect, 'BLACK')
     
     def draw_power_bar(self, WINDOW, firing_power):
 
@@ -90,11 +95,11 @@ class PowerBar:
 
         self.draw_background_rect(WINDOW, 'DARK_GREY')
 
-        color_range = [COLORS['RED'], COLORS['GREEN']]
+        color_range = self.color_range
         color_index = min(int(firing_power * len(color_range) / 100), len(color_range) - 1)
         power_bar_color = color_range[color_index]
 
         power_height = (firing_power/(self.max_power - self.min_power))*self.height
-        power_rect = pg.Rect((self.x + 2, self.y + self.height - power_height), (self.width - 2, power_height))
+        self.power_rect.update(self.x + 2, self.y + self.height - power_height, self.width - 2, power_height)
 
-        pg.draw.rect(WINDOW, power_bar_color, power_rect)
\ No newline at end of file
+        pg.draw.rect(WINDOW, power_bar_color, self.power_rect)
\ No newline at end of file
@@ -0,0 +1,204 @@
+import json
+import pygame as pg
+from config import Config
+from network import InputKeys, encode_input
+
+'''
+Recording and replay of a session of the game. A recording holds what is needed to play the session again exactly:
+the level it started at, the seed of the random motion of the enemies, the configuration of the game, and the
+inputs of every frame of the game loop (its time step, the keys pressed and the events). Played back through the
+game loop (see Replayer), it goes through the same frames, so a session can be run again, e.g. headlessly, under
+a profiler or with other display settings, and give the same game.
+
+The recordings are JSON files:
+
+    {
+        "version": 1,
+        "level": 1,
+        "seed": 1234,
+        "config": {...},                                        (see config)
+        "frames": [[16.0, 0], [17.0, 16, [["keydown", {"key": 32}]]], ...]
+    }
+
+where every frame is its time step (in ms), the keys pressed (see network.encode_input) and, if there are any,
+its events.
+
+'''
+
+RECORDING_VERSION = 1
+
+#The events kept in the recordings, with the attributes the states use
+RECORDED_EVENTS = {
+    pg.QUIT: ('quit', ()),
+    pg.KEYDOWN: ('keydown', ('key',)),
+    pg.KEYUP: ('keyup', ('key',)),
+    pg.MOUSEMOTION: ('mousemotion', ('pos',)),
+    pg.MOUSEBUTTONDOWN: ('mousebuttondown', ('pos', 'button')),
+    pg.MOUSEBUTTONUP: ('mousebuttonup', ('pos', 'button')),
+}
+
+EVENT_TYPES = {name: event_type for event_type, (name, attributes) in RECORDED_EVENTS.items()}
+
+#The fields of the configuration that do not change the game (only how it is shown and measured): a replay takes them
+#from the command line instead of the recording
+DISPLAY_FIELDS = ('fps', 'render_scale', 'track_allocs', 'profile', 'profile_csv', 'startup_report', 'capture', 'capture_policy',
+                  'capture_queue')
+
+class Recorder:
+
+    '''
+    Records the inputs of the frames of the game loop (see GameLoop).
+
+    Attributes:
+
+        - level (int):      the level the session started at
+        - seed (int):       the seed of the random motion of the enemies
+        - config (Config):  the configuration of the game
+        - frames (list):    the recorded frames
+
+    Methods:
+
+        - record:   records the inputs of a frame
+        - save:     writes the recording to a file
+
+    '''
+
+    def __init__(self, level, seed, config):
+        self.level = level
+        self.seed = seed
+        self.config = config
+        self.frames = []
+
+    def record(self, dt, keys_pressed, events):
+
+        '''
+        Records the inputs of a frame (the events the game does not use are left out).
+
+        Parameters:
+
+            - dt (float):           the time step of the frame (in ms)
+            - keys_pressed (list):  the keys pressed (as returned by pygame.key.get_pressed())
+            - events (list):        the events of the frame
+
+        Returns: None
+        '''
+
+        frame = [dt, encode_input(keys_pressed)]
+        recorded = []
+
+        for event in events:
+            name, attributes = RECORDED_EVENTS.get(event.type, (None, ()))
+            if name is not None:
+                recorded.append([name, {attribute: getattr(event, attribute) for attribute in attributes}])
+
+        if recorded:
+            frame.append(recorded)
+
+        self.frames.append(frame)
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump({'version': RECORDING_VERSION, 'level': self.level, 'seed': self.seed, 'config': self.config.as_dict(),
+                       'frames': self.frames}, file, separators = (',', ':'))
+
+class Replayer:
+
+    '''
+    Plays a recording as the controller of the game loop (like the scripted player, see scripted_player): every frame it
+    gives the recorded time step, keys and events. After the last frame it quits the game.
+
+    Attributes:
+
+        - level (int):      the level the session started at
+        - seed (int):       the seed of the random motion of the enemies
+        - config (dict):    the recorded configuration of the game (see configuration)
+        - frames (list):    the recorded frames
+        - frame (int):      the next frame to play
+        - dt (float):       the time step of the current frame (used by the game loop)
+
+    Methods:
+
+        - load:             reads a recording from a file (class method)
+        - configuration:    returns the configuration to replay with
+        - update:           returns the keys pressed and the events of the current frame
+        - finished:         whether all the frames have been played
+
+    '''
+
+    def __init__(self, level, seed, config, frames):
+        self.level = level
+        self.seed = seed
+        self.config = config
+        self.frames = frames
+        self.frame = 0
+        self.dt = None
+
+    @classmethod
+    def load(cls, path):
+
+        '''
+        Reads a recording (see Recorder.save).
+
+        Parameters:
+
+            - path (str): the file of the recording
+
+        Returns:
+
+            - Replayer: the replayer of the recording
+        '''
+
+        with open(path) as file:
+            data = json.load(file)
+
+        if not isinstance(data, dict) or data.get('version') != RECORDING_VERSION:
+            raise ValueError(f'{path}: not a recording of this version of the game')
+
+        return cls(data['level'], data['seed'], data['config'], data['frames'])
+
+    def configuration(self, config):
+
+        '''
+        Returns the configuration to replay the recording with: the recorded one, with the display fields
+        (see DISPLAY_FIELDS) of a given configuration (e.g. the one of the command line).
+
+        Parameters:
+
+            - config (Config): the configuration the display fields are taken from
+
+        Returns:
+
+            - Config: the configuration
+        '''
+
+        return Config(**{**self.config, **{name: getattr(config, name) for name in DISPLAY_FIELDS}})
+
+    def finished(self):
+        return self.frame >= len(self.frames)
+
+    def update(self, game):
+
+        '''
+        Returns the inputs of the current frame (and sets its time step), or a QUIT event once all the frames have been played.
+
+        Parameters:
+
+            - game (Game): the game being played
+
+        Returns:
+
+            - keys (InputKeys):     the keys pressed in this frame (used as pygame.key.get_pressed())
+            - events (list):        the events of this frame (used as pygame.event.get())
+        '''
+
+        if self.finished():
+            self.dt = 0
+            return InputKeys(0), [pg.event.Event(pg.QUIT)]
+
+        frame = self.frames[self.frame]
+        self.frame += 1
+        self.dt = frame[0]
+
+        events = [pg.event.Event(EVENT_TYPES[name], **attributes) for name, attributes in (frame[2] if len(frame) > 2 else ())]
+
+        return InputKeys(frame[1]), events
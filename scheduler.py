@@ -0,0 +1,108 @@
+import heapq
+
+'''
+Scheduler of the timed events of the game (reloads of the enemies, end of the hit flashes, steps of the countdowns).
+It runs on simulation time: the time only advances when a state advances it (e.g. not while the game is paused).
+The timers are kept in a heap ordered by due time, so a frame only does work for the timers that fire in it,
+whatever the number of entities waiting.
+
+'''
+
+class Timer:
+
+    '''
+    A timed callback registered in the scheduler.
+
+    Attributes:
+
+        - time (float):         the simulation time at which the callback is called (in ms)
+        - callback (function):  the function called
+        - args (tuple):         the arguments of the callback
+        - cancelled (bool):     whether the timer has been cancelled
+
+    '''
+
+    __slots__ = ('time', 'callback', 'args', 'cancelled')
+
+    def __init__(self, time, callback, args):
+        self.time = time
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class Scheduler:
+
+    '''
+    Calls registered callbacks when the simulation time reaches their due time.
+
+    Attributes:
+
+        - now (float):      the current simulation time (in ms)
+        - heap (list):      the pending timers, as (time, order, timer), in a heap
+        - order (int):      the number of timers scheduled (it keeps the timers due at the same time in order)
+
+    Methods:
+
+        - schedule:     registers a callback to be called after a delay
+        - advance:      advances the simulation time and calls the callbacks due
+        - clear:        removes all the pending timers
+
+    '''
+
+    def __init__(self):
+        self.now = 0.0
+        self.heap = []
+        self.order = 0
+
+    def schedule(self, delay, callback, *args):
+
+        '''
+        Registers a callback to be called after a delay (in simulation time).
+
+        Parameters:
+
+            - delay (float):        the delay (in ms)
+            - callback (function):  the function to call
+            - args:                 the arguments of the callback
+
+        Returns:
+
+            - Timer: the timer, which can be cancelled
+        '''
+
+        timer = Timer(self.now + delay, callback, args)
+        heapq.heappush(self.heap, (timer.time, self.order, timer))
+        self.order += 1
+
+        return timer
+
+    def advance(self, dt):
+
+        '''
+        Advances the simulation time and calls, in order, the callbacks that are due. While a callback runs,
+        the simulation time is its due time, so the timers it schedules are not delayed by the frame time.
+
+        Parameters:
+
+            - dt (float): the time elapsed (in ms)
+
+        Returns: None
+        '''
+
+        end = self.now + dt
+        heap = self.heap
+
+        while heap and heap[0][0] <= end:
+            time, _, timer = heapq.heappop(heap)
+
+            if not timer.cancelled:
+                self.now = time
+                timer.callback(*timer.args)
+
+        self.now = end
+
+    def clear(self):
+        self.heap.clear()
@@ -0,0 +1,210 @@
+import math
+import pygame as pg
+from bullet import Bullet
+from states import PlayingState
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+A scripted player used to play the game without a human (e.g. in the benchmarks). It plays through the same
+inputs as a human: it presses UP/DOWN to aim, holds SPACE to charge the shot and releases it to fire,
+and LEFT/RIGHT to dodge the shells of the enemies.
+
+'''
+
+class ScriptedKeys:
+
+    '''
+    Replacement of pygame.key.get_pressed() for scripted inputs. It can be indexed with the pygame key constants.
+
+    Attributes:
+
+        - pressed (set): the keys that are currently pressed
+
+    '''
+
+    def __init__(self):
+        self.pressed = set()
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class ScriptedPlayer:
+
+    '''
+    Plays the game by aiming at the nearest enemy. When it is not firing, it chooses the firing angle and power
+    (simulating the candidate shots with the same physics as Bullet), turns the gun towards the angle and
+    charges the shot until the power is reached. Then it releases SPACE to fire.
+
+    The enemies aim where the tank will be if it keeps its velocity, so while an enemy shell is flying (and no shot is
+    being charged) it drives away, in a direction chosen when the first shell is seen.
+
+    Attributes:
+
+        - keys (ScriptedKeys):  the keys pressed in the current tick
+        - target (tuple):       the (angle, power) of the next shot, None if there is no shot planned
+        - charging (bool):      whether SPACE is being held down to charge the shot
+        - dodge_key (int):      the key (LEFT or RIGHT) used to dodge the enemy shells in flight
+        - dt (float):           the time step of the frame (None: the game loop chooses it)
+
+    Methods:
+
+        - update:       returns the keys pressed and the events of the current tick
+        - plan_shot:    chooses the angle and power of the next shot
+        - shot_hits:    checks if a shot with a given angle and power hits a given enemy
+
+    '''
+
+    def __init__(self):
+        self.keys = ScriptedKeys()
+        self.target = None
+        self.charging = False
+        self.dodge_key = None
+        self.dt = None
+
+    def update(self, game):
+
+        '''
+        Decides the inputs of the current tick.
+
+        Parameters:
+
+            - game (Game): the game being played
+
+        Returns:
+
+            - keys (ScriptedKeys):  the keys pressed in this tick (used as pygame.key.get_pressed())
+            - events (list):        the key events of this tick (used as pygame.event.get())
+        '''
+
+        tank = game.tank
+        events = []
+        self.keys.pressed.clear()
+
+        #Nothing to play outside the levels (countdowns, menus)
+        if not isinstance(game.state, PlayingState):
+            self.target = None
+            self.charging = False
+            self.dodge_key = None
+            return self.keys, events
+
+        #Dodging the enemy shells (the planned shot is no longer valid once the tank moves)
+        if not self.charging and any(enemy.firing for enemy in game.enemies):
+
+            if self.dodge_key is None:
+                self.dodge_key = pg.K_RIGHT if tank.x + tank.size/2 < 250 else pg.K_LEFT
+
+            self.keys.pressed.add(self.dodge_key)
+            self.target = None
+            return self.keys, events
+
+        self.dodge_key = None
+
+        if tank.firing or not game.enemies:
+            self.target = None
+            self.charging = False
+            return self.keys, events
+
+        if self.target is None:
+            self.target = self.plan_shot(game)
+
+        angle, power = self.target
+
+        #Aiming
+        if tank.firing_angle < angle:
+            self.keys.pressed.add(pg.K_UP)
+        elif tank.firing_angle > angle:
+            self.keys.pressed.add(pg.K_DOWN)
+
+        #Charging once aimed, and firing when the power has been reached
+        elif not self.charging:
+            self.charging = True
+            self.keys.pressed.add(pg.K_SPACE)
+            events.append(pg.event.Event(pg.KEYDOWN, key = pg.K_SPACE))
+
+        elif tank.firing_power + 2 <= power:
+            self.keys.pressed.add(pg.K_SPACE)
+
+        else:
+            events.append(pg.event.Event(pg.KEYUP, key = pg.K_SPACE))
+            self.charging = False
+            self.target = None
+
+        return self.keys, events
+
+    def plan_shot(self, game):
+
+        '''
+        Chooses the angle and power of a shot that hits the nearest enemy (the closest one that can be hit).
+        For every power, the angles come from the analytic solution of the parabolic trajectory,
+        and each candidate is checked by simulating the bullet.
+
+        Parameters:
+
+            - game (Game): the game being played
+
+        Returns:
+
+            - tuple: the (angle, power) of the shot. If no shot hits, a default lob at the first enemy.
+        '''
+
+        tank = game.tank
+        x0, y0 = tank.firing_x0, tank.firing_y0
+
+        for enemy in sorted(game.enemies, key = lambda enemy: abs(enemy.x - tank.x)):
+
+            dx = enemy.x + enemy.size/2 - x0
+            dy = y0 - (enemy.y + enemy.size/2)
+
+            for power in range(0, 101, 2):
+
+                v = 20 + 15*power/100
+                discriminant = v**4 - gravity*(gravity*dx**2 + 2*dy*v**2)
+
+                if discriminant < 0 or dx <= 0:
+                    continue
+
+                for sign in (-1, 1):
+                    angle = round(math.degrees(math.atan((v**2 + sign*math.sqrt(discriminant))/(gravity*dx))))
+
+                    for candidate in (angle, angle - 1, angle + 1):
+                        if 0 < candidate < 90 and self.shot_hits(tank, enemy, game.obstacles, candidate, power):
+                            return candidate, power
+
+        return 45, 50
+
+    def shot_hits(self, tank, enemy, obstacles, angle, power):
+
+        '''
+        Checks if a shot with a given angle and power would hit a given enemy (before any obstacle),
+        by simulating it with the same physics as the bullets of the game.
+
+        Parameters:
+
+            - tank (Tank):              the player tank
+            - enemy (EnemyTank):        the enemy to hit
+            - obstacles (Obstacles):    the obstacles of the level
+            - angle (int):              the firing angle
+            - power (int):              the firing power
+
+        Returns:
+
+            - bool: True if the shot hits the enemy, False otherwise.
+        '''
+
+        bullet = Bullet(tank.firing_x0, tank.firing_y0, 20 + 15*power/100, angle)
+        target = enemy.rect.copy()
+        target.topleft = (enemy.x, enemy.y)
+
+        while 0 <= bullet.y <= FLOOR_POS[1] and bullet.x <= obstacles.width:
+
+            bullet.update()
+
+            if bullet.rect.colliderect(target):
+                return True
+
+            if obstacles.colliderect(bullet.rect):
+                return False
+
+        return False
@@ -0,0 +1,414 @@
+import pygame as pg
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+States of the game. The game is always in one state (game.state), and the game loop (see game_loop) calls,
+every frame, the hooks of the current state: handle_event for every event, update and render. A state moves
+the game to another state with game.change_state.
+
+    - PlayingState:         the player is playing a level.
+    - PausedState:          the game is paused (P or ESCAPE while playing), the level is frozen.
+    - LevelTransitionState: the countdown between two levels. The next level is prepared in a background thread
+                            while the countdown is shown.
+    - RetryState:           the countdown before playing a failed level again (it costs a life).
+    - GameOverState:        the menu shown when the player has lost all the lives, to play again or quit.
+    - VictoryState:         the menu shown when the player has passed all the levels, to play again or quit.
+
+        Playing --(level cleared)--> LevelTransition --> Playing
+        Playing --(tank destroyed)--> Retry --> Playing
+        Playing --(last life lost)--> GameOver --(play again)--> Playing
+        Playing --(last level cleared)--> Victory --(play again)--> Playing
+        Playing <--(P / ESCAPE)--> Paused
+
+A state that has nothing to update or draw until the next input is idle (see GameState.is_idle): the game loop
+then sleeps until the next event instead of redrawing the same frame.
+
+'''
+
+#Keys that pause and resume the game
+PAUSE_KEYS = (pg.K_p, pg.K_ESCAPE)
+
+class GameState:
+
+    '''
+    Base class of the states of the game. The hooks do nothing by default.
+
+    Attributes:
+
+        - game (Game): the game
+
+    Methods:
+
+        - enter:            called when the game enters the state
+        - handle_event:     handles an event
+        - update:           updates the state (called once per frame)
+        - render:           draws the state on the window (called once per frame, the window is updated by the game loop)
+        - is_idle:          whether the state is waiting for input (then it is neither updated nor drawn)
+
+    '''
+
+    def __init__(self, game):
+        self.game = game
+
+    def enter(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, keys_pressed, dt):
+        pass
+
+    def render(self, WINDOW):
+        pass
+
+    def is_idle(self):
+        return False
+
+class PlayingState(GameState):
+
+    '''
+    The player is playing a level: the tank and the enemies are handled every frame, and the state checks
+    if the level has been cleared or if the tank is dead.
+    '''
+
+    def handle_event(self, event):
+
+        if event.type == pg.KEYDOWN and event.key in PAUSE_KEYS:
+            self.game.change_state(PausedState(self.game, self))
+        else:
+            self.game.handle_event(event)
+
+    def update(self, keys_pressed, dt):
+
+        '''
+        Handles the tank and the enemies, advances the simulation time and checks the end of the level.
+
+        Parameters:
+
+            keys_pressed (list) :   The keys pressed (as returned by pygame.key.get_pressed()).
+            dt (float) :            The time elapsed since the last frame (in ms).
+
+        Returns: None
+        '''
+
+        game = self.game
+        profiler = game.profiler
+
+        game.handle_tank(keys_pressed)
+        profiler.lap('handle_tank')
+        game.handle_enemy()
+        profiler.lap('handle_enemy')
+
+        #Timed events (reloads of the enemies, end of the hit flashes)
+        game.scheduler.advance(dt)
+
+        #Clearing the level wins over dying in the same frame
+        if not game.check_level_passed():
+            game.check_tank_is_dead()
+
+        profiler.lap('game_flow')
+
+    def render(self, WINDOW):
+        self.game.draw_window(WINDOW)
+        self.game.profiler.lap('draw_window')
+
+class PausedState(GameState):
+
+    '''
+    The game is paused: the level is frozen (nothing is updated) until P or ESCAPE is pressed again.
+    It is drawn once and is idle the rest of the time.
+
+    Attributes:
+
+        - resume_state (GameState):     the state the game goes back to
+        - texts (tuple):                the rendered texts of the window
+        - dirty (bool):                 whether the window has to be drawn again
+
+    '''
+
+    def __init__(self, game, resume_state):
+        super().__init__(game)
+        self.resume_state = resume_state
+        self.texts = None
+        self.dirty = True
+
+    def enter(self):
+        self.texts = (self.game.font(60).render('Paused', 1, COLORS['BLACK']),
+                      self.game.font(30).render('Press P to resume', 1, COLORS['BLACK']))
+
+    def handle_event(self, event):
+
+        if event.type == pg.KEYDOWN and event.key in PAUSE_KEYS:
+            self.game.change_state(self.resume_state)
+
+        elif event.type in (pg.WINDOWEXPOSED, pg.WINDOWRESTORED, pg.VIDEOEXPOSE):
+            self.dirty = True
+
+    def is_idle(self):
+        return not self.dirty
+
+    def render(self, WINDOW):
+
+        if not self.dirty:
+            return
+
+        self.dirty = False
+        self.game.draw_window(WINDOW)
+
+        pg.draw.rect(WINDOW, COLORS['LIGHT_BLUE'], (WIDTH/2 - 200, HEIGHT/2 - 100, 400, 200))
+        pg.draw.rect(WINDOW, COLORS['BLACK'], (WIDTH/2 - 200, HEIGHT/2 - 100, 400, 200), 5)
+
+        text1, text2 = self.texts
+        WINDOW.blit(text1, (WIDTH/2 - text1.get_width()/2, HEIGHT/2 - 40 - text1.get_height()/2))
+        WINDOW.blit(text2, (WIDTH/2 - text2.get_width()/2, HEIGHT/2 + 40 - text2.get_height()/2))
+
+        self.game.profiler.lap('draw_window')
+
+class LevelTransitionState(GameState):
+
+    '''
+    The countdown shown when the player passes a level (or fails it, see RetryState). The events are still processed every frame
+    (so the window keeps responding), and the next level is prepared in a background thread during the countdown,
+    so it is ready to be played when the countdown ends.
+
+    Attributes:
+
+        - passed (bool):        whether the player has passed the level (False if the player has failed it)
+        - level (int):          the level that has been passed or failed
+        - next_level (int):     the level played after the countdown
+        - counter (int):        the number shown by the countdown (decreased every second by the scheduler)
+        - preload (Future):     the preparation of the next level
+        - texts (tuple):        the rendered texts of the window
+        - counter_text (Surface): the rendered counter
+
+    '''
+
+    DURATION = 3000
+
+    def __init__(self, game, passed = True):
+        super().__init__(game)
+        self.passed = passed
+        self.level = game.current_level
+        self.next_level = self.level + 1 if passed else self.level
+        self.counter = self.DURATION // 1000
+        self.preload = None
+        self.texts = None
+        self.counter_text = None
+
+    def enter(self):
+
+        #Preparing the next level in the background
+        self.preload = self.game.preload_level(self.next_level)
+
+        #Steps of the countdown
+        for step in range(1, self.counter):
+            self.game.scheduler.schedule(step * 1000, self.count_down)
+        self.game.scheduler.schedule(self.DURATION, self.start_next_level)
+
+        font = self.game.font(40)
+
+        #Two possible texts depending on whether the player has passed the level or not
+        if self.passed:
+            self.texts = (font.render(f"You've passed level {self.level}!", 1, COLORS['BLACK']),
+                          font.render("Next level in...", 1, COLORS['BLACK']))
+        else:
+            self.texts = (font.render(f"You've failed level {self.level}!", 1, COLORS['BLACK']),
+                          font.render("Try again in...", 1, COLORS['BLACK']))
+
+    def update(self, keys_pressed, dt):
+        self.game.scheduler.advance(dt)
+        self.game.profiler.lap('game_flow')
+
+    def count_down(self):
+        self.counter -= 1
+        self.counter_text = None
+
+    def start_next_level(self):
+
+        '''
+        Applies the prepared level (waiting for it if it is not ready yet) and goes back to the game.
+        A failed level costs a life.
+        '''
+
+        game = self.game
+        prepared = self.preload.result()
+
+        if not self.passed:
+            game.tank_lives -= 1
+
+        game.current_level = self.next_level
+        game.apply_level(prepared)
+        game.change_state(PlayingState(game))
+
+    def render(self, WINDOW):
+
+        '''
+        Draws the countdown on top of the (frozen) level. The texts are only rendered when the counter changes.
+        '''
+
+        self.game.draw_window(WINDOW)
+
+        #Big background rect
+        pg.draw.rect(WINDOW, COLORS['LIGHT_BLUE'], (WIDTH/2 - 250, HEIGHT/2 -200, 500, 400))
+
+        #Draw a rect with a smaller size to make a border
+        pg.draw.rect(WINDOW, COLORS['BLACK'], (WIDTH/2 - 250, HEIGHT/2 -200, 500, 400), 5)
+
+        text1, text2 = self.texts
+        WINDOW.blit(text1, (WIDTH/2 - text1.get_width()/2, HEIGHT/2 - 150 - text1.get_height()/2))
+        WINDOW.blit(text2, (WIDTH/2 - text2.get_width()/2, HEIGHT/2 - 30 - text2.get_height()/2))
+
+        #Displaying the counter
+        if self.counter_text is None:
+            self.counter_text = self.game.font(100).render(str(self.counter), 1, COLORS['BLACK'])
+
+        text = self.counter_text
+        WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 + 20))
+
+        #Draw circle around the counter
+        pg.draw.circle(WINDOW, COLORS['BLACK'], (WIDTH/2, HEIGHT/2 + 20 + text.get_height()/2), text.get_height()/2 + 5, 5)
+
+        self.game.profiler.lap('draw_window')
+
+class RetryState(LevelTransitionState):
+
+    '''
+    The countdown shown when the tank has been destroyed. The same level is played again, with one life less.
+    '''
+
+    def __init__(self, game):
+        super().__init__(game, passed = False)
+
+class PlayAgainMenuState(GameState):
+
+    '''
+    The menu shown at the end of the game (see GameOverState and VictoryState), with a button to play again and another one to quit.
+    It is only drawn when something changes (the first frame, the hovered button or an exposed window),
+    and it is idle the rest of the time, so the game loop sleeps until the next event.
+
+    Attributes:
+
+        - victory (bool):       whether the player has won the game (False if the player has lost all the lives)
+        - buttons (dict):       the rect of every button ('play_again' and 'quit')
+        - hovered (str):        the button under the mouse (None if there is none)
+        - texts (dict):         the rendered texts of the menu
+        - dirty (bool):         whether the menu has to be drawn again
+        - covered (bool):       whether the frozen level has already been drawn under the menu
+
+    '''
+
+    def __init__(self, game, victory = False):
+        super().__init__(game)
+        self.victory = victory
+        self.buttons = {'play_again': pg.Rect(WIDTH/2 - 100, HEIGHT/2 -80, 200, 100),
+                        'quit': pg.Rect(WIDTH/2 - 100, HEIGHT/2 + 40, 200, 100)}
+        self.hovered = None
+        self.texts = None
+        self.dirty = True
+        self.covered = False
+
+    def enter(self):
+
+        font = self.game.font(30)
+
+        #Two possible titles depending on whether the player has won or lost the game
+        self.texts = {'title': self.game.font(60).render('Victory!' if self.victory else 'Game Over', 1, COLORS['BLACK']),
+                      'play_again': font.render('Play again', 1, COLORS['BLACK']),
+                      'quit': font.render('Quit', 1, COLORS['BLACK'])}
+
+        self.hovered = self.button_at(pg.mouse.get_pos())
+
+    def button_at(self, position):
+        for name, rect in self.buttons.items():
+            if rect.collidepoint(position):
+                return name
+        return None
+
+    def handle_event(self, event):
+
+        '''
+        Handles the mouse: the hovered button is highlighted and a click on a button plays again or quits.
+
+        Parameters:
+
+            event (Event) :     A pygame event.
+
+        Returns: None
+        '''
+
+        if event.type == pg.MOUSEMOTION:
+            hovered = self.button_at(event.pos)
+
+            if hovered != self.hovered:
+                self.hovered = hovered
+                self.dirty = True
+
+        elif event.type == pg.MOUSEBUTTONDOWN:
+            button = self.button_at(event.pos)
+
+            if button == 'play_again':
+                self.game.restart()
+            elif button == 'quit':
+                self.game.play_again = False
+
+        #The window has been covered (or restored) and has to be drawn again
+        elif event.type in (pg.WINDOWEXPOSED, pg.WINDOWRESTORED, pg.VIDEOEXPOSE):
+            self.covered = False
+            self.dirty = True
+
+    def is_idle(self):
+        return not self.dirty
+
+    def render(self, WINDOW):
+
+        '''
+        Draws the menu (on top of the frozen level the first time).
+        '''
+
+        if not self.dirty:
+            return
+
+        self.dirty = False
+
+        if not self.covered:
+            self.game.draw_window(WINDOW)
+            self.covered = True
+
+        #Big background rect
+        pg.draw.rect(WINDOW, COLORS['LIGHT_BLUE'], (WIDTH/2 - 200, HEIGHT/2 -200, 400, 400))
+        #Draw a rect with a smaller size to make a border
+        pg.draw.rect(WINDOW, COLORS['BLACK'], (WIDTH/2 - 200, HEIGHT/2 -200, 400, 400), 5)
+
+        text = self.texts['title']
+        WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 - 150 - text.get_height()/2))
+
+        #Play again and quit buttons (the border of the hovered one is black)
+        for name, rect in self.buttons.items():
+            pg.draw.rect(WINDOW, COLORS['LIGHT_GREY'], rect)
+            pg.draw.rect(WINDOW, COLORS['BLACK'] if name == self.hovered else COLORS['WHITE'], rect, 5)
+
+            text = self.texts[name]
+            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, rect.y + 10 + text.get_height()/2))
+
+        self.game.profiler.lap('draw_window')
+
+class GameOverState(PlayAgainMenuState):
+
+    '''
+    The menu shown when the player has lost all the lives.
+    '''
+
+    def __init__(self, game):
+        super().__init__(game, victory = False)
+
+class VictoryState(PlayAgainMenuState):
+
+    '''
+    The menu shown when the player has passed all the levels.
+    '''
+
+    def __init__(self, game):
+        super().__init__(game, victory = True)
@@ -1,72 +1,71 @@
 import pygame as pg
 import math
-from bullet import Bullet
+import numpy as np
+from bullet import Bullet, MAX_FLIGHT_TICKS, path
+from assets import load_image
+from entities import BaseTank, Column, TEAM_PLAYER
+from config import DEFAULT_CONFIG
 from parameters import get_parameters
 
 WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
 
-class Tank:
+#Ticks of flight between two points of the aim guide
+AIM_STEP = 2
+
+#The x-coordinate the right side of the player tank cannot reach, in a world as wide as the window
+#(in a wider world, it moves right with the extra width)
+MAX_X = 500
+
+class Tank(BaseTank):
 
     '''
     Represents a tank object that can move, fire, take damage, and be drawn on the game window. It is the tank controlled by the user.
+    Its numeric fields are stored in a TankStore (see entities).
 
-    Attributes:
+    Attributes (besides the ones of BaseTank):
 
-        - hp (int):                       the tank's current health points
-        - size (int):                     the size of the tank
-        - x (int):                        the x-coordinate of the tank's top-left corner
-        - y (int):                        the y-coordinate of the tank's top-left corner
-        - tank_speed (int):               the speed at which the tank can move
-        - firing_power (int):             the current firing power of the tank
-        - firing_angle (int):             the angle at which the tank's gun is aimed
+        - min_x (int):                    the x-coordinate the left side of the tank cannot reach (0, the left side of the world)
+        - max_x (int):                    the x-coordinate the right side of the tank cannot reach (see MAX_X)
+        - vx (float):                     the horizontal velocity of the tank in the last tick, in pixels per tick (stored)
         - gun_velocity (int):             the speed at which the firing angle can be changed
-        - firing (bool):                  whether the tank is currently firing or not
-        - got_hit (bool):                 whether the tank has been hit by a bullet
-        - TANK_IMAGE (Surface):           the image of the tank
-        - TANK_EXPLOSION_IMAGE (Surface): the image of the tank exploding (when it is hit by a bullet)
-        - rect (Rect):                     the rectangular hitbox of the tank
+        - aim_key (tuple):                the position, angle and power the aim guide was computed for
+        - aim_arc (ndarray):              the points of the aim guide (the predicted arc of the next shot), in the world
+        - aim_camera (tuple):             the position of the camera and the render scale aim_points were computed for
+        - aim_points (list):              the points of the aim guide in the window (None if they have to be computed again)
+        - show_aim (bool):                whether the aim guide is drawn with the tank (it is hidden for an opponent, see versus)
 
-    Methods:
+    Methods (besides the ones of BaseTank):
 
-        - firing_x0:         returns the x-coordinate of the point from which the tank fires
-        - firing_y0:         returns the y-coordinate of the point from which the tank fires
         - move:              handles the tank's movement based on the keys pressed by the user
-        - draw_tank:         draws the tank on a given window surface
-        - draw_firing angle: draws the tank's firing angle on a given window surface
-        - draw_gun:          draws the tank's gun on a given window surface
+        - update_aim:        computes again the aim guide if the position, angle or power have changed
+        - draw_aim:          draws the tank's aim guide (when the tank is drawn)
+        - draw_firing_angle: draws the tank's aim guide on a given window surface
         - fire:              fires a bullet from the tank's gun
-        - handle_bullet_hit: updates the tank's health points and sets got_hit to True if the tank is hit by a bullet
-        - draw_hp_bar:       draws the tank's health bar above the tank on a given window surface
 
     '''
 
-    def __init__(self, x0, y0):
-        self.hp = 100
-        self.size = 70
-        self.x = x0
-        self.y = y0
-        self.tank_speed = 3
-        self.firing_power = 0
-        self.firing_angle = 30
-        self.gun_velocity = 1
-        self.firing = False
-        self.got_hit = False
-        self.TANK_IMAGE = pg.transform.scale(pg.image.load(r'images\tank_image.png'), (self.size, self.size))
-        self.TANK_EXPLOSION_IMAGE = pg.transform.scale(pg.image.load(r'images\tank_explosion.png'), (self.size, self.size))
-        self.rect = pg.Rect(self.x, self.y, self.size, self.size)
-
-    @property   #Used to update firing_x0 when it's called
-    def firing_x0(self):
-        return self.x + 0.6*self.size
-
-    @property
-    def firing_y0(self):
-        return self.y + 0.4*self.size
+    __slots__ = ('min_x', 'max_x', 'aim_key', 'aim_arc', 'aim_camera', 'aim_points', 'show_aim')
+
+    vx = Column('vx')
+
+    gun_velocity = 1
+    FIRING_X = 0.6
+
+    def __init__(self, x0, y0, store = None, world_width = WIDTH, tank_speed = DEFAULT_CONFIG.tank_speed):
+        super().__init__(x0, y0, TEAM_PLAYER, store, tank_speed)
+        self.vx = 0
+        self.min_x = 0
+        self.max_x = MAX_X + world_width - WIDTH
+        self.aim_key = self.aim_arc = self.aim_camera = self.aim_points = None
+        self.show_aim = True
+        self.TANK_IMAGE = load_image('tank_image.png', (self.size, self.size))
+        self.TANK_EXPLOSION_IMAGE = load_image('tank_explosion.png', (self.size, self.size))
 
     def move(self, keys_pressed):
 
         '''
-        Handles the tank's motion based on the keys pressed by the user.
+        Handles the tank's motion based on the keys pressed by the user, and keeps its velocity
+        (the enemies use it to predict where the tank will be). The aim guide is updated if needed.
 
         Parameters:
             - keys_pressed (dict): A dictionary containing the state of all keyboard keys. 
@@ -74,15 +73,19 @@ class Tank:
         Returns:
             - None
         '''
+
+        old_x = self.x
      
         #Moving the tank to the left
-        if keys_pressed[pg.K_LEFT] and self.x - self.tank_speed > 0:
+        if keys_pressed[pg.K_LEFT] and self.x - self.tank_speed > self.min_x:
             self.x -= self.tank_speed
 
         #Moving the tank to the right
-        if keys_pressed[pg.K_RIGHT] and self.x + self.tank_speed + self.size < 500:
+        if keys_pressed[pg.K_RIGHT] and self.x + self.tank_speed + self.size < self.max_x:
             self.x += self.tank_speed
 
+        self.vx = self.x - old_x
+
         #Changing the firing angle (up)
         if keys_pressed[pg.K_UP] and self.firing_angle + self.gun_velocity < 90:
             self.firing_angle += self.gun_velocity
@@ -95,73 +98,67 @@ class Tank:
         if keys_pressed[pg.K_SPACE] and not self.firing and self.firing_power + 2 < 101:
             self.firing_power = min(self.firing_power + 2, 100)
 
-    def draw_tank(self, WINDOW):
+        self.update_aim()
+
+    def update_aim(self):
 
         '''
-        Draws the tank on a given window surface. It draws the tank's gun, firing angle, and health bar,
-        and then draws the tank itself, depending on whether it has been hit by a bullet or not.
+        Computes again the aim guide, the predicted arc of the next shot (with the current angle and power), if the
+        position, angle or power of the tank have changed since it was computed. The arc follows the path of the
+        bullet (see bullet.path) until it reaches the floor or leaves the view (which is never wider than the window
+        on either side of the tank).
 
-        Parameters:
-            - WINDOW (Surface): The window surface on which to draw the tank.
+        Parameters: None
 
         Returns: None
-    '''
+        '''
 
-        self.rect = pg.Rect(self.x, self.y, self.size, self.size)
-        self.draw_gun(WINDOW)
-        self.draw_firing_angle(WINDOW, 'RED')
-        self.draw_hp_bar(WINDOW)
+        key = (self.x, self.y, self.firing_angle, self.firing_power)
+        if key == self.aim_key:
+            return
 
-        if self.got_hit:
-            WINDOW.blit(self.TANK_EXPLOSION_IMAGE, self.rect)
-            self.got_hit = False
+        self.aim_key = key
+        theta = math.radians(self.gun_angle)
+        v0 = 20 + 15*self.firing_power/100
 
-        else:
-            WINDOW.blit(self.TANK_IMAGE, self.rect)
+        xs, ys = path(self.firing_x0, self.firing_y0, v0*math.cos(theta), -v0*math.sin(theta), np.arange(0, MAX_FLIGHT_TICKS, AIM_STEP))
 
-    def draw_firing_angle(self, WINDOW, color = 'RED'):
+        #Up to the first point out of the view or below the floor (included, so the arc reaches it)
+        out = np.flatnonzero((ys > FLOOR_POS[1]) | (np.abs(xs - self.x) > WIDTH) | (xs < 0))
+        end = out[0] + 1 if len(out) else len(xs)
+
+        self.aim_arc = np.column_stack((xs[:end], ys[:end]))
+        self.aim_points = None
+
+    def draw_aim(self, WINDOW, camera_x = 0, scale = 1):
+        if self.show_aim:
+            self.draw_firing_angle(WINDOW, 'RED', camera_x, scale)
+
+    def draw_firing_angle(self, WINDOW, color = 'RED', camera_x = 0, scale = 1):
 
         '''
-        Draws the firing angle of the tank's next shot on a given window surface in a given color.
-        It draws small rectangles equally spaced along the line of the firing angle.
+        Draws the aim guide of the tank's next shot (its predicted arc) on a given window surface in a given color,
+        as a single polyline of the cached points (see update_aim). The points in the window are only computed again
+        when the arc, the camera or the render scale change.
 
         Parameters:
             - WINDOW (Surface): The window surface on which to draw the trajectory.
             - color (str):      The color of the trajectory. Defaults to 'RED'.
+            - camera_x (int):   The x-coordinate of the left side of the view (see camera). Defaults to 0.
+            - scale (float):    The render scale of the surface (see game). Defaults to 1.
 
         Returns:
             - None
-    '''
-
-        for i in range(15):
-
-            theta = math.radians(self.firing_angle)
-
-            x = self.firing_x0 + 8*i*math.cos(theta)
-            y = self.firing_y0 - 8*i*math.sin(theta)
-
-            rect = pg.Rect(x, y, 3, 3)
-            pg.draw.rect(WINDOW, COLORS[color], rect)
-
-    def draw_gun(self, WINDOW, gun_length = 20, gun_width = 5, gun_color = 'DARK_GREY'):
-
         '''
-        Draws the tank's gun on a given window surface.
 
-        Parameters:
-            - WINDOW (Surface): The window surface on which to draw the gun.
-            - gun_length (float): The length of the gun. Defaults to 20.
-            - gun_width (float):  The width of the gun. Defaults to 5.
-            - gun_color (str):  The color of the gun. Defaults to 'DARK_GREY'.
+        if self.aim_arc is None:
+            self.update_aim()
 
-        Returns: None
-
-        '''
+        if self.aim_points is None or self.aim_camera != (camera_x, scale):
+            self.aim_camera = (camera_x, scale)
+            self.aim_points = ((self.aim_arc - (camera_x, 0))*scale).tolist()
 
-        x0, y0 = self.firing_x0, self.firing_y0
-        theta = math.radians(self.firing_angle)
-        x, y = x0 + gun_length*math.cos(theta), y0 - gun_length*math.sin(theta)
-        pg.draw.line(WINDOW, COLORS[gun_color],(x0, y0), (x, y), width = gun_width)
+        pg.draw.lines(WINDOW, COLORS[color], False, self.aim_points)
 
     def fire(self):
 
@@ -178,37 +175,4 @@ class Tank:
         initial_velocity = 20 + 15*self.firing_power/100
 
         self.firing = True
-        self.bullet = Bullet(self.firing_x0, self.firing_y0, initial_velocity, self.firing_angle)
-
-    def handle_bullet_hit(self, bullet_damage):
-
-        '''
-        Updates the tank's health points and sets got_hit to True.
-        It is called when the tank is hit by a bullet.
-
-        Parameters:
-            - bullet_damage (int): The damage dealt by the bullet that hit the tank.
-
-        Returns: None
-        '''
-
-        self.hp -= bullet_damage
-        self.got_hit = True
-
-    def draw_hp_bar(self, WINDOW):
-
-        '''
-        Draws the tank's health bar on a given window surface.
-        It draws a green rectangle (representing the tank's current health) on top of a red rectangle (representing the tank's maximum health
-
-        Parameters:
-
-            - WINDOW (Surface): The window surface on which to draw the health bar.
-
-        Returns: None
-        '''
-
-        rect = pg.Rect(self.x, self.y - 10, self.size, 5)
-        pg.draw.rect(WINDOW, COLORS['RED'], rect)
-        rect = pg.Rect(self.x, self.y - 10, self.hp*self.size/100, 5)
-        pg.draw.rect(WINDOW, COLORS['GREEN'], rect)
+        self.bullet = Bullet(self.firing_x0, self.firing_y0, initial_velocity, self.gun_angle)
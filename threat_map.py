@@ -0,0 +1,259 @@
+import numpy as np
+import pygame as pg
+from bullet import DELTA_T, MAX_FLIGHT_TICKS, path
+from enemy import VELOCITIES
+from navigation import TANK_OFFSET, TANK_SIZE
+from config import DEFAULT_CONFIG
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Threat heatmap: an overlay that shows, along the floor, how many enemies can currently hit a tank standing there
+(with the obstacle-aware solutions of EnemyTank.get_possible_trajectory). It is a danger map for the player and
+a visual debugger of the enemies' aim. F4 shows or hides it.
+
+The floor positions an enemy can hit are computed with a batched sweep: all the target positions, velocities and
+angles at once with NumPy, following the candidate shots along the path of the bullet. They are kept per enemy,
+and only computed again when the enemy moves to another cell of the map (or the terrain changes, e.g. a crater), a few enemies
+per frame. The overlay is rendered into a cached surface, only when the counts change.
+
+'''
+
+#Width (in pixels) of the cells of the map (the target positions are the centres of the cells)
+CELL_SIZE = 20
+
+#Number of enemies whose reachable positions are computed again per frame (by default, see config)
+UPDATES_PER_FRAME = DEFAULT_CONFIG.threat_updates
+
+#Height (in pixels) of the strip of the overlay, above the floor
+STRIP_HEIGHT = 10
+
+class ThreatMap:
+
+    '''
+    The floor positions the enemies can hit, drawn as a strip of cells above the floor, redder the more enemies can hit them.
+
+    Attributes:
+
+        - show (bool):          whether the map is computed and drawn or not
+        - targets (ndarray):    the x-coordinates of the top-left corner of a tank standing at the centre of every cell (of the world)
+        - rows (dict):          the cell of every enemy and the cells it can hit (a boolean per cell), by enemy
+                                (the cell is None if the terrain has changed since)
+        - counts (ndarray):     the number of enemies that can hit every cell
+        - obstacles (Obstacles): the obstacles the rows were computed with (None if there are no rows)
+        - version (int):        the version of the obstacles the rows were computed with (see Obstacles)
+        - enemy_count (int):    the number of enemies at the last update (to notice the dead ones)
+        - surface (Surface):    the cached surface of the overlay (None if it has to be rendered again)
+        - velocities (ndarray): the initial velocities tried by the enemies (the ones of their solver, see enemy)
+        - updates_per_frame (int): the number of enemies whose row is computed again per frame
+
+    Methods:
+
+        - toggle:               shows or hides the map
+        - set_world:            sets the cells of a world of a given width (without any enemy)
+        - reset:                forgets the rows (when the level changes)
+        - update:               computes again the rows of the enemies that have moved (a few per frame)
+        - cell:                 returns the cell of an enemy
+        - reachable_targets:    computes the cells an enemy can hit
+        - draw:                 draws the map on a given window surface
+
+    '''
+
+    def __init__(self, world_width = WIDTH, velocities = VELOCITIES, updates_per_frame = UPDATES_PER_FRAME):
+        self.show = False
+        self.rows = {}
+        self.set_world(world_width)
+        self.obstacles = None
+        self.version = 0
+        self.enemy_count = 0
+        self.surface = None
+        self.velocities = velocities
+        self.updates_per_frame = updates_per_frame
+
+    def toggle(self):
+        self.show = not self.show
+
+    def set_world(self, world_width):
+        self.targets = np.arange(CELL_SIZE/2, world_width, CELL_SIZE) - TANK_SIZE/2
+        self.counts = np.zeros(len(self.targets), dtype = int)
+
+    def reset(self):
+
+        '''
+        Forgets the rows, the counts and the rendered overlay (e.g. when the level changes, even while the map is hidden,
+        so the rows do not keep the enemies of the old level alive).
+
+        Parameters: None
+
+        Returns: None
+        '''
+
+        self.rows.clear()
+        self.counts[:] = 0
+        self.obstacles = None
+        self.enemy_count = 0
+        self.surface = None
+
+    def update(self, enemies, obstacles):
+
+        '''
+        Computes again the rows of the enemies that have moved to another cell since their last computation (the new
+        enemies first), up to updates_per_frame per call, and forgets the dead enemies. All the rows are computed again
+        when the terrain changes (they are kept meanwhile), and forgotten in a new level. It does nothing while the map is hidden.
+
+        Parameters:
+
+            - enemies (list):           the enemy tanks
+            - obstacles (Obstacles):    the obstacles of the level
+
+        Returns: None
+        '''
+
+        if not self.show:
+            return
+
+        #Another level (the obstacles themselves are compared: the id of a freed level can be reused)
+        if obstacles is not self.obstacles:
+            self.rows.clear()
+            self.set_world(obstacles.width)
+            self.surface = None
+
+        #A crater: the rows are outdated (their cell is forgotten), but kept until they are computed again
+        elif obstacles.version != self.version:
+            self.rows = {enemy: (None, reachable) for enemy, (cell, reachable) in self.rows.items()}
+
+        self.obstacles = obstacles
+        self.version = obstacles.version
+
+        #Dead enemies (the enemies of a level are only removed)
+        if len(enemies) != self.enemy_count:
+            self.enemy_count = len(enemies)
+            alive = set(enemies)
+            for enemy in [enemy for enemy in self.rows if enemy not in alive]:
+                self.counts -= self.rows.pop(enemy)[1]
+                self.surface = None
+
+        #Enemies without a row first, then the ones that have changed cell
+        stale = [enemy for enemy in enemies if enemy not in self.rows]
+        if len(stale) < self.updates_per_frame:
+            stale += [enemy for enemy in enemies if enemy in self.rows and self.rows[enemy][0] != self.cell(enemy)]
+
+        for enemy in stale[:self.updates_per_frame]:
+            reachable = self.reachable_targets(enemy, obstacles)
+            old = self.rows.get(enemy)
+
+            if old is not None:
+                self.counts -= old[1]
+
+            self.rows[enemy] = (self.cell(enemy), reachable)
+            self.counts += reachable
+            self.surface = None
+
+    def cell(self, enemy):
+        return int(enemy.x) // CELL_SIZE, int(enemy.y)
+
+    def reachable_targets(self, enemy, obstacles):
+
+        '''
+        Computes the cells an enemy can hit: for a tank standing on the floor at every cell, whether one of the shots
+        tried by EnemyTank.get_possible_trajectory (every velocity, with both angles) reaches it without being destroyed
+        (by an obstacle, or leaving the world) on the way. The shots are followed step by step, with the positions of
+        Bullet.update in closed form, for all the targets at once: first the shot with the shortest flight of every target,
+        then the next one of the targets that have not been reached, and so on.
+
+        Parameters:
+
+            - enemy (EnemyTank):        the enemy
+            - obstacles (Obstacles):    the obstacles of the level
+
+        Returns:
+
+            - ndarray: a boolean per cell, True if the enemy can hit a tank standing there
+        '''
+
+        x0, y0 = enemy.firing_x0, enemy.firing_y0
+        reachable = np.zeros(len(self.targets), dtype = bool)
+
+        #Relative position of the targets, as given to get_possible_trajectory
+        dx = enemy.x - self.targets
+        dy = enemy.y - (FLOOR_POS[1] - TANK_OFFSET)
+        targets = np.flatnonzero(dx > 0)
+        dx = dx[targets, None]
+
+        #Candidate shots (rows: targets, columns: velocities with both angles)
+        v = np.tile(self.velocities, 2)
+        sign = np.repeat((1, -1), len(self.velocities))
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            discriminant = v**4 - gravity*(gravity*dx**2 + 2*dy*v**2)
+            theta = np.arctan((v**2 + sign*np.sqrt(discriminant))/(gravity*dx))
+
+            #Velocity of the bullets (fired at theta + 90 degrees) and number of steps to reach the targets
+            vx, vy = -v*np.sin(theta), -v*np.cos(theta)
+            steps = np.ceil(dx/-vx/DELTA_T)
+
+        valid = (discriminant >= 0) & (theta >= 0) & (theta <= np.pi/2) & (steps <= MAX_FLIGHT_TICKS)
+        steps = np.where(valid, steps, np.inf)
+
+        #The candidates of every target, from the shortest flight to the longest
+        order = np.argsort(steps, axis = 1)
+        rows = np.arange(len(targets))
+
+        for rank in range(order.shape[1]):
+
+            #The next candidate of the targets not reached yet (and that have one)
+            candidate = order[:, rank]
+            pending = np.flatnonzero(~reachable[targets] & np.isfinite(steps[rows, candidate]))
+            if not len(pending):
+                break
+
+            candidate = candidate[pending]
+            shot_steps = steps[pending, candidate].astype(int)
+
+            #Every step of every shot, flattened
+            shot = np.repeat(np.arange(len(pending)), shot_steps)
+            step = np.arange(len(shot)) - np.repeat(np.cumsum(shot_steps) - shot_steps, shot_steps) + 1
+            xs, ys = path(x0, y0, vx[pending, candidate][shot], vy[pending, candidate][shot], step)
+
+            destroyed = (ys > FLOOR_POS[1]) | (ys < 0) | (xs > obstacles.width)
+            inside = ~destroyed
+            destroyed[inside] = obstacles.collide_rects(xs[inside], ys[inside], 7, 7)
+
+            blocked = np.zeros(len(pending), dtype = bool)
+            np.logical_or.at(blocked, shot, destroyed)
+            reachable[targets[pending[~blocked]]] = True
+
+        return reachable
+
+    def draw(self, WINDOW, camera_x = 0, scale = 1):
+
+        '''
+        Draws the map (if it is shown) on a given window surface, rendering it again only if the counts have changed.
+
+        Parameters:
+
+            - WINDOW (Surface): the window surface to draw on
+            - camera_x (int):   the x-coordinate of the left side of the view (see camera)
+            - scale (float):    the render scale of the surface (see game)
+
+        Returns: None
+        '''
+
+        if not self.show:
+            return
+
+        if self.surface is None:
+            self.surface = pg.Surface((len(self.counts)*CELL_SIZE, STRIP_HEIGHT), pg.SRCALPHA)
+            most = max(int(self.counts.max()), 1)
+
+            for i, count in enumerate(self.counts.tolist()):
+                if count:
+                    self.surface.fill((*COLORS['RED'], 60 + 160*count//most), (i*CELL_SIZE, 0, CELL_SIZE, STRIP_HEIGHT))
+
+        if scale == 1:
+            WINDOW.blit(self.surface, (0, FLOOR_POS[1] - STRIP_HEIGHT), (camera_x, 0, WIDTH, STRIP_HEIGHT))
+        else:
+            area = self.surface.get_rect().clip((camera_x, 0, WIDTH, STRIP_HEIGHT))
+            strip = pg.transform.scale(self.surface.subsurface(area), (round(area.width*scale), round(STRIP_HEIGHT*scale)))
+            WINDOW.blit(strip, (0, (FLOOR_POS[1] - STRIP_HEIGHT)*scale))
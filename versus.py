@@ -0,0 +1,568 @@
+import argparse
+import pygame as pg
+from game import Game
+from game_loop import GameLoop
+from states import GameState
+from tank import Tank, MAX_X
+from bullet import Bullet
+from navigation import Navigation
+from assets import load_image
+from config import Config, DEFAULT_CONFIG
+from network import Server, Client, InputKeys, encode_input, now_ms, SPACE_BIT, DEFAULT_PORT, SNAPSHOT_RATE
+from parameters import get_parameters
+
+WIDTH, HEIGHT, FLOOR_WIDTH, FLOOR_HEIGHT, FLOOR_POS, COLORS, gravity = get_parameters()
+
+'''
+Versus mode: two players fight on a level (its obstacles, without the enemies) over the network (see network).
+
+The host plays the first tank with the keyboard and runs the authoritative game. The second player joins from
+another window (or machine): their inputs are sent to the host, which plays them on the opposing tank (a RivalTank,
+on the other side of the level and firing to the left), and the host sends back snapshots of the game. The second
+player's tank does not wait for the host: the client predicts it by playing the inputs at once, and when a snapshot
+arrives, it takes the state of the host and plays again the inputs the host has not played yet. The shells are moved
+by the client between two snapshots. Other clients can join as spectators.
+
+A round ends when a tank is destroyed: the other player scores and the level starts again.
+
+The traffic (per client on the host) and the input latency (on the client) are shown in the window and reported
+at the end.
+
+Usage:
+
+    python main.py versus host [--level 1] [--port 50007] [--rate 20] [configuration flags, see config]
+    python main.py versus join [HOST] [--port 50007] [configuration flags]
+
+Both players tick at 60 frames per second whatever the frame cap of their configuration, and the speed of each tank
+is the one of the host's configuration (the second player should use the same one, or their prediction is corrected
+by every snapshot).
+
+'''
+
+#Quantization steps of the fields of a tank and of its shell in the snapshots
+TANK_FIELDS = (('x', 0.25), ('y', 0.25), ('firing_angle', 1), ('firing_power', 1), ('hp', 1), ('firing', 1), ('got_hit', 1))
+BULLET_FIELDS = (('x', 0.25), ('y', 0.25), ('vx', 1/256), ('vy', 1/256))
+
+#A snapshot is the round and the scores, followed by the fields of both tanks
+STEPS = (1, 1, 1) + 2*tuple(step for field, step in TANK_FIELDS + BULLET_FIELDS)
+
+#Time between two updates of the network status shown in the window (in ms)
+STATUS_INTERVAL = 1000
+
+class RivalTank(Tank):
+
+    '''
+    The opposing tank of the versus mode. It is controlled like the player tank, but it stands on the other side
+    of the level (it cannot go further left than MAX_X from the right side of the world) and it fires to the left:
+    its firing angle is measured from the left.
+    '''
+
+    __slots__ = ()
+
+    FIRING_X = 0.4
+
+    def __init__(self, x0, y0, store = None, world_width = WIDTH, tank_speed = DEFAULT_CONFIG.tank_speed):
+        super().__init__(x0, y0, store, world_width, tank_speed)
+        self.min_x = world_width - MAX_X
+        self.max_x = world_width
+        self.TANK_IMAGE = load_image('enemy_image.png', (self.size, self.size))
+        self.TANK_EXPLOSION_IMAGE = load_image('enemy_tank_explosion.png', (self.size, self.size))
+
+    @property
+    def gun_angle(self):
+        return 180 - self.firing_angle
+
+class VersusGame(Game):
+
+    '''
+    The game of the versus mode, on the host (where it is played) and on the clients (where the snapshots are shown).
+
+    Attributes (besides the ones of Game):
+
+        rival (RivalTank) :     The tank of the second player.
+        slot (int) :            The player on this machine: 0 on the host, 1 for the second player, more for a spectator.
+        local (Tank) :          The tank played on this machine (None for a spectator).
+        scores (list) :         The rounds won by each player.
+        round (int) :           The number of the current round.
+        events (list) :         The craters carved since the start, as (round, x, y) (sent to the clients).
+        carved (int) :          The craters of the current round already in the events.
+        status (Surface) :      The network status shown in the window (None if there is none).
+
+    Methods:
+
+        prepare_level :     Creates the objects of the level, with the rival instead of the enemies.
+        apply_level :       Makes a prepared level the current one.
+        play_input :        Plays the input of a tick on a tank.
+        handle_tank :       Handles the tank of the host.
+        update_bullets :    Moves the shells (and checks their collisions on the host).
+        log_craters :       Adds the new craters to the events.
+        check_round_over :  Ends the round if a tank is destroyed.
+        snapshot :          Returns the state of the game sent to the clients.
+        apply_snapshot :    Shows a snapshot of the host.
+        draw_world :        Draws the level, the tanks and the shells.
+        draw_hud :          Draws the score, the power bar and the network status.
+
+    '''
+
+    def __init__(self, level = 1, slot = 0, config = None):
+        super().__init__(config)
+        self.current_level = level
+        self.rival = None
+        self.slot = slot
+        self.local = None
+        self.scores = [0, 0]
+        self.round = 0
+        self.events = []
+        self.carved = 0
+        self.status = None
+
+    def prepare_level(self, level):
+
+        '''
+        Creates the objects of a level (see Game.prepare_level) without its enemies: the rival stands where the
+        player stands, mirrored.
+
+        Parameters
+
+            level (int) :   The level to prepare.
+
+        Returns:
+
+            tuple : The prepared level (see Game.prepare_level) and the rival.
+
+        '''
+
+        tank, enemies, obstacles, navigation, layer = super().prepare_level(level)
+        rival = RivalTank(obstacles.width - tank.x - tank.size, tank.y, tank.store, obstacles.width, self.config.tank_speed)
+
+        return tank, [], obstacles, Navigation(obstacles, []), layer, rival
+
+    def apply_level(self, prepared):
+
+        '''
+        Makes a prepared level (see prepare_level) the current one. Only the aim guide of the local tank is shown.
+
+        Parameters
+
+            prepared (tuple) :  The prepared level.
+
+        Returns: None
+
+        '''
+
+        *prepared, self.rival = prepared
+        super().apply_level(prepared)
+        self.rival.on_hit = self.start_hit_flash
+        self.carved = 0
+
+        self.local = (self.tank, self.rival)[self.slot] if self.slot < 2 else None
+        self.tank.show_aim = self.local is self.tank
+        self.rival.show_aim = self.local is self.rival
+
+    def play_input(self, tank, bits, previous):
+
+        '''
+        Plays the input of a tick (see network.encode_input) on a tank, as the keyboard does on the player tank:
+        pressing SPACE starts charging a shot and releasing it fires.
+
+        Parameters
+
+            tank (Tank) :       The tank.
+            bits (int) :        The input of the tick.
+            previous (int) :    The input of the previous tick.
+
+        Returns: None
+
+        '''
+
+        tank.move(InputKeys(bits))
+
+        if bits & SPACE_BIT and not previous & SPACE_BIT and not tank.firing:
+            tank.firing_power = 0
+
+        elif previous & SPACE_BIT and not bits & SPACE_BIT and not tank.firing:
+            tank.fire()
+            tank.firing_power = 0
+
+    def handle_tank(self, keys_pressed):
+
+        '''
+        Handles the tank of the host (the shots are fired in handle_event) and the shells of both tanks.
+
+        Parameters
+
+            keys_pressed (list) :   The keys pressed.
+
+        Returns: None
+
+        '''
+
+        self.tank.move(keys_pressed)
+        self.camera.follow(self.tank)
+        self.update_bullets()
+
+    def update_bullets(self, collide = True):
+
+        '''
+        Moves the shells of both tanks. On the host, a shell that hits the other tank or an obstacle is destroyed
+        (the clients only move them, the snapshots tell where they are).
+
+        Parameters
+
+            collide (bool) :    Whether the collisions are checked.
+
+        Returns: None
+
+        '''
+
+        for shooter, target in ((self.tank, self.rival), (self.rival, self.tank)):
+
+            if not shooter.firing:
+                continue
+
+            shooter.bullet.update()
+
+            if collide and shooter.bullet.check_bullet_collision(self.obstacles, target):
+                shooter.firing = False
+                del shooter.bullet
+
+    def log_craters(self):
+        for x, y in self.obstacles.craters[self.carved:]:
+            self.events.append((self.round, x, y))
+        self.carved = len(self.obstacles.craters)
+
+    def check_round_over(self):
+
+        '''
+        Ends the round if a tank has been destroyed: the other player scores and the level starts again.
+
+        Parameters: None
+
+        Returns: None
+
+        '''
+
+        if self.tank.hp > 0 and self.rival.hp > 0:
+            return
+
+        if self.tank.hp > 0:
+            self.scores[0] += 1
+        if self.rival.hp > 0:
+            self.scores[1] += 1
+
+        self.round += 1
+        self.apply_level(self.prepare_level(self.current_level))
+
+    def snapshot(self):
+
+        '''
+        Returns the state of the game sent to the clients (see STEPS).
+
+        Parameters: None
+
+        Returns:
+
+            list : The values of the state.
+
+        '''
+
+        state = [self.round] + self.scores
+
+        for tank in (self.tank, self.rival):
+            state += [getattr(tank, field) for field, step in TANK_FIELDS]
+            state += [getattr(tank.bullet, field) for field, step in BULLET_FIELDS] if tank.firing else [0]*len(BULLET_FIELDS)
+
+        return state
+
+    def apply_snapshot(self, state, events, first_event, pending = (), played_bits = 0):
+
+        '''
+        Shows a snapshot of the host: a new round starts the level again, the tanks and their shells take the state
+        of the host, and the new craters are carved. The local tank then plays again the inputs the host has not
+        played yet (prediction).
+
+        Parameters
+
+            state (ndarray) :       The values of the state (see snapshot).
+            events (list) :         The events of the snapshot.
+            first_event (int) :     The number of the first of them.
+            pending (list) :        The inputs of the local tank the host has not played yet.
+            played_bits (int) :     The last input the host has played.
+
+        Returns: None
+
+        '''
+
+        state = state.tolist()
+
+        if int(state[0]) != self.round:
+            self.round = int(state[0])
+            self.apply_level(self.prepare_level(self.current_level))
+
+        self.scores = [int(score) for score in state[1:3]]
+        offset = 3
+
+        for tank in (self.tank, self.rival):
+
+            for field, step in TANK_FIELDS:
+                setattr(tank, field, state[offset])
+                offset += 1
+
+            tank.got_hit = bool(tank.got_hit)
+            tank.rect.update(tank.x, tank.y, tank.size, tank.size)
+
+            if tank.firing:
+                if not hasattr(tank, 'bullet'):
+                    tank.bullet = Bullet(0, 0, 0, 0)
+                for field, step in BULLET_FIELDS:
+                    setattr(tank.bullet, field, state[offset])
+                    offset += 1
+                tank.bullet.update_rect()
+
+            else:
+                if hasattr(tank, 'bullet'):
+                    del tank.bullet
+                offset += len(BULLET_FIELDS)
+
+        for number, (round, x, y) in enumerate(events, first_event):
+            if number == len(self.events):
+                self.events.append((round, x, y))
+                if round == self.round:
+                    self.obstacles.carve(x, y)
+
+        if self.local is not None:
+            previous = played_bits
+            for bits in pending:
+                self.play_input(self.local, bits, previous)
+                previous = bits
+                if self.local.firing:
+                    self.local.bullet.update()
+
+    def draw_world(self, WINDOW, scale):
+
+        '''
+        Draws the world on a surface at a given scale (see Game.draw_world): the level, both tanks and their shells.
+
+        Parameters:
+
+            WINDOW (pygame.Surface):    The surface to draw on
+            scale (float):              The scale of the surface
+
+        Returns: None
+
+        '''
+
+        camera_x = self.camera.x
+        layer = self.static_layer if scale == 1 else self.scaled_static_layer()
+        WINDOW.blit(layer, (0, 0), (round(camera_x*scale), 0, WINDOW.get_width(), WINDOW.get_height()))
+
+        for tank in (self.tank, self.rival):
+            tank.draw_tank(WINDOW, camera_x, scale)
+            if tank.firing:
+                tank.bullet.draw_bullet(WINDOW, camera_x = camera_x, scale = scale)
+
+    def draw_hud(self, WINDOW):
+
+        '''
+        Draws the HUD on the window: the score, the power bar of the local tank and the network status.
+
+        Parameters:
+
+            WINDOW (pygame.Surface):    The window surface to draw on
+
+        Returns: None
+
+        '''
+
+        text = self.render_hud_text('Score', f'{self.scores[0]} - {self.scores[1]}')
+        WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, 10))
+
+        if self.local is not None:
+            self.power_bar.draw_power_bar(WINDOW, self.local.firing_power)
+
+        if self.status is not None:
+            WINDOW.blit(self.status, (WIDTH - self.status.get_width() - 10, 10))
+
+class HostState(GameState):
+
+    '''
+    The versus mode on the host: every tick, the input of the second player (received by the server) and the keyboard
+    of the host are played, and the server sends the snapshots to the clients.
+
+    Attributes (besides the ones of GameState):
+
+        - server (Server):          the network side of the host
+        - next_status (float):      the time of the next update of the network status (in ms)
+
+    '''
+
+    def __init__(self, game, server):
+        super().__init__(game)
+        self.server = server
+        self.next_status = 0
+
+    def handle_event(self, event):
+        self.game.handle_event(event)
+
+    def update(self, keys_pressed, dt):
+
+        game = self.game
+        server = self.server
+
+        server.poll()
+        player = server.player()
+
+        if player is not None:
+            previous = player.bits
+            game.play_input(game.rival, server.next_input(player), previous)
+
+        game.handle_tank(keys_pressed)
+        game.scheduler.advance(dt)
+        game.log_craters()
+        game.check_round_over()
+
+        server.end_tick(game.snapshot(), game.events)
+
+        if now_ms() >= self.next_status:
+            self.next_status = now_ms() + STATUS_INTERVAL
+            clients = server.connections.values()
+            text = '  '.join(f'client {connection.slot}: {connection.stats.bytes_per_second()/1000:.1f} kB/s' for connection in clients)
+            game.status = game.font(20).render(text or f'Waiting for a player (port {server.socket.getsockname()[1]})', 1, COLORS['BLACK'])
+
+    def render(self, WINDOW):
+        self.game.draw_window(WINDOW)
+
+class ClientState(GameState):
+
+    '''
+    The versus mode on a client: every tick, the snapshots received are shown, the input of the keyboard is sent
+    to the host and played at once on the local tank (prediction), and the shells are moved.
+
+    Attributes (besides the ones of GameState):
+
+        - client (Client):          the network side of the client
+        - bits (int):               the input of the previous tick
+        - started (bool):           whether the host has answered (then the level is shown)
+        - next_status (float):      the time of the next update of the network status (in ms)
+
+    '''
+
+    def __init__(self, game, client):
+        super().__init__(game)
+        self.client = client
+        self.bits = 0
+        self.started = False
+        self.next_status = 0
+
+    def update(self, keys_pressed, dt):
+
+        game = self.game
+        client = self.client
+
+        for state, events, first_event in client.poll():
+
+            if not self.started:
+                self.started = True
+                game.current_level, game.slot = client.level, client.slot
+                game.apply_level(game.prepare_level(game.current_level))
+
+            game.apply_snapshot(state, events, first_event, client.pending(), client.played_bits)
+
+        if not self.started:
+            return
+
+        bits = encode_input(keys_pressed) if game.local is not None else 0
+        client.send_input(bits)
+
+        if game.local is not None:
+            game.play_input(game.local, bits, self.bits)
+            self.bits = bits
+
+        game.update_bullets(collide = False)
+        game.camera.follow(game.local or game.tank)
+        game.scheduler.advance(dt)
+
+        if now_ms() >= self.next_status:
+            self.next_status = now_ms() + STATUS_INTERVAL
+            latency = client.stats.report()['latency_ms_mean']
+            text = f"{client.stats.bytes_per_second()/1000:.1f} kB/s  latency {'-' if latency is None else f'{latency:.0f} ms'}"
+            game.status = game.font(20).render(text, 1, COLORS['BLACK'])
+
+    def render(self, WINDOW):
+
+        if self.started:
+            self.game.draw_window(WINDOW)
+
+        else:
+            WINDOW.fill(COLORS['WHITE'])
+            text = self.game.font(40).render(f'Joining {self.client.address[0]}:{self.client.address[1]}...', 1, COLORS['BLACK'])
+            WINDOW.blit(text, (WIDTH/2 - text.get_width()/2, HEIGHT/2 - text.get_height()/2))
+
+def print_report(name, stats):
+    report = stats.report()
+    latency = '' if report['latency_ms_mean'] is None else \
+              f"  input latency {report['latency_ms_mean']:.1f} ms (p95 {report['latency_ms_p95']:.1f} ms)"
+    print(f"{name}: {report['bytes_per_sec']/1000:.2f} kB/s{latency}")
+
+def main(argv = None):
+
+    '''
+    Runs the versus mode, as the host or as a client (see the usage above).
+
+    Parameters:
+
+        argv (list): The command-line arguments (sys.argv[2:] when run as 'python main.py versus').
+
+    Returns:
+
+        int : The exit code.
+
+    '''
+
+    parser = argparse.ArgumentParser(prog = 'main.py versus', description = 'Two-player versus mode over the network.')
+    parser.add_argument('role', choices = ('host', 'join'), help = 'host the game or join a host')
+    parser.add_argument('address', nargs = '?', default = '127.0.0.1', help = 'address of the host to join (default 127.0.0.1)')
+    parser.add_argument('--port', type = int, default = DEFAULT_PORT, help = f'UDP port of the host (default {DEFAULT_PORT})')
+    parser.add_argument('--level', type = int, default = 1, help = 'level played (host only, default 1)')
+    parser.add_argument('--rate', type = float, default = SNAPSHOT_RATE, help = f'snapshots per second (host only, default {SNAPSHOT_RATE})')
+    Config.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        config = Config.load(args = args)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    pg.display.init()
+    pg.font.init()
+    WINDOW = pg.display.set_mode((WIDTH, HEIGHT), pg.SCALED | pg.RESIZABLE)
+
+    if args.role == 'host':
+        game = VersusGame(args.level, config = config)
+        if not 1 <= args.level <= game.max_levels:
+            parser.error(f'there is no level {args.level}')
+
+        pg.display.set_caption('Tank destroyer - versus (host)')
+        game.apply_level(game.prepare_level(game.current_level))
+        server = Server(args.level, STEPS, args.port, args.rate)
+        game.change_state(HostState(game, server))
+
+        GameLoop(game, WINDOW, 60).run()
+
+        for connection in server.connections.values():
+            print_report(f'client {connection.slot} {connection.address[0]}:{connection.address[1]}', connection.stats)
+        server.close()
+
+    else:
+        game = VersusGame(slot = 1, config = config)
+        pg.display.set_caption('Tank destroyer - versus')
+        client = Client(args.address, STEPS, args.port)
+        game.change_state(ClientState(game, client))
+
+        GameLoop(game, WINDOW, 60).run()
+
+        print_report('received', client.stats)
+        client.close()
+
+    pg.quit()
+    return 0